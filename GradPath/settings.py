@@ -84,6 +84,18 @@ DATABASES = {
 }
 
 
+# Cache
+# 排名模拟、成绩分布等按学院年级缓存的数据和后台导出任务的去重都依赖缓存中的版本号失效
+# （见 students/cohorts.py、counselors/jobs.py）；LocMemCache 只在单个进程内有效，
+# 多进程部署时请改为 Redis / Memcached 等所有工作进程共享的后端
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gradpath',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -132,6 +144,10 @@ LOGIN_REDIRECT_URL = '/student/'    # 登录后重定向页面，我们手动控
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# 上传文件由谁发送（见 students/media.py）：None 为 Django 直接发送；
+# 'x-accel-redirect'（nginx，需配置 MEDIA_ACCEL_PREFIX 对应的 internal location）或 'x-sendfile'（Apache/lighttpd）
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
 
 # 验证码配置
 CAPTCHA_IMAGE_SIZE = (100, 40)  # 验证码图片尺寸
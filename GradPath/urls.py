@@ -3,8 +3,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
-from students.views import root_view
+from students.views import root_view, serve_media
 
 # URL模式列表
 urlpatterns = [
@@ -14,11 +13,7 @@ urlpatterns = [
     path('counselor/', include('counselors.urls')),  # 辅导员相关URL
     path('admins/', include('admins.urls')),  # 管理员入口
     path('captcha/', include('captcha.urls')),  # 验证码路由
+    # 上传的文件：检查权限后发送（生产环境由前端代理发送，见 students/media.py）
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:name>", serve_media, name='media'),
     path('', root_view, name='root'),
-]
-
-# 在开发模式下，添加处理媒体文件（MEDIA_ROOT）的URL
-# 这使得在开发服务器上可以通过MEDIA_URL访问上传的文件
-# 注意：这不适用于生产环境！
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
\ No newline at end of file
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from admins.provisioning import ProvisioningError, create_accounts, read_rows, validate_rows
+
+
+class Command(BaseCommand):
+    help = '从 CSV 或 xlsx 文件批量开通学生和辅导员账号（表头：类型、姓名、学号、工号、学院、年级、用户名、密码）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='CSV 或 xlsx 文件路径')
+        parser.add_argument('--default-password', default='', help='文件中未填写密码时使用的初始密码')
+        parser.add_argument('--workers', type=int, default=None, help='计算密码哈希的进程数，默认为 CPU 核数')
+        parser.add_argument('--dry-run', action='store_true', help='只校验文件，不创建账号')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['file'], 'rb') as f:
+                records = read_rows(f, options['file'])
+        except OSError as exc:
+            raise CommandError(f"无法打开文件：{exc}")
+        except ProvisioningError as exc:
+            raise CommandError(str(exc))
+
+        accounts, errors = validate_rows(records, options['default_password'])
+        for line, error in errors:
+            self.stderr.write(f"第 {line} 行：{error}")
+        if errors:
+            raise CommandError(f"{len(errors)} 处错误，未创建任何账号")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"试运行：{len(accounts)} 个账号校验通过，未写入数据库"))
+            return
+        students, counselors = create_accounts(accounts, options['workers'])
+        self.stdout.write(self.style.SUCCESS(f"已创建 {students} 个学生账号、{counselors} 个辅导员账号"))
@@ -0,0 +1,203 @@
+# 批量开通账号：从 CSV 或 xlsx 文件导入学生和辅导员。
+#
+# 先读取并校验全部行：必填项、学院取值、文件内重复，以及与已有用户名、学号、工号的冲突
+# （每类一次批量 IN 查询取出已存在的值后用集合判断，不逐行查询）。有任何错误时不创建账号。
+# 校验通过后计算密码哈希（PBKDF2 每个约数百毫秒，是逐个创建时的主要耗时）：管理命令在进程池中并行计算，
+# 后台页面导入在请求进程内逐个计算，不在 Web 工作进程里创建子进程。
+# 再在一个事务内分块 bulk_create 用户和档案，最后刷新受影响学院年级的排名表和计数缓存。
+
+import csv
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from counselors.models import CounselorProfile
+from students.cohorts import invalidate_cohort
+from students.counters import touch_submissions
+from students.models import StudentProfile, StudentRank
+from students.xlsx import read_xlsx_rows
+
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 上传文件大小上限（字节）
+CHUNK_SIZE = 500  # 每批插入的行数，也是 IN 查询每批的参数个数
+HASH_CHUNK_SIZE = 16  # 每次交给子进程计算的密码个数
+
+# 表头 -> 字段，中英文列名均可
+COLUMNS = {
+    '类型': 'user_type', 'user_type': 'user_type',
+    '用户名': 'username', 'username': 'username',
+    '密码': 'password', 'password': 'password',
+    '姓名': 'full_name', 'full_name': 'full_name',
+    '学号': 'student_id', 'student_id': 'student_id',
+    '工号': 'employee_id', 'employee_id': 'employee_id',
+    '学院': 'college', 'college': 'college',
+    '年级': 'grade', 'grade': 'grade',
+}
+STUDENT_ID_PATTERN = re.compile(r'^\d{8,20}$')  # 与 StudentProfile.student_id 的校验一致
+USER_TYPES = {'学生': 'student', 'student': 'student', '辅导员': 'counselor', 'counselor': 'counselor'}
+
+
+class ProvisioningError(Exception):
+    """文件无法读取或格式不正确"""
+
+
+def read_rows(fileobj, filename):
+    """读取 CSV 或 xlsx 文件，返回 [(行号, {字段: 值})]"""
+    if filename.lower().endswith('.xlsx'):
+        try:
+            rows = list(read_xlsx_rows(fileobj))
+        except Exception:
+            raise ProvisioningError("无法读取 xlsx 文件")
+    else:
+        data = fileobj.read()
+        for encoding in ('utf-8-sig', 'gb18030'):
+            try:
+                text = data.decode(encoding)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            raise ProvisioningError("无法识别文件编码，请保存为 UTF-8 或 GBK 编码的 CSV")
+        rows = list(csv.reader(io.StringIO(text, newline='')))
+
+    if not rows:
+        raise ProvisioningError("文件为空")
+    header = [COLUMNS.get(column.strip()) for column in rows[0]]
+    if 'user_type' not in header or 'full_name' not in header:
+        raise ProvisioningError("表头须包含“类型”和“姓名”列")
+
+    records = []
+    for line, row in enumerate(rows[1:], start=2):
+        if not any(cell.strip() for cell in row):
+            continue  # 跳过空行
+        record = {field: '' for field in set(COLUMNS.values())}
+        for field, cell in zip(header, row):
+            if field:
+                record[field] = cell.strip()
+        records.append((line, record))
+    return records
+
+
+def _existing(queryset, field, values):
+    """values 中已存在于 queryset 的 field 值（分批 IN 查询）"""
+    values, found = list(values), set()
+    for start in range(0, len(values), CHUNK_SIZE):
+        found.update(queryset.filter(**{f'{field}__in': values[start:start + CHUNK_SIZE]})
+                     .values_list(field, flat=True))
+    return found
+
+
+def validate_rows(records, default_password=''):
+    """校验全部行，返回 (accounts, errors)
+
+    accounts 为 [(行号, 字段字典)]，用户类型已规范为 student/counselor，用户名默认取学号或工号，
+    密码为空时使用 default_password；errors 为 [(行号, 错误信息)]。
+    """
+    colleges = dict(StudentProfile.COLLEGE_CHOICES)
+    accounts, errors = [], []
+    for line, record in records:
+        record = dict(record)
+        record['user_type'] = USER_TYPES.get(record['user_type'])
+        identifier = 'student_id' if record['user_type'] == 'student' else 'employee_id'
+        record['username'] = record['username'] or record.get(identifier, '')
+        record['password'] = record['password'] or default_password
+
+        # 各项分别检查，一行有多处错误时一并列出
+        if record['user_type'] is None:
+            errors.append((line, "类型须为“学生”或“辅导员”"))
+        if not record['full_name']:
+            errors.append((line, "缺少姓名"))
+        if record['user_type'] == 'student':
+            if not record['student_id']:
+                errors.append((line, "学生必须填写学号"))
+            elif not STUDENT_ID_PATTERN.match(record['student_id']):
+                errors.append((line, "学号必须是8-20位数字"))
+        if record['user_type'] == 'counselor':
+            if not record['employee_id']:
+                errors.append((line, "辅导员必须填写工号"))
+            if not record['grade']:
+                errors.append((line, "辅导员必须填写负责年级"))
+        if record['college'] not in colleges:
+            # 也接受学院名称
+            code = next((code for code, name in colleges.items() if name == record['college']), None)
+            if code is None:
+                errors.append((line, f"学院“{record['college']}”不存在"))
+            else:
+                record['college'] = code
+        if not record['password']:
+            errors.append((line, "缺少密码，且未设置默认密码"))
+        accounts.append((line, record))
+
+    # 文件内重复与已有数据冲突：每类取出全部取值，批量查出已存在的，再用集合判断
+    checks = [
+        ('username', '用户名', User.objects.all(), None),
+        ('student_id', '学号', StudentProfile.objects.all(), 'student'),
+        ('employee_id', '工号', CounselorProfile.objects.all(), 'counselor'),
+    ]
+    for field, label, queryset, user_type in checks:
+        values = [(line, record[field]) for line, record in accounts
+                  if record[field] and user_type in (None, record['user_type'])]
+        existing = _existing(queryset, field, {value for _, value in values})
+        seen = set()
+        for line, value in values:
+            if value in existing:
+                errors.append((line, f"{label}“{value}”已存在"))
+            elif value in seen:
+                errors.append((line, f"{label}“{value}”在文件中重复"))
+            seen.add(value)
+
+    errors.sort(key=lambda error: error[0])  # 按行号排列，同一行的错误保持检查顺序
+    return accounts, errors
+
+
+def _setup_worker():
+    # 以 spawn 方式启动的子进程需要重新初始化 Django（fork 时为空操作）
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """在进程池中并行计算密码哈希，顺序与 passwords 一致"""
+    passwords = list(passwords)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) <= HASH_CHUNK_SIZE:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=HASH_CHUNK_SIZE))
+
+
+def create_accounts(accounts, workers=None):
+    """创建已校验的账号，返回 (学生数, 辅导员数)"""
+    hashes = hash_passwords((record['password'] for _, record in accounts), workers)
+    records = [record for _, record in accounts]
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            [User(username=record['username'], password=password) for record, password in zip(records, hashes)],
+            batch_size=CHUNK_SIZE
+        )
+        students, counselors = [], []
+        for record, user in zip(records, users):
+            if record['user_type'] == 'student':
+                students.append(StudentProfile(
+                    user=user, student_id=record['student_id'], full_name=record['full_name'],
+                    college=record['college'], grade=record['grade']
+                ))
+            else:
+                counselors.append(CounselorProfile(
+                    user=user, employee_id=record['employee_id'], full_name=record['full_name'],
+                    college=record['college'], grade=record['grade']
+                ))
+        StudentProfile.objects.bulk_create(students, batch_size=CHUNK_SIZE)
+        CounselorProfile.objects.bulk_create(counselors, batch_size=CHUNK_SIZE)
+
+        # bulk_create 不调用 save()：补上新学生所在学院年级的排名表和缓存失效
+        for college, grade in {(student.college, student.grade) for student in students}:
+            StudentRank.objects.refresh_cohort(college, grade)
+            touch_submissions(college, grade)
+            invalidate_cohort(college, grade, namespace='profiles')
+    return len(students), len(counselors)
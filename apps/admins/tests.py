@@ -1,3 +1,114 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from counselors.models import CounselorProfile
+from students.cohorts import cohort_version
+from students.models import StudentProfile, StudentRank
+
+from . import provisioning
+from .provisioning import create_accounts, hash_passwords, validate_rows
+
+
+def row(**fields):
+    record = {'user_type': '', 'username': '', 'password': '', 'full_name': '', 'student_id': '',
+              'employee_id': '', 'college': 'info', 'grade': ''}
+    record.update(fields)
+    return record
+
+
+class ValidateRowsTests(TestCase):
+    def test_valid_rows(self):
+        accounts, errors = validate_rows([
+            (2, row(user_type='学生', full_name='张三', student_id='20230001', grade='2023')),
+            (3, row(user_type='辅导员', full_name='李四', employee_id='T001', grade='2023', college='信息学院')),
+        ], default_password='secret')
+        self.assertEqual(errors, [])
+        self.assertEqual([record['username'] for _, record in accounts], ['20230001', 'T001'])
+        self.assertEqual(accounts[1][1]['college'], 'info')
+
+    def test_all_errors_in_a_row_are_reported(self):
+        _, errors = validate_rows([
+            (2, row(user_type='辅导员', college='不存在的学院')),
+            (3, row(user_type='学生', full_name='王五', student_id='123')),
+        ])
+        self.assertEqual(errors, [
+            (2, "缺少姓名"),
+            (2, "辅导员必须填写工号"),
+            (2, "辅导员必须填写负责年级"),
+            (2, "学院“不存在的学院”不存在"),
+            (2, "缺少密码，且未设置默认密码"),
+            (3, "学号必须是8-20位数字"),
+            (3, "缺少密码，且未设置默认密码"),
+        ])
+
+    def test_conflicts_with_file_and_existing_data(self):
+        user = User.objects.create_user(username='taken', password='pass')
+        StudentProfile.objects.create(user=user, student_id='20230001', full_name='已有', college='info',
+                                      grade='2023')
+        _, errors = validate_rows([
+            (2, row(user_type='学生', full_name='甲', student_id='20230001', username='taken')),
+            (3, row(user_type='学生', full_name='乙', student_id='20230002')),
+            (4, row(user_type='学生', full_name='丙', student_id='20230002')),
+        ], default_password='secret')
+        self.assertEqual(errors, [
+            (2, "用户名“taken”已存在"),
+            (2, "学号“20230001”已存在"),
+            (4, "用户名“20230002”在文件中重复"),
+            (4, "学号“20230002”在文件中重复"),
+        ])
+
+
+# 测试中使用快速的哈希算法
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CreateAccountsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_hash_passwords_in_process_pool(self):
+        passwords = [f'pw{i}' for i in range(provisioning.HASH_CHUNK_SIZE * 2 + 1)]
+        hashes = hash_passwords(passwords, workers=2)
+        self.assertEqual(len(hashes), len(passwords))
+        self.assertTrue(all(User(password=h).check_password(p) for p, h in zip(passwords, hashes)))
+
+    def test_create_accounts(self):
+        existing = StudentProfile.objects.create(
+            user=User.objects.create(username='existing'), student_id='20230009', college='info', grade='2023',
+            academic_comprehensive_score=90
+        )
+        namespaces = ('scores', 'submissions', 'profiles')
+        versions = [cohort_version('info', '2023', namespace) for namespace in namespaces]
+        accounts, errors = validate_rows([
+            (2, row(user_type='学生', full_name='张三', student_id='20230001', grade='2023')),
+            (3, row(user_type='学生', full_name='李四', student_id='20230002', grade='2023', password='own')),
+            (4, row(user_type='辅导员', full_name='王五', employee_id='T001', grade='2023')),
+        ], default_password='secret')
+        self.assertEqual(errors, [])
+
+        self.assertEqual(create_accounts(accounts, workers=1), (2, 1))
+        self.assertTrue(User.objects.get(username='20230001').check_password('secret'))
+        self.assertTrue(User.objects.get(username='20230002').check_password('own'))
+        self.assertEqual(StudentProfile.objects.get(student_id='20230002').full_name, '李四')
+        self.assertEqual(CounselorProfile.objects.get(employee_id='T001').user.username, 'T001')
+
+        # bulk_create 不调用 save()：排名表和计数缓存需要另行刷新
+        ranks = dict(StudentRank.objects.filter(college='info', grade='2023')
+                     .values_list('student__student_id', 'rank'))
+        self.assertEqual(ranks[existing.student_id], 1)
+        self.assertEqual(set(ranks), {'20230009', '20230001', '20230002'})
+        self.assertEqual(set(StudentRank.objects.values_list('cohort_size', flat=True)), {1})
+        for namespace, version in zip(namespaces, versions):
+            self.assertNotEqual(cohort_version('info', '2023', namespace), version, namespace)
+
+    def test_bulk_add_view_hashes_in_request_process(self):
+        self.client.force_login(User.objects.create_superuser('root', password='x'))
+        upload = SimpleUploadedFile('users.csv', '类型,姓名,学号,学院,年级\n学生,张三,20230001,info,2023\n'.encode())
+        with mock.patch.object(provisioning, 'ProcessPoolExecutor') as pool:
+            response = self.client.post(reverse('bulk_add_users'), {'file': upload, 'default_password': 'secret'})
+        self.assertRedirects(response, reverse('admin_dashboard'), fetch_redirect_response=False)
+        pool.assert_not_called()
+        self.assertTrue(StudentProfile.objects.filter(student_id='20230001').exists())
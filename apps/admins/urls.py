@@ -6,6 +6,7 @@ urlpatterns = [
     path('login/', views.admin_login, name='admin_login'),
     path('logout/', views.admin_logout, name='admin_logout'),
     path('add/', views.add_user, name='add_user'),
+    path('bulk-add/', views.bulk_add_users, name='bulk_add_users'),
     path('delete/<int:user_id>/', views.delete_user, name='delete_user'),
     path('batch-delete/', views.batch_delete_users, name='batch_delete_users'),
     path('edit_user/<int:user_id>/', views.edit_user, name='edit_user'),
@@ -1,14 +1,22 @@
-from django.db import models
+from django.db import models, transaction
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth.models import User
 from django.contrib import messages
-from students.models import StudentProfile
+from students.models import StudentProfile, StudentRank, Submission, UploadBlob
+from students.counters import touch_submissions
+from students.projections import STUDENT_ADMIN, Projection
 from counselors.models import CounselorProfile
+from .provisioning import MAX_UPLOAD_SIZE, ProvisioningError, create_accounts, read_rows, validate_rows
 from django import forms
 from django.contrib.auth import authenticate, login, logout
 from django.urls import reverse
 
+# 管理员面板辅导员列表只取显示的列
+COUNSELOR_ADMIN = Projection(CounselorProfile, (
+    'user_id', 'employee_id', 'full_name', 'college', 'grade',
+), username='user__username')
+
 
 # 仅允许超级管理员访问
 def is_superadmin(user):
@@ -126,7 +134,7 @@ def admin_dashboard(request):
     sort_dir = request.GET.get('dir', 'asc')
 
     # 2. 学生筛选和排序
-    students_query = StudentProfile.objects.select_related('user').all()
+    students_query = StudentProfile.objects.all()
     if filter_college:
         students_query = students_query.filter(college=filter_college)
     if filter_grade:
@@ -144,10 +152,10 @@ def admin_dashboard(request):
             students_query = students_query.order_by(f'-{sort_by}')
         else:
             students_query = students_query.order_by(sort_by)
-    students = students_query
+    students = list(STUDENT_ADMIN(students_query))  # 只取列表显示的列
 
     # 3. 辅导员筛选和排序
-    counselors_query = CounselorProfile.objects.select_related('user').all()
+    counselors_query = CounselorProfile.objects.all()
     if filter_college:
         counselors_query = counselors_query.filter(college=filter_college)
     if filter_grade:
@@ -165,12 +173,12 @@ def admin_dashboard(request):
             counselors_query = counselors_query.order_by(f'-{sort_by}')
         else:
             counselors_query = counselors_query.order_by(sort_by)
-    counselors = counselors_query
+    counselors = list(COUNSELOR_ADMIN(counselors_query))
 
     # 4. 下拉框选项
     college_choices = UserEditForm().fields['college'].choices
-    student_grades = set(StudentProfile.objects.values_list('grade', flat=True))
-    counselor_grades = set(CounselorProfile.objects.values_list('grade', flat=True))
+    student_grades = set(StudentProfile.objects.order_by().values_list('grade', flat=True).distinct())
+    counselor_grades = set(CounselorProfile.objects.order_by().values_list('grade', flat=True).distinct())
     all_grades = student_grades.union(counselor_grades)
     grade_choices = sorted([grade for grade in all_grades if grade])
 
@@ -259,6 +267,38 @@ def add_user(request):
     return render(request, 'admins/add_user.html', {'form': form})
 
 
+# 批量开通账号（CSV / xlsx）
+@user_passes_test(is_superadmin, login_url='admin_login')
+def bulk_add_users(request):
+    errors = []
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        default_password = request.POST.get('default_password', '')
+        if not upload:
+            messages.error(request, '请选择要导入的文件')
+        elif upload.size > MAX_UPLOAD_SIZE:
+            messages.error(request, f'文件不能超过 {MAX_UPLOAD_SIZE // 1024 // 1024}MB')
+        else:
+            try:
+                records = read_rows(upload, upload.name)
+            except ProvisioningError as e:
+                messages.error(request, str(e))
+            else:
+                accounts, errors = validate_rows(records, default_password)
+                if errors:
+                    messages.error(request, f'{len(errors)} 处错误，未创建任何账号')
+                elif not accounts:
+                    messages.error(request, '文件中没有账号数据')
+                else:
+                    # 在请求进程内逐个计算哈希，不在 Web 工作进程里再创建进程池；
+                    # 大批量导入请使用 provision_users 命令，可按 CPU 核数并行
+                    students, counselors = create_accounts(accounts, workers=1)
+                    messages.success(request, f'已创建 {students} 个学生账号、{counselors} 个辅导员账号')
+                    return redirect('admin_dashboard')
+
+    return render(request, 'admins/bulk_add_users.html', {'errors': errors})
+
+
 # 删除用户
 @user_passes_test(is_superadmin, login_url='admin_login')
 def delete_user(request, user_id):
@@ -288,7 +328,16 @@ def batch_delete_users(request):
             # 批量删除用户
             users = User.objects.filter(id__in=user_ids)
             count = users.count()
-            users.delete()
+            # 记录受影响的学院年级，删除后刷新其排名表
+            cohorts = set(StudentProfile.objects.filter(user__in=users).values_list('college', 'grade'))
+            # 一并删除的提交记录所引用的文件，删除后减少引用计数
+            files = list(Submission.objects.filter(student__user__in=users).values_list('file', flat=True))
+            with transaction.atomic():
+                users.delete()
+                UploadBlob.objects.release(files)
+            for college, grade in cohorts:
+                StudentRank.objects.refresh_cohort(college, grade)
+                touch_submissions(college, grade)
 
             # 修正三元表达式语法
             user_type_text = "学生" if user_type == "student" else "辅导员"
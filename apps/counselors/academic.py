@@ -0,0 +1,106 @@
+# 学业综合成绩批量录入：整个学院年级的表格编辑和 CSV 导入。
+#
+# 两种方式都先校验全部行，任何一行有误都不写入并逐行报告错误；全部通过后只写入有变化的行，
+# 在一个事务内批量更新并重算总成绩（StudentProfileQuerySet.set_academic_scores）。
+
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from students.models import StudentProfile
+
+MIN_SCORE = Decimal(0)
+MAX_SCORE = Decimal(100)
+MAX_UPLOAD_SIZE = 2 * 1024 * 1024  # CSV 文件大小上限（字节）
+# 表头中可识别的列名
+STUDENT_ID_HEADERS = ('学号', 'student_id')
+SCORE_HEADERS = ('学业综合成绩', 'academic_comprehensive_score')
+
+
+def parse_score(text):
+    """解析成绩文本，返回 (成绩, 错误信息)；空白返回 (None, None)，表示不修改"""
+    text = (text or '').strip()
+    if not text:
+        return None, None
+    try:
+        score = Decimal(text)
+    except InvalidOperation:
+        return None, f"“{text}”不是有效的数字"
+    if not score.is_finite() or not MIN_SCORE <= score <= MAX_SCORE:
+        return None, f"成绩须在 {MIN_SCORE} - {MAX_SCORE} 之间"
+    if score != score.quantize(Decimal('0.1')):
+        return None, "成绩最多保留一位小数"
+    return score.quantize(Decimal('0.1')), None
+
+
+def cohort_scores(college, grade):
+    """学院年级内学生的 {学号: (学生id, 当前学业综合成绩)}"""
+    rows = StudentProfile.objects.filter(college=college, grade=grade).values_list(
+        'student_id', 'pk', 'academic_comprehensive_score'
+    )
+    return {student_id: (pk, score) for student_id, pk, score in rows}
+
+
+def validate_scores(cohort, entries):
+    """校验录入的成绩
+
+    cohort 为 cohort_scores() 的结果，entries 为 [(行号, 学号, 成绩文本)]。
+    返回 (changes, errors)：changes 为有变化的 {学生id: 新成绩}，errors 为 [(行号, 学号, 错误信息)]。
+    """
+    changes, errors, seen = {}, [], set()
+    for line, student_id, text in entries:
+        student_id = (student_id or '').strip()
+        if not student_id:
+            errors.append((line, student_id, "缺少学号"))
+            continue
+        if student_id not in cohort:
+            errors.append((line, student_id, "不是本学院本年级的学生"))
+            continue
+        if student_id in seen:
+            errors.append((line, student_id, "学号重复"))
+            continue
+        seen.add(student_id)
+
+        score, error = parse_score(text)
+        if error:
+            errors.append((line, student_id, error))
+            continue
+        pk, current = cohort[student_id]
+        if score is not None and score != current:
+            changes[pk] = score
+    return changes, errors
+
+
+def read_score_csv(upload):
+    """读取上传的 CSV，返回 (entries, error)
+
+    第一行为表头，需包含“学号”和“学业综合成绩”两列（列顺序不限，其余列忽略）。
+    文件编码支持 UTF-8（含 BOM）和 Excel 默认保存的 GBK。
+    """
+    if upload.size > MAX_UPLOAD_SIZE:
+        return [], f"文件不能超过 {MAX_UPLOAD_SIZE // 1024 // 1024}MB"
+    data = upload.read()
+    for encoding in ('utf-8-sig', 'gb18030'):
+        try:
+            text = data.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        return [], "无法识别文件编码，请保存为 UTF-8 或 GBK 编码的 CSV"
+
+    reader = csv.reader(io.StringIO(text, newline=''))
+    header = [column.strip() for column in next(reader, [])]
+    id_column = next((header.index(name) for name in STUDENT_ID_HEADERS if name in header), None)
+    score_column = next((header.index(name) for name in SCORE_HEADERS if name in header), None)
+    if id_column is None or score_column is None:
+        return [], "表头须包含“学号”和“学业综合成绩”两列"
+
+    entries = []
+    for line, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue  # 跳过空行
+        student_id = row[id_column] if id_column < len(row) else ''
+        score = row[score_column] if score_column < len(row) else ''
+        entries.append((line, student_id, score))
+    return entries, None
@@ -0,0 +1,101 @@
+# 审核领取（租约）：同一学院年级的多位辅导员分摊待审核申请，避免重复审核和互相覆盖。
+#
+# 辅导员每次领取 N 条最早提交、未被领取（或租约已过期）的申请，用一条
+# UPDATE ... WHERE id IN (SELECT ... LIMIT N) AND 仍未被领取 完成，并发领取不会拿到同一条。
+# 租约到期未审核的申请自动回到待领取状态，无需定时任务。
+# 每人手上未完成的领取数不超过待审核总数按辅导员人数均分后的份额。
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from students.models import Submission
+from .models import CounselorProfile
+
+LEASE_DURATION = timedelta(minutes=30)
+MAX_CLAIM = 50  # 单次最多领取条数
+
+
+def claimable(now):
+    """未被领取或租约已过期"""
+    return Q(claimed_by__isnull=True) | Q(claim_expires_at__lt=now)
+
+
+def held_by_others(counselor, now):
+    """租约有效期内被其他辅导员领取"""
+    return Q(claim_expires_at__gte=now) & ~Q(claimed_by=counselor) & Q(claimed_by__isnull=False)
+
+
+def pending_for(counselor):
+    """辅导员所在学院年级的待审核申请"""
+    return Submission.objects.filter(
+        approved=False,
+        rejected=False,
+        college=counselor.college,
+        grade=counselor.grade
+    )
+
+
+def claim_quota(counselor, now=None):
+    """辅导员当前还能领取的条数：均分份额减去手上未完成的领取"""
+    now = now or timezone.now()
+    counts = pending_for(counselor).aggregate(
+        total=Count('id'),
+        mine=Count('id', filter=Q(claimed_by=counselor, claim_expires_at__gte=now)),
+    )
+    counselors = CounselorProfile.objects.filter(college=counselor.college, grade=counselor.grade).count()
+    share = -(-counts['total'] // max(counselors, 1))  # 向上取整，保证只剩一条时也能领取
+    return max(share - counts['mine'], 0)
+
+
+def claim_next(counselor, count):
+    """领取最早提交的 count 条可领取申请，同时续期已领取的申请，返回新领取的条数"""
+    now = timezone.now()
+    expires = now + LEASE_DURATION
+    with transaction.atomic():
+        pending_for(counselor).filter(claimed_by=counselor, claim_expires_at__gte=now) \
+            .update(claim_expires_at=expires)
+
+        count = min(count, MAX_CLAIM, claim_quota(counselor, now))
+        if count <= 0:
+            return 0
+        candidates = pending_for(counselor).filter(claimable(now)).order_by('timestamp', 'id').values('id')[:count]
+        # 外层再次检查可领取条件：并发领取时后提交的事务不会覆盖先提交者的领取
+        return Submission.objects.filter(claimable(now), id__in=candidates).update(
+            claimed_by=counselor, claim_expires_at=expires
+        )
+
+
+def claim_one(counselor, submission):
+    """打开审核详情时领取（或续期）该申请，被他人持有时返回 False"""
+    now = timezone.now()
+    updated = Submission.objects.filter(
+        claimable(now) | Q(claimed_by=counselor),
+        id=submission.id,
+        approved=False,
+        rejected=False
+    ).update(claimed_by=counselor, claim_expires_at=now + LEASE_DURATION)
+    if updated:
+        submission.claimed_by = counselor
+        submission.claim_expires_at = now + LEASE_DURATION
+    return bool(updated)
+
+
+def release_claims(counselor):
+    """释放辅导员手上所有未完成的领取，返回释放条数"""
+    return Submission.objects.filter(claimed_by=counselor, approved=False, rejected=False).update(
+        claimed_by=None, claim_expires_at=None
+    )
+
+
+def is_held_by_other(submission, counselor, now=None):
+    """申请是否在租约期内被其他辅导员领取"""
+    now = now or timezone.now()
+    return bool(
+        submission.claimed_by_id
+        and submission.claimed_by_id != counselor.id
+        and submission.claim_expires_at
+        and submission.claim_expires_at >= now
+    )
@@ -0,0 +1,61 @@
+# 辅导员控制台统计。
+#
+# 待审核数和本周通过数在一条按条件计数的聚合查询中算出，连同学生数和最新的待审核申请
+# 按学院年级缓存在提交计数命名空间下（见 students/counters.py）：提交、删除、审核、
+# 撤销审核以及学生增减时失效，其余时间刷新控制台不访问数据库。
+# 加分规则总数全局缓存，规则新增、删除时失效。
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from students.counters import NAMESPACE
+from students.cohorts import get_cohort_cached
+from students.models import RULES_COUNT_KEY, Rule, StudentProfile, Submission
+
+LATEST_PENDING = 5
+
+
+def week_start():
+    """本周一零点（当前时区）"""
+    now = timezone.localtime()
+    return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def compute_dashboard_stats(college, grade, start_of_week):
+    """统计学院年级的学生数、待审核数和本周通过数"""
+    submissions = Submission.objects.filter(college=college, grade=grade)
+    pending = Q(approved=False, rejected=False)
+    # 两项提交计数在同一次扫描中按条件分别计数
+    stats = submissions.aggregate(
+        pending_count=Count('pk', filter=pending),
+        handled_this_week=Count('pk', filter=Q(approved=True, timestamp__gte=start_of_week)),
+    )
+    # 学生数在另一张表上：aggregate() 不接受子查询，单独用学院年级索引计数（只读索引，不回表）
+    stats['total_students'] = StudentProfile.objects.filter(college=college, grade=grade).count()
+    stats['latest_pending_submissions'] = list(
+        submissions.filter(pending)
+        .select_related('student', 'category')
+        .order_by('-timestamp', '-id')[:LATEST_PENDING]
+    )
+    return stats
+
+
+def dashboard_stats(college, grade):
+    """控制台统计（带缓存）：total_students、pending_count、handled_this_week、latest_pending_submissions"""
+    start_of_week = week_start()
+    if not (college and grade):
+        return compute_dashboard_stats(college, grade, start_of_week)
+    # 缓存键带上周一日期，跨周后自动重新统计
+    return get_cohort_cached(
+        f"dashboard:{start_of_week:%Y%m%d}", college, grade,
+        lambda: compute_dashboard_stats(college, grade, start_of_week),
+        namespace=NAMESPACE
+    )
+
+
+def rules_count():
+    """加分规则总数（带缓存）"""
+    return cache.get_or_set(RULES_COUNT_KEY, Rule.objects.count, timeout=None)
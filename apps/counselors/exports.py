@@ -0,0 +1,158 @@
+# 学生信息与审核材料导出。
+#
+# 辅导员导出所在学院年级的数据，管理员可导出整个学院。数据分块流式读取，每行只取导出的列
+# （见 students/projections.py）；文件边生成边输出，内存占用与行数无关。支持 CSV（带 BOM，
+# Excel 直接打开中文不乱码）和 xlsx（见 students/xlsx.py）两种格式。
+# 直接下载时边生成边发送（StreamingHttpResponse）；数据量大时走后台导出任务（见 jobs 模块）。
+
+import csv
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+from students.models import StudentProfile, Submission, SubmissionCategory
+from students.projections import STUDENT_EXPORT, Projection
+from students.xlsx import CONTENT_TYPE as XLSX_CONTENT_TYPE, stream_xlsx
+
+EXPORT_HEADER = [
+    '学号', '姓名', '学院', '年级', '专业', '入学年份',
+    '学业综合成绩', '学术专长成绩', '综合表现成绩', '总成绩', '排名', '排名百分比'
+]
+SUBMISSION_HEADER = [
+    '编号', '学号', '姓名', '加分大类', '加分项目', '自评分', '审核状态', '核定加分',
+    '审核人', '驳回原因', '备注', '提交时间'
+]
+CHUNK_SIZE = 2000  # 每次从数据库读取的行数，也是每次发送的 CSV 行数
+
+SUBMISSION_EXPORT = Projection(Submission, (
+    'id', 'self_rating', 'approved', 'rejected', 'approved_score', 'reject_reason', 'remarks', 'timestamp',
+), student_number='student__student_id', student_name='student__full_name',
+    category_group='category__group', category_name='category__name', reviewer_name='reviewer__full_name')
+CATEGORY_GROUPS = dict(SubmissionCategory._meta.get_field('group').flatchoices)
+
+
+def student_export_rows(college, grade):
+    """学院年级内学生的导出行（不含表头），按名次排列；grade 为空时依次导出全学院各年级"""
+    if grade:
+        grades = [grade]
+    else:
+        grades = StudentProfile.objects.filter(college=college).exclude(grade='').order_by('grade').values_list(
+            'grade', flat=True
+        ).distinct()
+    for grade in grades:
+        yield from _cohort_rows(college, grade)
+
+
+def _cohort_rows(college, grade):
+    students = StudentProfile.objects.ranked_in(college, grade)
+    for student in STUDENT_EXPORT(students, chunk_size=CHUNK_SIZE):
+        yield [
+            student.student_id,
+            student.full_name,
+            student.college,
+            student.grade,
+            student.major,
+            student.enrollment_year or '',
+            student.academic_comprehensive_score or '',
+            student.academic_expertise_score,
+            student.comprehensive_performance_score,
+            student.total_score or '',
+            student.cohort_rank or '',
+            f"{student.cohort_percentile:.1f}%" if student.cohort_percentile is not None else ''
+        ]
+
+
+def submission_queryset(college, grade, status, reviewer=None):
+    """待导出的提交记录：status 为 pending（待审核）、approved（已通过）或 reviewed（reviewer 审核过的）；
+    grade 为空时为全学院"""
+    submissions = Submission.objects.filter(college=college)
+    if grade:
+        submissions = submissions.filter(grade=grade)
+    if status == 'reviewed':
+        submissions = submissions.filter(Q(approved=True) | Q(rejected=True), reviewer=reviewer)
+    elif status == 'approved':
+        submissions = submissions.filter(approved=True)
+    else:
+        submissions = submissions.filter(approved=False, rejected=False)
+    return submissions.order_by('grade', '-timestamp', '-id')
+
+
+def submission_export_rows(submissions):
+    """提交记录的导出行（不含表头），按 submissions 的排序"""
+    for sub in SUBMISSION_EXPORT(submissions, chunk_size=CHUNK_SIZE):
+        if sub.approved:
+            status = '已通过'
+        elif sub.rejected:
+            status = '已驳回'
+        else:
+            status = '待审核'
+        yield [
+            sub.id,
+            sub.student_number,
+            sub.student_name,
+            CATEGORY_GROUPS.get(sub.category_group, sub.category_group),
+            sub.category_name,
+            sub.self_rating,
+            status,
+            sub.approved_score if sub.approved_score is not None else '',
+            sub.reviewer_name or '',
+            sub.reject_reason or '',
+            sub.remarks or '',
+            timezone.localtime(sub.timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+        ]
+
+
+class _Buffer:
+    """csv.writer 的写入目标，收集写入的文本供生成器取走"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def take(self):
+        text, self.parts = ''.join(self.parts), []
+        return text
+
+
+def stream_csv(rows, header=EXPORT_HEADER, chunk_size=CHUNK_SIZE):
+    """把行逐块编码为 CSV 文本，每块 chunk_size 行；BOM 和表头单独作为第一块立即发送"""
+    buffer = _Buffer()
+    buffer.write('\ufeff')  # Excel 据此按 UTF-8 打开
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.take()
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending == chunk_size:
+            yield buffer.take()
+            pending = 0
+    if pending:
+        yield buffer.take()
+
+
+def stream_file(rows, header, sheet_name, export_format='csv'):
+    """逐块产出导出文件的字节内容，export_format 为 'csv' 或 'xlsx'"""
+    if export_format == 'xlsx':
+        return stream_xlsx(header, rows, sheet_name=sheet_name)
+    return (chunk.encode() for chunk in stream_csv(rows, header))
+
+
+def content_type_for(export_format):
+    return XLSX_CONTENT_TYPE if export_format == 'xlsx' else 'text/csv; charset=utf-8'
+
+
+def export_response(rows, header, filename, export_format='csv'):
+    """流式导出响应，export_format 为 'csv' 或 'xlsx'，filename 不含扩展名"""
+    if export_format != 'xlsx':
+        export_format = 'csv'
+    response = StreamingHttpResponse(stream_file(rows, header, filename, export_format),
+                                     content_type=content_type_for(export_format))
+    response['Content-Disposition'] = content_disposition_header(True, f'{filename}.{export_format}')
+    return response
@@ -0,0 +1,188 @@
+# 后台导出任务。
+#
+# 导出整个学院的学生或全部已通过材料时，边生成边下载可能超过 Web 进程的请求超时。这类导出
+# 提交为 ExportJob，在本进程的线程池中生成文件写入 MEDIA_ROOT/exports/，页面轮询进度，完成后下载。
+#
+# 任务按 fingerprint（导出内容、参数、文件格式，以及相关学院年级的数据版本）去重：参数相同且
+# 数据未变化时，直接返回已生成的文件或正在生成的同一任务，重复点击不会重复生成。数据版本取自
+# cohorts 模块中成绩（scores）、提交记录（submissions）和学生资料（profiles）三类缓存的版本号，
+# 数据变化后版本号递增，下一次导出重新生成，并删除同参数的旧文件。
+#
+# 版本号保存在缓存中，只有所有进程共用同一个缓存时才能看到彼此的修改。默认的 LocMemCache
+# 只在单个进程内有效，仅适用于单进程部署（开发环境）：多个 Web 进程，或在另一进程中运行会修改
+# 成绩的管理命令（reconcile_scores、recompute_scores 等）时，须把 CACHES 配置为 Redis、
+# Memcached 等共享缓存，否则其他进程中的修改不会使已生成的导出文件失效。缓存重启或版本号被淘汰
+# 时版本号重新生成，只会多生成一次，不会返回过期的文件。
+
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+
+from students.cohorts import cohort_version
+from students.models import StudentProfile
+
+from .exports import (
+    EXPORT_HEADER, SUBMISSION_HEADER, stream_file, student_export_rows, submission_export_rows, submission_queryset
+)
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 2
+PROGRESS_EVERY = 2000  # 每导出多少行更新一次进度
+# 生成中的任务超过该时间没有进度更新视为已中断（例如进程重启），再次申请时重新生成
+STALE_AFTER = timedelta(minutes=10)
+VERSION_NAMESPACES = ('scores', 'submissions', 'profiles')
+SUBMISSION_STATUS_NAMES = {'pending': '待审核申请', 'approved': '已通过申请', 'reviewed': '已审核申请'}
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='export')
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def _grades(college, grade):
+    if grade:
+        return [grade]
+    return list(StudentProfile.objects.filter(college=college).exclude(grade='').order_by('grade').values_list(
+        'grade', flat=True
+    ).distinct())
+
+
+def data_version(college, grade):
+    """学院年级（grade 为空时为全学院各年级）当前的数据版本"""
+    return [
+        [grade] + [cohort_version(college, grade, namespace) for namespace in VERSION_NAMESPACES]
+        for grade in _grades(college, grade)
+    ]
+
+
+def export_filename(job):
+    """下载文件名（不含扩展名）"""
+    params = job.params
+    if job.kind == 'students':
+        name = '学生信息'
+    else:
+        name = SUBMISSION_STATUS_NAMES.get(params['status'], '审核材料')
+    return f"{params['college']}{params['grade'] or ''}{name}"
+
+
+def _rows(job):
+    params = job.params
+    if job.kind == 'students':
+        return EXPORT_HEADER, student_export_rows(params['college'], params['grade'])
+    submissions = submission_queryset(params['college'], params['grade'], params['status'], params['reviewer'])
+    return SUBMISSION_HEADER, submission_export_rows(submissions)
+
+
+def _count(job):
+    params = job.params
+    if job.kind == 'students':
+        return StudentProfile.objects.filter(
+            college=params['college'], grade__in=_grades(params['college'], params['grade'])
+        ).count()
+    return submission_queryset(params['college'], params['grade'], params['status'], params['reviewer']).count()
+
+
+def _usable(job):
+    if job.status == 'done':
+        return bool(job.file) and default_storage.exists(job.file.name)
+    if job.status == 'failed':
+        return False
+    return timezone.now() - job.updated_at < STALE_AFTER
+
+
+def request_export(user, kind, params, export_format='csv'):
+    """申请导出，返回 ExportJob
+
+    已有相同数据的文件或正在生成的同一任务时直接返回该任务，否则新建任务交给线程池生成。
+    """
+    params_key = _digest([kind, export_format, params])
+    fingerprint = _digest([kind, export_format, params, data_version(params['college'], params['grade'])])
+    job = ExportJob.objects.filter(fingerprint=fingerprint).order_by('-pk').first()
+    if job and _usable(job):
+        return job
+
+    job = ExportJob.objects.create(
+        kind=kind, export_format=export_format, params=params,
+        params_key=params_key, fingerprint=fingerprint, requested_by=user
+    )
+    transaction.on_commit(lambda: _executor.submit(run_export, job.pk))
+    return job
+
+
+def _update(job, **fields):
+    fields['updated_at'] = timezone.now()
+    for name, value in fields.items():
+        setattr(job, name, value)
+    ExportJob.objects.filter(pk=job.pk).update(**fields)
+
+
+def _tracked(job, rows):
+    """逐行转发，每 PROGRESS_EVERY 行记录一次进度"""
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % PROGRESS_EVERY == 0:
+            _update(job, progress=done)
+    job.progress = done
+
+
+def run_export(job_id):
+    """生成导出文件（在线程池中执行）"""
+    try:
+        job = ExportJob.objects.get(pk=job_id)
+        _update(job, status='running', total=_count(job))
+
+        name = f'exports/{job.fingerprint}.{job.export_format}'
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件，完整写完后再改名，下载时不会读到半个文件
+        partial = f'{path}.part'
+        header, rows = _rows(job)
+        with open(partial, 'wb') as output:
+            for chunk in stream_file(_tracked(job, rows), header, export_filename(job), job.export_format):
+                output.write(chunk)
+        os.replace(partial, path)
+
+        _update(job, status='done', progress=job.progress, file=name, finished_at=timezone.now())
+        _remove_outdated(job)
+    except Exception as exc:
+        logger.exception("导出任务 %s 失败", job_id)
+        ExportJob.objects.filter(pk=job_id).update(status='failed', error=str(exc), updated_at=timezone.now())
+    finally:
+        # 线程中打开的数据库连接不会被请求结束时的清理关闭
+        connections.close_all()
+
+
+def _remove_outdated(job):
+    """删除同参数、基于旧数据生成的文件及其任务记录"""
+    outdated = ExportJob.objects.filter(params_key=job.params_key, status='done').exclude(fingerprint=job.fingerprint)
+    for old in outdated:
+        if old.file:
+            old.file.delete(save=False)
+    outdated.delete()
+
+
+def can_access(user, job):
+    """超级管理员可访问所有任务；辅导员只能访问本学院本年级的导出"""
+    if user.is_superuser:
+        return True
+    counselor = getattr(user, 'counselor_profile', None)
+    if counselor is None:
+        return False
+    params = job.params
+    return (
+        params['college'] == counselor.college
+        and params['grade'] == counselor.grade
+        and params.get('reviewer') in (None, counselor.pk)
+    )
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counselors', '0007_alter_counselorprofile_college'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('students', '学生信息'), ('submissions', '审核材料')], max_length=20, verbose_name='导出内容')),
+                ('export_format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel')], default='csv', max_length=10, verbose_name='文件格式')),
+                ('params', models.JSONField(default=dict, verbose_name='导出参数')),
+                ('params_key', models.CharField(db_index=True, editable=False, max_length=64)),
+                ('fingerprint', models.CharField(db_index=True, editable=False, max_length=64)),
+                ('status', models.CharField(choices=[('pending', '排队中'), ('running', '生成中'), ('done', '已完成'), ('failed', '失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='已导出行数')),
+                ('total', models.PositiveIntegerField(blank=True, null=True, verbose_name='总行数')),
+                ('file', models.FileField(blank=True, upload_to='exports/', verbose_name='导出文件')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='更新时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='申请人')),
+            ],
+            options={
+                'verbose_name': '导出任务',
+                'verbose_name_plural': '导出任务',
+            },
+        ),
+    ]
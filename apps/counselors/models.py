@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class CounselorProfile(models.Model):
     """辅导员档案模型，关联Django用户系统"""
@@ -25,4 +26,53 @@ class CounselorProfile(models.Model):
     grade = models.CharField("负责年级", max_length=20, blank=True, default="无")
 
     def __str__(self):
-        return f"{self.full_name}（{self.college} {self.grade}）"
\ No newline at end of file
+        return f"{self.full_name}（{self.college} {self.grade}）"
+
+
+class ExportJob(models.Model):
+    """后台导出任务（见 jobs 模块），参数与数据版本相同的任务复用已生成的文件"""
+    KIND_CHOICES = [
+        ('students', '学生信息'),
+        ('submissions', '审核材料'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', '排队中'),
+        ('running', '生成中'),
+        ('done', '已完成'),
+        ('failed', '失败'),
+    ]
+    kind = models.CharField("导出内容", max_length=20, choices=KIND_CHOICES)
+    export_format = models.CharField("文件格式", max_length=10, choices=FORMAT_CHOICES, default='csv')
+    params = models.JSONField("导出参数", default=dict)
+    # params_key 只由导出内容和参数决定；fingerprint 另外包含数据版本，数据变化后不再命中
+    params_key = models.CharField(max_length=64, db_index=True, editable=False)
+    fingerprint = models.CharField(max_length=64, db_index=True, editable=False)
+    status = models.CharField("状态", max_length=10, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveIntegerField("已导出行数", default=0)
+    total = models.PositiveIntegerField("总行数", null=True, blank=True)
+    file = models.FileField("导出文件", upload_to='exports/', blank=True)
+    error = models.TextField("错误信息", blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='export_jobs', verbose_name="申请人")
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+    updated_at = models.DateTimeField("更新时间", default=timezone.now)
+    finished_at = models.DateTimeField("完成时间", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "导出任务"
+        verbose_name_plural = "导出任务"
+
+    def __str__(self):
+        return f"{self.get_kind_display()}导出#{self.pk}（{self.get_status_display()}）"
+
+    @property
+    def percent(self):
+        if self.status == 'done':
+            return 100
+        if not self.total:
+            return 0
+        return min(99, self.progress * 100 // self.total)
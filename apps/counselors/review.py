@@ -0,0 +1,256 @@
+# 审核操作：通过、驳回、重置。单条审核与批量审核共用这里的逻辑。
+#
+# 批量审核在一个事务内完成：提交记录的状态用一条带条件的 UPDATE 写回，通知用 bulk_create 一次插入。
+# 状态变化是有条件的：通过、驳回只作用于本学院本年级仍待审核、且不在其他辅导员租约期内的申请，
+# 重置只作用于本人审核过的申请。
+# 先读出满足条件的记录（支持行锁的数据库上用 SELECT ... FOR UPDATE 锁定；SQLite 没有行锁，这一步
+# 不提供任何保证），再以同样的条件更新，并以 UPDATE 的更新行数为准：读取之后被其他请求改动的记录
+# 不会被更新，也不会记入成绩流水或发送通知，重复提交或两位辅导员同时审核同一条申请时不会重复加分。
+# 重置时冲销的分数取自读取的核定加分，更新条件中同样带上这个值。
+# 加分变动先追加到成绩流水（ScoreLedgerEntry），再按学生汇总后在数据库内原子累加到
+# 学生档案（UPDATE ... SET 字段 = 字段 + 增量），不再读出整行修改后写回，
+# 并发审核同一学生时不会丢失加分。
+
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from functools import reduce
+from operator import or_
+
+from django.db import models, transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+from students.counters import touch_submissions
+from students.models import Notification, ScoreLedgerEntry, StudentProfile, Submission
+
+from .claims import held_by_others, pending_for
+
+REVIEWED = Q(approved=True) | Q(rejected=True)
+
+
+def reviewable(counselor, now=None):
+    """counselor 可以审核的申请：本学院本年级待审核，且未被其他辅导员在租约期内领取"""
+    return pending_for(counselor).exclude(held_by_others(counselor, now or timezone.now()))
+
+
+def _lock(queryset, ids, *fields):
+    """锁定 queryset 中 id 属于 ids 的记录，返回 {id: (fields 的值)}"""
+    rows = queryset.select_for_update().filter(pk__in=ids).values_list('pk', *fields)
+    return {row[0]: row[1:] for row in rows}
+
+
+class _Changed(Exception):
+    """整批更新的行数与预期不符"""
+
+
+def _update(queryset, rows, **changes):
+    """对 rows 中仍满足 queryset 条件、且字段仍为读取时的值的记录执行 UPDATE，返回实际更新的 id 集合
+
+    rows 为 {id: {字段: 读取时的值}}。先整批更新，更新行数与条数一致（通常情况）即全部成功；
+    不一致说明读取之后有记录被其他请求改动，回滚这一批后逐条更新，以每条的更新行数为准。
+    """
+    if any(rows.values()):
+        condition = reduce(or_, (Q(pk=pk, **values) for pk, values in rows.items()))
+    else:
+        condition = Q(pk__in=rows)
+    try:
+        with transaction.atomic():
+            if queryset.filter(condition).update(**changes) == len(rows):
+                return set(rows)
+            raise _Changed
+    except _Changed:
+        pass
+    return {pk for pk, values in rows.items() if queryset.filter(pk=pk, **values).update(**changes)}
+
+
+def parse_score(text):
+    """核定分值输入，未填写时为 0；不是数字时返回 None"""
+    try:
+        return Decimal(text.strip() or 0)
+    except InvalidOperation:
+        return None
+
+
+def score_error(submission, score):
+    """核定分值不合要求时返回错误说明：不能为负数，也不能超过细分分类的最大分值"""
+    if not score.is_finite():
+        return "核定分值无效"
+    if score < 0:
+        return "核定分值不能为负数"
+    max_score = submission.category.max_score
+    if max_score is not None and score > max_score:
+        return f"核定分值不能超过「{submission.category.name}」的最大分值 {max_score} 分"
+    return None
+
+
+def approve_submissions(counselor, approvals):
+    """审核通过，approvals 为 [(提交记录, 核定加分)]；已审核或被他人领取的记录跳过，返回实际处理条数"""
+    if not approvals:
+        return 0
+
+    queryset = reviewable(counselor)
+    with transaction.atomic():
+        pending = _lock(queryset, [submission.pk for submission, _ in approvals])
+        approvals = [(submission, score) for submission, score in approvals if submission.pk in pending]
+        if not approvals:
+            return 0
+
+        updated = _update(
+            queryset, {submission.pk: {} for submission, _ in approvals},
+            approved=True,
+            rejected=False,
+            approved_score=Case(
+                *[When(pk=submission.pk, then=Value(score)) for submission, score in approvals],
+                output_field=models.DecimalField(max_digits=5, decimal_places=1)
+            ),
+            reviewer=counselor,
+            claimed_by=None,  # 审核完成即释放领取
+            claim_expires_at=None,
+        )
+        approvals = [(submission, score) for submission, score in approvals if submission.pk in updated]
+
+        submissions = []
+        entries = []
+        for submission, score in approvals:
+            submission.approved = True
+            submission.rejected = False
+            submission.approved_score = score
+            submission.reviewer = counselor
+            submission.claimed_by = None
+            submission.claim_expires_at = None
+            submissions.append(submission)
+            # 按细分分类所属大类累加到对应成绩
+            entries.append(ScoreLedgerEntry(
+                student=submission.student,
+                submission=submission,
+                field=submission.category.score_field,
+                delta=Decimal(score or 0),
+                reason='approve',
+                operator=counselor,
+            ))
+
+        record_score_changes(entries)
+        touch_cohorts(submissions)
+        Notification.objects.bulk_create([
+            Notification(
+                recipient=submission.student.user,  # 接收通知的学生用户
+                title="材料审核通过",
+                content=f"您提交的「{submission.category.get_group_display()} - {submission.category.name}」材料已审核通过，核定加分：{submission.approved_score}分",
+                type='submission'  # 提交审核类型通知
+            )
+            for submission in submissions
+        ])
+    return len(submissions)
+
+
+def reject_submissions(counselor, submissions, reason):
+    """审核驳回；已审核或被他人领取的记录跳过，返回实际处理条数"""
+    if not submissions:
+        return 0
+
+    queryset = reviewable(counselor)
+    with transaction.atomic():
+        pending = _lock(queryset, [submission.pk for submission in submissions])
+        submissions = [submission for submission in submissions if submission.pk in pending]
+        if not submissions:
+            return 0
+
+        updated = _update(
+            queryset, {submission.pk: {} for submission in submissions},
+            approved=False,
+            rejected=True,
+            reject_reason=reason,
+            reviewer=counselor,
+            claimed_by=None,
+            claim_expires_at=None,
+        )
+        submissions = [submission for submission in submissions if submission.pk in updated]
+        for submission in submissions:
+            submission.approved = False
+            submission.rejected = True
+            submission.reject_reason = reason
+            submission.reviewer = counselor
+            submission.claimed_by = None
+            submission.claim_expires_at = None
+        touch_cohorts(submissions)
+        Notification.objects.bulk_create([
+            Notification(
+                recipient=submission.student.user,  # 接收通知的学生用户
+                title="材料审核未通过",
+                content=f"您提交的「{submission.category.get_group_display()} - {submission.category.name}」材料未通过审核，原因：{submission.reject_reason}",
+                type='submission'  # 提交审核类型通知
+            )
+            for submission in submissions
+        ])
+    return len(submissions)
+
+
+def reset_submissions(counselor, submissions):
+    """重置本人审核过的记录，已通过的冲销其加分；已被重置的记录跳过，返回实际处理条数"""
+    if not submissions:
+        return 0
+
+    reviewed = Submission.objects.filter(REVIEWED, reviewer=counselor)
+    with transaction.atomic():
+        # 冲销的分数取数据库中的核定加分，不用调用方手上可能已过时的对象；更新时核对该值未变
+        current = _lock(reviewed, [submission.pk for submission in submissions], 'approved', 'approved_score')
+        if not current:
+            return 0
+        updated = _update(
+            reviewed,
+            {pk: {'approved': approved, 'approved_score': score} for pk, (approved, score) in current.items()},
+            approved=False, rejected=False, approved_score=None, reject_reason=None, reviewer=None
+        )
+        submissions = [submission for submission in submissions if submission.pk in updated]
+        if not submissions:
+            return 0
+
+        entries = [
+            ScoreLedgerEntry(
+                student=submission.student,
+                submission=submission,
+                field=submission.category.score_field,
+                delta=-Decimal(current[submission.pk][1] or 0),
+                reason='reset',
+                operator=counselor,
+            )
+            for submission in submissions if current[submission.pk][0]
+        ]
+        for submission in submissions:
+            submission.approved = False
+            submission.rejected = False
+            submission.approved_score = None
+            submission.reject_reason = None
+            submission.reviewer = None
+        record_score_changes(entries)
+        touch_cohorts(submissions)
+        Notification.objects.bulk_create([
+            Notification(
+                recipient=submission.student.user,
+                title="材料审核状态更新",
+                content=f"您提交的「{submission.category.get_group_display()} - {submission.category.name}」材料审核状态已重置，将重新审核",
+                type='submission'
+            )
+            for submission in submissions
+        ])
+    return len(submissions)
+
+
+def record_score_changes(entries):
+    """写入成绩流水，并把同一学生的变动汇总后原子累加到学生档案"""
+    entries = [entry for entry in entries if entry.delta]
+    if not entries:
+        return
+
+    increments = defaultdict(lambda: defaultdict(Decimal))
+    for entry in entries:
+        increments[entry.student_id][entry.field] += entry.delta
+
+    ScoreLedgerEntry.objects.bulk_create(entries, batch_size=500)
+    StudentProfile.objects.increment_scores(increments)
+
+
+def touch_cohorts(submissions):
+    """审核状态变化后使相关学院年级的提交计数缓存失效"""
+    for college, grade in {(submission.student.college, submission.student.grade) for submission in submissions}:
+        touch_submissions(college, grade)
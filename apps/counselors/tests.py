@@ -1,3 +1,578 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from students.models import Notification, ScoreLedgerEntry, StudentProfile, Submission, SubmissionCategory
+from students.storage import upload_storage
+from . import jobs
+from .academic import cohort_scores, parse_score, read_score_csv, validate_scores
+from .claims import claim_one
+from .dashboard import dashboard_stats, week_start
+from .exports import EXPORT_HEADER, stream_csv
+from .models import CounselorProfile, ExportJob
+from .review import approve_submissions, reject_submissions, reset_submissions
+
+
+class ReviewTransitionTests(TestCase):
+    """审核状态变化只对仍处于对应状态的申请生效：重复或并发审核不会重复加分"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = SubmissionCategory.objects.filter(group='competition').first()
+        cls.student = StudentProfile.objects.create(
+            user=User.objects.create_user('review_student', password='x'),
+            student_id='20970001', college='info', grade='2023'
+        )
+        cls.counselors = [
+            CounselorProfile.objects.create(
+                user=User.objects.create_user(f'review_counselor{i}', password='x'),
+                full_name=f'辅导员{i}', employee_id=f'REVIEW0{i}', college='info', grade='2023'
+            )
+            for i in range(2)
+        ]
+        cls.other_counselor = CounselorProfile.objects.create(
+            user=User.objects.create_user('review_other', password='x'),
+            full_name='其他学院辅导员', employee_id='REVIEW09', college='other', grade='2023'
+        )
+
+    def setUp(self):
+        self.submission = Submission.objects.create(student=self.student, category=self.category, self_rating=2)
+
+    def load(self):
+        """审核页面加载的申请（各自独立的对象，模拟两次请求）"""
+        return Submission.objects.select_related('category', 'student__user').get(pk=self.submission.pk)
+
+    def score(self):
+        return StudentProfile.objects.get(pk=self.student.pk).academic_expertise_score
+
+    def test_repeated_approval_counts_once(self):
+        submission = self.load()
+        self.assertEqual(approve_submissions(self.counselors[0], [(submission, Decimal(2))]), 1)
+        self.assertEqual(approve_submissions(self.counselors[0], [(submission, Decimal(2))]), 0)
+
+        self.assertEqual(ScoreLedgerEntry.objects.filter(submission=self.submission).count(), 1)
+        self.assertEqual(self.score(), Decimal(2))
+        self.assertEqual(Notification.objects.filter(recipient=self.student.user).count(), 1)
+
+    def test_concurrent_review_applies_first_only(self):
+        # 两位辅导员同时打开同一条申请，先提交的生效，后提交的拿着过时的对象不再修改
+        first, second = self.load(), self.load()
+        self.assertEqual(approve_submissions(self.counselors[0], [(first, Decimal(2))]), 1)
+        self.assertEqual(approve_submissions(self.counselors[1], [(second, Decimal(3))]), 0)
+        self.assertEqual(reject_submissions(self.counselors[1], [self.load()], '材料不全'), 0)
+
+        submission = self.load()
+        self.assertTrue(submission.approved)
+        self.assertFalse(submission.rejected)
+        self.assertEqual(submission.approved_score, Decimal(2))
+        self.assertEqual(submission.reviewer, self.counselors[0])
+        self.assertEqual(self.score(), Decimal(2))
+
+    def test_claimed_by_other_is_not_reviewed(self):
+        # 审核页面加载时尚未被领取，提交前另一位辅导员领取了该申请
+        submission = self.load()
+        self.assertTrue(claim_one(self.counselors[1], self.load()))
+        self.assertEqual(approve_submissions(self.counselors[0], [(submission, Decimal(2))]), 0)
+        self.assertEqual(reject_submissions(self.counselors[0], [submission], '材料不全'), 0)
+        self.assertFalse(self.load().approved or self.load().rejected)
+
+        self.client.force_login(self.counselors[0].user)
+        self.client.post(reverse('approve_submission', args=[self.submission.pk]), {'approved_score': '2'})
+        self.client.post(reverse('batch_review'), {'action': 'approve', 'submission_ids': [self.submission.pk]})
+        self.assertFalse(self.load().approved)
+        self.assertEqual(self.score(), Decimal(0))
+
+        # 领取人可以审核
+        self.assertEqual(approve_submissions(self.counselors[1], [(self.load(), Decimal(2))]), 1)
+        self.assertIsNone(self.load().claimed_by)
+
+    def test_repeated_reset_reverses_once(self):
+        approve_submissions(self.counselors[0], [(self.load(), Decimal(2))])
+        first, second = self.load(), self.load()
+        self.assertEqual(reset_submissions(self.counselors[0], [first]), 1)
+        self.assertEqual(reset_submissions(self.counselors[0], [second]), 0)
+
+        self.assertEqual(self.score(), Decimal(0))
+        self.assertEqual(
+            list(ScoreLedgerEntry.objects.filter(submission=self.submission).order_by('id').values_list('reason', 'delta')),
+            [('approve', Decimal(2)), ('reset', Decimal(-2))]
+        )
+
+    def test_reset_only_own_reviews(self):
+        approve_submissions(self.counselors[0], [(self.load(), Decimal(2))])
+        self.assertEqual(reset_submissions(self.counselors[1], [self.load()]), 0)
+        self.assertTrue(self.load().approved)
+
+    def test_row_changed_after_read_is_not_recorded(self):
+        # 没有行锁时（SQLite），读取之后、更新之前记录已被其他请求审核：以 UPDATE 的更新行数为准
+        other = Submission.objects.create(student=self.student, category=self.category, self_rating=1)
+        submission = self.load()
+        pending = Submission.objects.select_related('category', 'student__user').get(pk=other.pk)
+        approve_submissions(self.counselors[1], [(self.load(), Decimal(3))])
+
+        stale = {submission.pk: (), pending.pk: ()}
+        with mock.patch('counselors.review._lock', return_value=stale):
+            self.assertEqual(approve_submissions(self.counselors[0], [(submission, Decimal(2))]), 0)
+            self.assertEqual(
+                approve_submissions(self.counselors[0], [(submission, Decimal(2)), (pending, Decimal(1))]), 1
+            )
+        self.assertEqual(self.score(), Decimal(4))
+        self.assertEqual(ScoreLedgerEntry.objects.filter(submission=self.submission).count(), 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.student.user).count(), 2)
+
+        # 重置时读取的核定加分已过时（已被改为 3 分），不按过时的分数冲销
+        with mock.patch('counselors.review._lock', return_value={submission.pk: (True, Decimal(2))}):
+            self.assertEqual(reset_submissions(self.counselors[1], [submission]), 0)
+        self.assertEqual(self.score(), Decimal(4))
+        self.assertEqual(reset_submissions(self.counselors[1], [submission]), 1)
+        self.assertEqual(self.score(), Decimal(1))
+
+    def test_empty_score_is_zero(self):
+        # 单条与批量审核对未填写的核定分值处理一致
+        other = Submission.objects.create(student=self.student, category=self.category, self_rating=1)
+        self.client.force_login(self.counselors[0].user)
+        self.client.post(reverse('approve_submission', args=[self.submission.pk]), {'approved_score': ''})
+        self.client.post(reverse('batch_review'), {
+            'action': 'approve', 'submission_ids': [other.pk], f'score_{other.pk}': ''
+        })
+        self.assertEqual(
+            list(Submission.objects.filter(approved=True).order_by('pk').values_list('approved_score', flat=True)),
+            [Decimal(0), Decimal(0)]
+        )
+
+    def test_approve_view_rejects_reviewed_submission(self):
+        self.client.force_login(self.counselors[0].user)
+        url = reverse('approve_submission', args=[self.submission.pk])
+        self.client.post(url, {'approved_score': '2'})
+        self.client.post(url, {'approved_score': '2'})
+        self.client.post(reverse('reject_submission', args=[self.submission.pk]), {'reject_reason': '重复'})
+
+        submission = self.load()
+        self.assertTrue(submission.approved)
+        self.assertEqual(self.score(), Decimal(2))
+        self.assertEqual(ScoreLedgerEntry.objects.filter(submission=self.submission).count(), 1)
+
+    def test_score_within_category_range(self):
+        self.client.force_login(self.counselors[0].user)
+        url = reverse('approve_submission', args=[self.submission.pk])
+        for score in ('-1', str(self.category.max_score + 1), 'NaN'):
+            with self.subTest(score=score):
+                self.client.post(url, {'approved_score': score})
+                self.client.post(reverse('batch_review'), {
+                    'action': 'approve', 'submission_ids': [self.submission.pk], f'score_{self.submission.pk}': score
+                })
+                self.assertFalse(self.load().approved)
+
+        self.client.post(url, {'approved_score': str(self.category.max_score)})
+        self.assertEqual(self.load().approved_score, self.category.max_score)
+
+    def test_review_views_scoped_to_cohort(self):
+        self.client.force_login(self.other_counselor.user)
+        response = self.client.post(reverse('approve_submission', args=[self.submission.pk]), {'approved_score': '2'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(reverse('reject_submission', args=[self.submission.pk]), {'reject_reason': '无'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(approve_submissions(self.other_counselor, [(self.load(), Decimal(2))]), 0)
+
+        submission = self.load()
+        self.assertFalse(submission.approved or submission.rejected)
+
+
+class DashboardStatsTests(TestCase):
+    """控制台统计：各项计数正确，按学院年级缓存，提交、审核、删除和学生增减后失效"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = SubmissionCategory.objects.first()
+        cls.counselor = CounselorProfile.objects.create(
+            user=User.objects.create_user('dashboard_counselor', password='x'),
+            full_name='辅导员', employee_id='DASH01', college='info', grade='2023'
+        )
+        cls.students = [
+            StudentProfile.objects.create(
+                user=User.objects.create(username=f'dashboard{i}'), student_id=f'2098000{i}',
+                college=college, grade='2023'
+            )
+            for i, college in enumerate(['info', 'info', 'other'])
+        ]
+
+    def setUp(self):
+        cache.clear()
+        info, _, other = self.students
+        self.pending = [Submission.objects.create(student=info, category=self.category) for _ in range(2)]
+        Submission.objects.create(student=info, category=self.category, approved=True, approved_score=1)
+        last_week = Submission.objects.create(student=info, category=self.category, approved=True, approved_score=1)
+        Submission.objects.filter(pk=last_week.pk).update(timestamp=week_start() - timedelta(days=1))
+        Submission.objects.create(student=info, category=self.category, rejected=True)
+        Submission.objects.create(student=other, category=self.category)
+
+    def stats(self):
+        stats = dashboard_stats('info', '2023')
+        return (stats['total_students'], stats['pending_count'], stats['handled_this_week'],
+                [submission.pk for submission in stats['latest_pending_submissions']])
+
+    def test_counts(self):
+        self.assertEqual(self.stats(), (2, 2, 1, [self.pending[1].pk, self.pending[0].pk]))
+
+        self.client.force_login(self.counselor.user)
+        response = self.client.get(reverse('counselor_dashboard'))
+        self.assertEqual((response.context['total_students'], response.context['pending_count'],
+                          response.context['handled_this_week']), (2, 2, 1))
+
+    def test_cache_invalidation(self):
+        self.stats()
+        with self.assertNumQueries(0):
+            self.stats()
+
+        submission = Submission.objects.select_related('category', 'student__user').get(pk=self.pending[0].pk)
+        approve_submissions(self.counselor, [(submission, Decimal(1))])
+        self.assertEqual(self.stats(), (2, 1, 2, [self.pending[1].pk]))
+
+        Submission.objects.get(pk=self.pending[1].pk).delete()
+        self.assertEqual(self.stats(), (2, 0, 2, []))
+
+        StudentProfile.objects.create(user=User.objects.create(username='dashboard_new'), student_id='20980009',
+                                      college='info', grade='2023')
+        self.assertEqual(self.stats()[0], 3)
+
+
+class StudentExportTests(TestCase):
+    """学生信息流式导出：带 BOM 的 CSV，按名次排列，只含本学院本年级"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counselor = CounselorProfile.objects.create(
+            user=User.objects.create_user('export_counselor', password='x'),
+            full_name='辅导员', employee_id='EXPORT01', college='info', grade='2023'
+        )
+        for i, (college, score) in enumerate([('info', 80), ('info', 90), ('info', None), ('other', 100)]):
+            StudentProfile.objects.create(
+                user=User.objects.create(username=f'export{i}'), student_id=f'2099100{i}', full_name=f'学生,{i}',
+                college=college, grade='2023', academic_comprehensive_score=score
+            )
+
+    def test_csv_export(self):
+        self.client.force_login(self.counselor.user)
+        response = self.client.get(reverse('export_students'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment', response['Content-Disposition'])
+
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('\ufeff'))
+        rows = list(csv.reader(io.StringIO(content[1:])))
+        self.assertEqual(rows[0], EXPORT_HEADER)
+        self.assertEqual([(row[0], row[1], row[9], row[10], row[11]) for row in rows[1:]], [
+            ('20991001', '学生,1', '54.0', '1', '50.0%'),
+            ('20991000', '学生,0', '48.0', '2', '100.0%'),
+            ('20991002', '学生,2', '', '3', ''),
+        ])
+
+    def test_stream_csv_chunks(self):
+        # BOM 和表头单独作为第一块立即发送，之后每块 chunk_size 行
+        chunks = list(stream_csv(([i, f'行{i}'] for i in range(5)), header=['编号', '内容'], chunk_size=2))
+        self.assertEqual(chunks[0], '\ufeff编号,内容\r\n')
+        self.assertEqual(chunks[1:], ['0,行0\r\n1,行1\r\n', '2,行2\r\n3,行3\r\n', '4,行4\r\n'])
+        self.assertEqual(list(stream_csv([], header=['编号'])), ['\ufeff编号\r\n'])
+
+
+class ExportJobTests(TestCase):
+    """后台导出任务：按数据版本去重，生成成功与失败，访问权限"""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counselor = CounselorProfile.objects.create(
+            user=User.objects.create_user('job_counselor', password='x'),
+            full_name='辅导员', employee_id='JOB01', college='info', grade='2023'
+        )
+        cls.students = [
+            StudentProfile.objects.create(
+                user=User.objects.create(username=f'job{i}'), student_id=f'2099200{i}',
+                college='info', grade=grade, academic_comprehensive_score=80 + i
+            )
+            for i, grade in enumerate(['2023', '2023', '2024'])
+        ]
+
+    def setUp(self):
+        cache.clear()
+        # 线程池中的任务在这里同步执行；测试的数据库连接不能被任务关闭
+        self.enterContext(mock.patch.object(jobs, 'connections'))
+        self.params = {'college': 'info', 'grade': '2023'}
+
+    def request(self, params=None, export_format='csv'):
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = jobs.request_export(self.counselor.user, 'students', params or self.params, export_format)
+        return job, callbacks
+
+    def test_dedupe_by_fingerprint(self):
+        job, callbacks = self.request()
+        self.assertEqual(len(callbacks), 1)
+        # 正在生成的同一任务直接返回，不再排队
+        self.assertEqual(self.request(), (job, []))
+        self.assertNotEqual(self.request(export_format='xlsx')[0], job)
+        self.assertNotEqual(self.request({'college': 'info', 'grade': '2024'})[0], job)
+
+        # 数据变化后重新生成
+        student = self.students[0]
+        student.academic_comprehensive_score = 99
+        student.save()
+        self.assertNotEqual(self.request()[0], job)
+
+        # 生成中的任务长时间没有进度视为已中断
+        ExportJob.objects.update(updated_at=timezone.now() - jobs.STALE_AFTER * 2)
+        self.assertEqual(len(self.request()[1]), 1)
+
+    def test_run_export(self):
+        job, _ = self.request()
+        jobs.run_export(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.progress, job.total), ('done', 2, 2))
+        with job.file.open('rb') as f:
+            rows = list(csv.reader(io.StringIO(f.read().decode('utf-8-sig'))))
+        self.assertEqual([row[0] for row in rows], ['学号', '20992001', '20992000'])
+        self.assertEqual(self.request(), (job, []))
+
+        # 全学院导出包含各年级
+        whole, _ = self.request({'college': 'info', 'grade': ''})
+        jobs.run_export(whole.pk)
+        whole.refresh_from_db()
+        self.assertEqual((whole.status, whole.progress, whole.total), ('done', 3, 3))
+
+        # 数据变化后重新生成，同参数的旧文件和任务一并删除
+        old_path = job.file.path
+        self.students[1].delete()
+        new_job, _ = self.request()
+        jobs.run_export(new_job.pk)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertFalse(ExportJob.objects.filter(pk=job.pk).exists())
+        self.assertTrue(ExportJob.objects.filter(pk=whole.pk).exists())
+
+    def test_run_export_failure(self):
+        job, _ = self.request()
+        with mock.patch.object(jobs, 'stream_file', side_effect=OSError('磁盘已满')), self.assertLogs(jobs.logger):
+            jobs.run_export(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', '磁盘已满'))
+        self.assertFalse(job.file)
+        # 失败的任务不复用，再次申请时重新生成
+        retry, callbacks = self.request()
+        self.assertNotEqual(retry, job)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_can_access(self):
+        job, _ = self.request()
+        reviewed = ExportJob(kind='submissions', params={**self.params, 'status': 'reviewed', 'reviewer': 0})
+        other = CounselorProfile.objects.create(
+            user=User.objects.create_user('job_other', password='x'),
+            full_name='其他', employee_id='JOB02', college='info', grade='2024'
+        )
+        admin = User.objects.create_superuser('job_admin', password='x')
+
+        self.assertTrue(jobs.can_access(self.counselor.user, job))
+        self.assertTrue(jobs.can_access(admin, job))
+        self.assertFalse(jobs.can_access(other.user, job))
+        self.assertFalse(jobs.can_access(self.students[0].user, job))
+        self.assertFalse(jobs.can_access(self.counselor.user, reviewed))  # 他人审核记录的导出
+
+
+class AcademicScoreTests(TestCase):
+    """学业综合成绩批量录入：解析、校验、CSV 读取和整批写入"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counselor = CounselorProfile.objects.create(
+            user=User.objects.create_user('score_counselor', password='x'),
+            full_name='辅导员', employee_id='SC01', college='info', grade='2023'
+        )
+        cls.students = [
+            StudentProfile.objects.create(
+                user=User.objects.create(username=f'score{i}'), student_id=f'2099300{i}',
+                college='info', grade='2023', academic_comprehensive_score=score
+            )
+            for i, score in enumerate([Decimal('80.0'), Decimal('70.0')])
+        ]
+        StudentProfile.objects.create(
+            user=User.objects.create(username='score_other'), student_id='20993009', college='info', grade='2024'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_parse_score(self):
+        self.assertEqual(parse_score(' 85.5 '), (Decimal('85.5'), None))
+        self.assertEqual(parse_score('90.00'), (Decimal('90.0'), None))
+        self.assertEqual(parse_score('0'), (Decimal('0.0'), None))
+        self.assertEqual(parse_score('100'), (Decimal('100.0'), None))
+        self.assertEqual(parse_score(''), (None, None))
+        self.assertEqual(parse_score(None), (None, None))
+        self.assertEqual(parse_score('85.55')[1], "成绩最多保留一位小数")
+        self.assertEqual(parse_score('abc')[1], "“abc”不是有效的数字")
+        for text in ('100.1', '-1', 'NaN', 'Infinity', '-inf'):
+            self.assertEqual(parse_score(text), (None, "成绩须在 0 - 100 之间"), text)
+
+    def test_validate_scores(self):
+        cohort = cohort_scores('info', '2023')
+        self.assertEqual(set(cohort), {'20993000', '20993001'})
+        first, second = self.students
+        changes, errors = validate_scores(cohort, [
+            (2, '20993000', '80'),   # 与当前成绩相同，不写入
+            (3, ' 20993001 ', '75.5'),
+            (4, '20993009', '60'),   # 其他年级
+            (5, '20993001', '60'),
+            (6, '', '60'),
+        ])
+        self.assertEqual(changes, {second.pk: Decimal('75.5')})
+        self.assertEqual(errors, [
+            (4, '20993009', "不是本学院本年级的学生"),
+            (5, '20993001', "学号重复"),
+            (6, '', "缺少学号"),
+        ])
+        self.assertEqual(validate_scores(cohort, [(2, '20993000', ''), (3, '20993001', ' ')]), ({}, []))  # 空白表示不修改
+
+    def test_read_score_csv(self):
+        content = '姓名,学业综合成绩,学号\n甲,85,20993000\n,,\n乙,,20993001\n丙\n'
+        expected = [(2, '20993000', '85'), (4, '20993001', ''), (5, '', '')]
+        for encoding in ('utf-8', 'utf-8-sig', 'gbk'):
+            upload = SimpleUploadedFile('scores.csv', content.encode(encoding))
+            self.assertEqual(read_score_csv(upload), (expected, None), encoding)
+
+        upload = SimpleUploadedFile('scores.csv', 'student_id,academic_comprehensive_score\n20993000,90\n'.encode())
+        self.assertEqual(read_score_csv(upload), ([(2, '20993000', '90')], None))
+        for data in ('学号,成绩\n20993000,90\n'.encode(), b''):
+            self.assertEqual(read_score_csv(SimpleUploadedFile('scores.csv', data)),
+                             ([], "表头须包含“学号”和“学业综合成绩”两列"))
+        self.assertEqual(read_score_csv(SimpleUploadedFile('scores.csv', b'\xff\xfe\xff')),
+                         ([], "无法识别文件编码，请保存为 UTF-8 或 GBK 编码的 CSV"))
+
+    def scores(self):
+        return list(StudentProfile.objects.filter(pk__in=[s.pk for s in self.students])
+                    .order_by('student_id').values_list('academic_comprehensive_score', 'total_score'))
+
+    def test_grid_update(self):
+        self.client.force_login(self.counselor.user)
+        url = reverse('academic_scores')
+        self.assertContains(self.client.get(url), 'name="score_20993001"')
+        response = self.client.post(url, {'score_20993000': '80', 'score_20993001': '92.5'})
+        self.assertRedirects(response, url)
+        self.assertEqual(self.scores(), [(Decimal('80.0'), Decimal('48.0')), (Decimal('92.5'), Decimal('55.5'))])
+        self.assertEqual(StudentProfile.objects.get(pk=self.students[1].pk).rank_entry.rank, 1)
+
+    def test_invalid_row_writes_nothing(self):
+        self.client.force_login(self.counselor.user)
+        before = self.scores()
+        response = self.client.post(reverse('academic_scores'), {'score_20993000': '95', 'score_20993001': '101'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['errors'], [(None, '20993001', "成绩须在 0 - 100 之间")])
+        self.assertContains(response, 'value="101"')  # 回填已输入的值
+        self.assertEqual(self.scores(), before)
+
+        upload = SimpleUploadedFile('scores.csv', '学号,学业综合成绩\n20993000,95\n20993009,60\n'.encode())
+        response = self.client.post(reverse('academic_scores'), {'file': upload})
+        self.assertEqual(response.context['errors'], [(3, '20993009', "不是本学院本年级的学生")])
+        self.assertEqual(self.scores(), before)
+
+    def test_csv_upload(self):
+        self.client.force_login(self.counselor.user)
+        upload = SimpleUploadedFile('scores.csv', '学号,学业综合成绩\n20993001,88\n'.encode('gbk'))
+        self.assertRedirects(self.client.post(reverse('academic_scores'), {'file': upload}), reverse('academic_scores'))
+        self.assertEqual(self.scores()[1], (Decimal('88.0'), Decimal('52.8')))
+
+    def test_requires_counselor(self):
+        self.client.force_login(self.students[0].user)
+        self.assertRedirects(self.client.get(reverse('academic_scores')), reverse('login'),
+                             fetch_redirect_response=False)
+
+
+class EvidenceExportTests(TestCase):
+    """证明材料打包下载：清单与附件组成合法的 zip，只含本学院本年级、所选状态的申请"""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        category = SubmissionCategory.objects.first()
+        cls.counselor = CounselorProfile.objects.create(
+            user=User.objects.create_user('evidence_counselor', password='x'),
+            full_name='辅导员', employee_id='EVIDENCE01', college='info', grade='2023'
+        )
+        students = [
+            StudentProfile.objects.create(
+                user=User.objects.create_user(f'evidence{i}', password='x'), student_id=f'2092000{i}',
+                full_name=f'学生{i}', college=college, grade='2023'
+            )
+            for i, college in enumerate(('info', 'info', 'other'))
+        ]
+
+        def submit(student, content, approved=True):
+            return Submission.objects.create(
+                student=student, category=category, approved=approved, approved_score=1 if approved else None,
+                file=SimpleUploadedFile('proof.pdf', content)
+            )
+
+        cls.approved = [submit(students[0], b'%PDF-first'), submit(students[1], b'%PDF-second')]
+        cls.pending = submit(students[0], b'%PDF-pending', approved=False)
+        submit(students[2], b'%PDF-other')  # 其他学院
+        # 附件已丢失的记录只出现在清单中
+        cls.missing = submit(students[1], b'%PDF-missing')
+        upload_storage.delete(cls.missing.file.name)
+
+    def setUp(self):
+        self.client.force_login(self.counselor.user)
+
+    def download(self, **params):
+        response = self.client.get(reverse('export_evidence'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        manifest = list(csv.reader(io.StringIO(archive.read('manifest.csv').decode('utf-8-sig'))))
+        return archive, manifest
+
+    def test_approved_evidence(self):
+        archive, manifest = self.download()
+        self.assertEqual(archive.namelist()[0], 'manifest.csv')
+        rows = {int(row[0]): row for row in manifest[1:]}
+        self.assertEqual(set(rows), {submission.pk for submission in self.approved} | {self.missing.pk})
+        self.assertEqual(rows[self.missing.pk][9], '文件缺失')
+
+        # 附件按清单顺序排列
+        self.assertEqual(archive.namelist()[1:], [row[8] for row in manifest[1:] if row[8]])
+        for submission in self.approved:
+            member = rows[submission.pk][8]
+            with submission.file.open('rb') as f:
+                self.assertEqual(archive.read(member), f.read())
+            self.assertEqual(archive.getinfo(member).compress_type, zipfile.ZIP_STORED)
+
+    def test_filters(self):
+        archive, manifest = self.download(status='pending')
+        self.assertEqual([int(row[0]) for row in manifest[1:]], [self.pending.pk])
+
+        student_id = self.approved[1].student.student_id
+        archive, manifest = self.download(student=student_id)
+        self.assertEqual({row[1] for row in manifest[1:]}, {student_id})
+        self.assertEqual(len(archive.namelist()), 2)
@@ -8,6 +8,12 @@ urlpatterns = [
     path('profile/', views.counselor_profile, name='counselor_profile'),
     path('students/', views.view_all_students, name='view_all_students'),
     path('export-students/', views.export_students, name='export_students'),
+    path('export-submissions/', views.export_submissions, name='export_submissions'),
+    path('export-evidence/', views.export_evidence, name='export_evidence'),
+    path('exports/', views.request_export_job, name='request_export_job'),
+    path('exports/<int:job_id>/', views.export_job_detail, name='export_job_detail'),
+    path('exports/<int:job_id>/status/', views.export_job_status, name='export_job_status'),
+    path('exports/<int:job_id>/download/', views.export_job_download, name='export_job_download'),
     path('dashboard/', views.counselor_dashboard, name='counselor_dashboard'),
     path('review/', views.review_submissions, name='review_submissions'),
     path('reviewed/', views.reviewed_submissions, name='reviewed_submissions'),
@@ -21,5 +27,10 @@ urlpatterns = [
     path('approve/<int:submission_id>/', views.approve_submission, name='approve_submission'),
     path('reject/<int:submission_id>/', views.reject_submission, name='reject_submission'),
     path('review/<int:submission_id>/', views.review_detail, name='review_detail'),
+    path('review/<int:submission_id>/preview/<str:size>/', views.submission_preview, name='submission_preview'),
+    path('review/batch/', views.batch_review, name='batch_review'),
+    path('review/claim/', views.claim_submissions, name='claim_submissions'),
+    path('review/release/', views.release_submissions, name='release_submissions'),
     path('set-score/<int:student_id>/', views.set_academic_score, name='set_academic_score'),
+    path('academic-scores/', views.academic_scores, name='academic_scores'),
 ]
\ No newline at end of file
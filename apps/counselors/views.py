@@ -3,18 +3,38 @@ from django.contrib import messages
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.models import User
-from .models import CounselorProfile
+from .models import CounselorProfile, ExportJob
 from django import forms
 from django.contrib.auth.decorators import login_required
 from students.models import StudentProfile, Submission, Rule, Notification
+from students.distribution import cohort_distribution
 from django.contrib.auth import logout
 from decimal import Decimal, InvalidOperation
 from django.utils import timezone
-from datetime import timedelta
 from .forms import RuleForm
+from .review import (
+    approve_submissions, parse_score, reject_submissions, reset_submissions, reviewable, score_error
+)
+from .dashboard import dashboard_stats, rules_count
+from .exports import (
+    EXPORT_HEADER, SUBMISSION_HEADER, content_type_for, export_response,
+    student_export_rows, submission_export_rows, submission_queryset
+)
+from .evidence import stream_evidence
+from .academic import cohort_scores, read_score_csv, validate_scores
+from .jobs import can_access, export_filename, request_export
+from .claims import MAX_CLAIM, claim_next, claim_one, claim_quota, is_held_by_other, release_claims
+from students.counters import cached_count
+from students.pagination import keyset_paginate
+from students.projections import STUDENT_LIST, STUDENT_SCORE_GRID
 from django.urls import reverse
-from django.http import HttpResponse,Http404
-import csv
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from students.media import media_response
+from students.storage import upload_storage
+from students.previews import (
+    PREVIEW, THUMBNAIL, content_type as preview_content_type, generate_previews, preview_name, previewable
+)
 from django.db.models import Q
 
 
@@ -102,47 +122,16 @@ def counselor_dashboard(request):
     counselor_college = counselor.college
     counselor_grade = counselor.grade
 
-    # 获取待审核申请(只显示本学院学生的申请)
-    latest_pending_submissions = Submission.objects.filter(
-        approved=False,
-        rejected=False,
-        student__college=counselor_college,  # 过滤学生学院
-        student__grade=counselor_grade       # 过滤学生年级
-    ).select_related('student').order_by('-timestamp')[:5]
-
-    # 辅导员控制面板中的待审核数量统计
-    pending_count = Submission.objects.filter(
-        approved=False,
-        rejected=False,
-        student__college=counselor_college,  # 过滤学生学院
-        student__grade=counselor_grade       # 过滤学生年级
-    ).count()
-
-    # 计算本周处理数
-    today = timezone.now().date()
-    start_of_week = today - timedelta(days=today.weekday())
-    handled_this_week = Submission.objects.filter(
-        approved=True,
-        timestamp__date__gte=start_of_week,
-        student__college=counselor_college,  # 过滤学生学院
-        student__grade=counselor_grade       # 过滤学生年级
-    ).count()
-
-    # 计算当前生效的加分规则总数
-    rules_count = Rule.objects.count()
-
-    # 只统计本学院本年级的学生
-    total_students = StudentProfile.objects.filter(
-        college=counselor_college,
-        grade=counselor_grade
-    ).count()
+    # 待审核数、本周通过数、学生数和最新待审核申请（一条统计查询，按学院年级缓存）
+    stats = dashboard_stats(counselor_college, counselor_grade)
 
     return render(request, 'counselors/dashboard.html', {
-        'pending_count': pending_count,
-        'total_students': total_students,
-        'latest_pending_submissions': latest_pending_submissions,
-        'rules_count': rules_count,  # 传递规则数量到模板
-        'handled_this_week': handled_this_week  # 传递周处理数到模板
+        'pending_count': stats['pending_count'],
+        'total_students': stats['total_students'],
+        'latest_pending_submissions': stats['latest_pending_submissions'],
+        'rules_count': rules_count(),  # 传递规则数量到模板
+        'handled_this_week': stats['handled_this_week'],  # 传递周处理数到模板
+        'score_distribution': cohort_distribution(counselor_college, counselor_grade)  # 本学院本年级成绩分布（缓存）
     })
 
 
@@ -186,50 +175,99 @@ def review_submissions(request):
     counselor_college = request.user.counselor_profile.college
     counselor_grade = request.user.counselor_profile.grade
 
+    counselor = request.user.counselor_profile
     pending_submissions = Submission.objects.filter(
         approved=False,  # 未通过
         rejected=False,  # 未驳回
-        student__college=counselor_college,     # 仅显示本学院学生的提交
-        student__grade=counselor_grade          # 仅显示本年级学生的提交
-    ).select_related('student').order_by('-timestamp')  # 保留预加载 student，避免模板报错
+        college=counselor_college,     # 仅显示本学院学生的提交
+        grade=counselor_grade          # 仅显示本年级学生的提交
+    )
+    now = timezone.now()
+    my_claims = pending_submissions.filter(claimed_by=counselor, claim_expires_at__gte=now)
+
+    # 按 (提交时间, id) 游标分页，总数取缓存计数；mine=1 时只看自己领取的申请
+    mine = request.GET.get('mine') == '1'
+    if mine:
+        listed, total = my_claims, my_claims.count()
+    else:
+        listed = pending_submissions
+        total = cached_count('pending', counselor_college, counselor_grade, pending_submissions)
+    page = keyset_paginate(
+        listed.select_related('student', 'category', 'claimed_by'),  # 模板逐行显示学生、分类和领取人
+        request.GET,
+        total=total
+    )
+    for submission in page.items:
+        submission.held_by_other = is_held_by_other(submission, counselor, now)
 
     return render(request, 'counselors/review_submissions.html', {
-        'submissions': pending_submissions  # 传给模板的只有待审核数据
+        'submissions': page.items,  # 传给模板的只有待审核数据
+        'page': page,
+        'mine': mine,
+        'my_claim_count': total if mine else my_claims.count(),
+        'claim_quota': min(claim_quota(counselor, now), MAX_CLAIM),
     })
 
 
+# 领取待审核申请：按提交时间领取若干条，租约期内由本人独占审核
+@login_required
+def claim_submissions(request):
+    if not hasattr(request.user, 'counselor_profile'):
+        return redirect('login')
+    if request.method != 'POST':
+        return redirect('review_submissions')
+
+    try:
+        count = int(request.POST.get('count') or 10)
+    except ValueError:
+        count = 10
+    claimed = claim_next(request.user.counselor_profile, max(count, 1))
+    if claimed:
+        messages.success(request, f"已领取 {claimed} 项申请，请在 30 分钟内完成审核")
+    else:
+        messages.info(request, "暂无可领取的申请，或已达到本人可领取的上限")
+    return redirect(f"{reverse('review_submissions')}?mine=1")
+
+
+# 释放本人领取但尚未审核的申请
+@login_required
+def release_submissions(request):
+    if not hasattr(request.user, 'counselor_profile'):
+        return redirect('login')
+    if request.method == 'POST':
+        released = release_claims(request.user.counselor_profile)
+        messages.success(request, f"已释放 {released} 项申请")
+    return redirect('review_submissions')
+
+
 # 审核通过
 @login_required
 def approve_submission(request, submission_id):
     if not hasattr(request.user, 'counselor_profile'):
         return redirect('login')
 
-    submission = get_object_or_404(Submission, id=submission_id)
+    counselor = request.user.counselor_profile
+    # 仅本学院本年级的申请
+    submission = get_object_or_404(
+        Submission.objects.select_related('category', 'student__user'),
+        id=submission_id, college=counselor.college, grade=counselor.grade
+    )
     if request.method == 'POST':
-        submission.approved = True
-        submission.approved_score = request.POST.get('approved_score')
-        submission.reviewer = request.user.counselor_profile
-        submission.save()
-
-        # 根据材料类型更新对应成绩（原有逻辑）
-        student = submission.student
-        score = Decimal(submission.approved_score or 0)
-        academic_categories = ['thesis', 'competition', 'research', 'other_academic']
-        comprehensive_categories = ['volunteer', 'leadership', 'social_practice', 'other_comprehensive']
-
-        if submission.category in academic_categories:
-            student.academic_expertise_score += score
-        elif submission.category in comprehensive_categories:
-            student.comprehensive_performance_score += score
-        student.save()
-
-        # 创建"审核通过"通知
-        Notification.objects.create(
-            recipient=student.user,  # 接收通知的学生用户
-            title="材料审核通过",
-            content=f"您提交的「{submission.category.get_group_display()} - {submission.category.name}」材料已审核通过，核定加分：{submission.approved_score}分",
-            type='submission'  # 提交审核类型通知
-        )
+        if submission.approved or submission.rejected:
+            messages.error(request, "该申请已审核，如需修改请先重置审核状态")
+            return redirect('review_submissions')
+        score = parse_score(request.POST.get('approved_score', ''))
+        if score is None:
+            messages.error(request, "请输入有效的核定分值")
+            return redirect('review_detail', submission_id=submission.id)
+        error = score_error(submission, score)
+        if error:
+            messages.error(request, error)
+            return redirect('review_detail', submission_id=submission.id)
+
+        # 更新提交状态、按大类累加学生成绩并发送"审核通过"通知；已被他人审核或领取时不做修改
+        if not approve_submissions(counselor, [(submission, score)]):
+            messages.error(request, "该申请已被审核或已由其他辅导员领取审核，本次未做任何修改")
 
     return redirect('review_submissions')
 
@@ -240,21 +278,64 @@ def reject_submission(request, submission_id):
     if not hasattr(request.user, 'counselor_profile'):
         return redirect('login')
 
-    submission = get_object_or_404(Submission, id=submission_id)
+    counselor = request.user.counselor_profile
+    submission = get_object_or_404(
+        Submission.objects.select_related('category', 'student__user'),
+        id=submission_id, college=counselor.college, grade=counselor.grade
+    )
     if request.method == 'POST':
-        submission.approved = False
-        submission.rejected = True
-        submission.reject_reason = request.POST.get('reject_reason')
-        submission.reviewer = request.user.counselor_profile
-        submission.save()
-
-        # 创建"审核驳回"通知
-        Notification.objects.create(
-            recipient=submission.student.user,  # 接收通知的学生用户
-            title="材料审核未通过",
-            content=f"您提交的「{submission.category.get_group_display()} - {submission.category.name}」材料未通过审核，原因：{submission.reject_reason}",
-            type='submission'  # 提交审核类型通知
-        )
+        if submission.approved or submission.rejected:
+            messages.error(request, "该申请已审核，如需修改请先重置审核状态")
+            return redirect('review_submissions')
+        # 更新提交状态并发送"审核驳回"通知
+        if not reject_submissions(counselor, [submission], request.POST.get('reject_reason')):
+            messages.error(request, "该申请已被审核或已由其他辅导员领取审核，本次未做任何修改")
+
+    return redirect('review_submissions')
+
+
+# 批量审核：对勾选的待审核申请统一通过或驳回
+@login_required
+def batch_review(request):
+    if not hasattr(request.user, 'counselor_profile'):
+        return redirect('login')
+    if request.method != 'POST':
+        return redirect('review_submissions')
+
+    counselor = request.user.counselor_profile
+    action = request.POST.get('action')
+    ids = request.POST.getlist('submission_ids')
+
+    # 仅处理本学院本年级、仍处于待审核状态且未被其他辅导员领取的申请
+    submissions = list(reviewable(counselor).filter(id__in=ids).select_related('category', 'student__user'))
+    if not submissions:
+        messages.error(request, "请选择要审核的申请")
+        return redirect('review_submissions')
+
+    if action == 'approve':
+        approvals = []
+        for submission in submissions:
+            # 每条申请的核定分值（表格中预填自评分数），与单条审核一样未填写时为 0
+            score = parse_score(request.POST.get(f'score_{submission.id}', ''))
+            if score is None:
+                messages.error(request, f"申请 #{submission.id} 的核定分值无效，本次未做任何修改")
+                return redirect('review_submissions')
+            error = score_error(submission, score)
+            if error:
+                messages.error(request, f"申请 #{submission.id}：{error}，本次未做任何修改")
+                return redirect('review_submissions')
+            approvals.append((submission, score))
+        count = approve_submissions(counselor, approvals)
+        messages.success(request, f"已批量通过 {count} 项申请")
+    elif action == 'reject':
+        reason = request.POST.get('reject_reason', '').strip()
+        if not reason:
+            messages.error(request, "批量驳回需要填写驳回理由")
+            return redirect('review_submissions')
+        count = reject_submissions(counselor, submissions, reason)
+        messages.success(request, f"已批量驳回 {count} 项申请")
+    else:
+        messages.error(request, "未知的审核操作")
 
     return redirect('review_submissions')
 
@@ -271,17 +352,43 @@ def review_detail(request, submission_id):
     try:
         submission = Submission.objects.get(
             id=submission_id,
-            student__college=counselor.college,  # 仅本学院
-            student__grade=counselor.grade  # 仅本年级
+            college=counselor.college,  # 仅本学院
+            grade=counselor.grade  # 仅本年级
         )
     except Submission.DoesNotExist:
         raise Http404("No Submission matches the given query.")  # 明确404原因
 
+    # 打开待审核申请即领取（或续期），已被他人领取时只读查看
+    held_by_other = False
+    if not (submission.approved or submission.rejected):
+        held_by_other = not claim_one(counselor, submission)
+
     return render(request, 'counselors/review_detail.html', {
-        'submission': submission
+        'submission': submission,
+        'held_by_other': held_by_other
     })
 
 
+# 证明材料的缩略图（size=thumb）或预览图（size=preview），仅本学院本年级的辅导员可查看
+@login_required
+def submission_preview(request, submission_id, size):
+    if not hasattr(request.user, 'counselor_profile'):
+        return redirect('login')
+    counselor = request.user.counselor_profile
+    width = {'thumb': THUMBNAIL, 'preview': PREVIEW}.get(size)
+    name = Submission.objects.filter(
+        id=submission_id, college=counselor.college, grade=counselor.grade
+    ).values_list('file', flat=True).first()
+    if width is None or not previewable(name):
+        raise Http404
+
+    preview = preview_name(name, width)
+    # 通常上传后已在后台生成；旧文件或尚未生成完时当场生成
+    if not upload_storage.exists(preview) and not generate_previews(name):
+        raise Http404
+    return media_response(request, preview, content_type=preview_content_type())
+
+
 # 已审核材料页面
 @login_required
 def reviewed_submissions(request):
@@ -298,12 +405,19 @@ def reviewed_submissions(request):
         Q(approved=True) | Q(rejected=True),
         # 关键字参数放在后面
         reviewer=counselor,
-        student__college=counselor_college,
-        student__grade=counselor_grade
-    ).select_related('student', 'reviewer').order_by('-timestamp')
+        college=counselor_college,
+        grade=counselor_grade
+    )
+
+    page = keyset_paginate(
+        reviewed_submissions.select_related('student', 'category'),
+        request.GET,
+        total=cached_count(f'reviewed:{counselor.pk}', counselor_college, counselor_grade, reviewed_submissions)
+    )
 
     return render(request, 'counselors/reviewed_submissions.html', {
-        'submissions': reviewed_submissions
+        'submissions': page.items,
+        'page': page
     })
 
 
@@ -316,34 +430,9 @@ def reset_submission(request, submission_id):
     submission = get_object_or_404(Submission, id=submission_id, reviewer=request.user.counselor_profile)
 
     if request.method == 'POST':
-        # 如果之前是通过的，需要减去已加的分数
-        if submission.approved:
-            student = submission.student
-            score = Decimal(submission.approved_score or 0)
-            academic_categories = ['thesis', 'competition', 'research', 'other_academic']
-            comprehensive_categories = ['volunteer', 'leadership', 'social_practice', 'other_comprehensive']
-
-            if submission.category in academic_categories:
-                student.academic_expertise_score -= score
-            elif submission.category in comprehensive_categories:
-                student.comprehensive_performance_score -= score
-            student.save()
-
-        # 重置审核状态
-        submission.approved = False
-        submission.rejected = False
-        submission.approved_score = None
-        submission.reject_reason = None
-        submission.reviewer = None
-        submission.save()
-
-        # 创建通知
-        Notification.objects.create(
-            recipient=submission.student.user,
-            title="材料审核状态更新",
-            content=f"您提交的「{submission.category.get_group_display()} - {submission.category.name}」材料审核状态已重置，将重新审核",
-            type='submission'
-        )
+        # 重置审核状态并通知学生，之前通过的按大类冲销已加的分数
+        if not reset_submissions(request.user.counselor_profile, [submission]):
+            messages.error(request, "该申请已被重置，本次未做任何修改")
 
         return redirect('reviewed_submissions')
 
@@ -358,10 +447,8 @@ def view_all_students(request):
 
     counselor_college = request.user.counselor_profile.college
     counselor_grade = request.user.counselor_profile.grade
-    students = StudentProfile.objects.filter(
-        college=counselor_college,  # 学院过滤
-        grade=counselor_grade       # 年级过滤
-    ).order_by('-total_score')
+    # 按排名表的名次读取本学院本年级学生，整页只需一条查询且不需要排序；只取页面显示的列
+    students = list(STUDENT_LIST(StudentProfile.objects.ranked_in(counselor_college, counselor_grade)))
 
     return render(request, 'counselors/all_students.html', {
         'students': students
@@ -374,37 +461,128 @@ def export_students(request):
     if not hasattr(request.user, 'counselor_profile'):
         return redirect('login')
 
-    # 创建CSV响应
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="学生信息.csv"'
+    counselor = request.user.counselor_profile
+    # 流式导出本学院本年级学生，按名次排列；format=xlsx 时导出 Excel
+    return export_response(
+        student_export_rows(counselor.college, counselor.grade),
+        EXPORT_HEADER, '学生信息', request.GET.get('format')
+    )
 
-    # 定义需要导出的字段
-    fields = [
-        '学号', '姓名', '学院', '专业', '入学年份',
-        '学业综合成绩', '学术专长成绩', '综合表现成绩', '总成绩'
-    ]
 
-    writer = csv.writer(response)
-    writer.writerow(fields)  # 写入表头
-
-    # 获取所有学生信息并写入CSV
-    students = StudentProfile.objects.all().order_by('-total_score')
-    for student in students:
-        writer.writerow([
-            student.student_id,
-            student.full_name,
-            student.college,
-            student.major,
-            student.enrollment_year or '',
-            student.academic_comprehensive_score or '',
-            student.academic_expertise_score,
-            student.comprehensive_performance_score,
-            student.total_score or ''
-        ])
+@login_required
+def export_submissions(request):
+    if not hasattr(request.user, 'counselor_profile'):
+        return redirect('login')
+
+    counselor = request.user.counselor_profile
+    # status=reviewed 导出本人审核过的申请（同“已审核申请”页），否则导出待审核申请
+    status = 'reviewed' if request.GET.get('status') == 'reviewed' else 'pending'
+    submissions = submission_queryset(counselor.college, counselor.grade, status, reviewer=counselor)
+    return export_response(
+        submission_export_rows(submissions),
+        SUBMISSION_HEADER, '已审核申请' if status == 'reviewed' else '待审核申请', request.GET.get('format')
+    )
+
 
+# 打包下载本学院本年级的证明材料（zip，边生成边下载），可按学号只下载某个学生的
+@login_required
+def export_evidence(request):
+    if not hasattr(request.user, 'counselor_profile'):
+        return redirect('login')
+
+    counselor = request.user.counselor_profile
+    # 默认为已通过的申请（审计用），也可下载本人审核过的或待审核的
+    status = request.GET.get('status')
+    if status not in ('approved', 'reviewed', 'pending'):
+        status = 'approved'
+    submissions = submission_queryset(counselor.college, counselor.grade, status, reviewer=counselor)
+    name = {'approved': '已通过申请', 'reviewed': '已审核申请', 'pending': '待审核申请'}[status]
+    student_id = request.GET.get('student', '').strip()
+    if student_id:
+        submissions = submissions.filter(student__student_id=student_id)
+        name = f'{student_id}{name}'
+
+    response = StreamingHttpResponse(stream_evidence(submissions), content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(
+        True, f'{counselor.college}{counselor.grade}{name}证明材料.zip'
+    )
     return response
 
 
+@login_required
+def request_export_job(request):
+    """申请后台导出。辅导员导出本学院本年级；管理员导出指定学院（年级可为空，即全学院）"""
+    counselor = getattr(request.user, 'counselor_profile', None)
+    if counselor is None and not request.user.is_superuser:
+        return redirect('login')
+    if request.method != 'POST':
+        return redirect('view_all_students' if counselor else 'admin_dashboard')
+
+    kind = request.POST.get('kind')
+    export_format = 'xlsx' if request.POST.get('format') == 'xlsx' else 'csv'
+    status = request.POST.get('status', 'pending')
+    if counselor is not None:
+        college, grade = counselor.college, counselor.grade
+        allowed_status = ('pending', 'reviewed')
+    else:
+        college, grade = request.POST.get('college', ''), request.POST.get('grade', '')
+        allowed_status = ('pending', 'approved')
+    if kind not in ('students', 'submissions') or not college or (kind == 'submissions' and status not in allowed_status):
+        messages.error(request, "导出参数无效")
+        return redirect('view_all_students' if counselor else 'admin_dashboard')
+
+    if kind == 'students':
+        params = {'college': college, 'grade': grade}
+    else:
+        reviewer = counselor.pk if status == 'reviewed' else None
+        params = {'college': college, 'grade': grade, 'status': status, 'reviewer': reviewer}
+    job = request_export(request.user, kind, params, export_format)
+    return redirect('export_job_detail', job_id=job.pk)
+
+
+def _get_export_job(request, job_id):
+    job = get_object_or_404(ExportJob, id=job_id)
+    if not can_access(request.user, job):
+        raise Http404("No ExportJob matches the given query.")
+    return job
+
+
+@login_required
+def export_job_detail(request, job_id):
+    job = _get_export_job(request, job_id)
+    return render(request, 'counselors/export_job.html', {
+        'job': job,
+        'filename': f"{export_filename(job)}.{job.export_format}",
+        # 管理员和辅导员共用该页面
+        'base_template': 'counselors/base.html' if hasattr(request.user, 'counselor_profile') else 'admins/base.html',
+    })
+
+
+@login_required
+def export_job_status(request, job_id):
+    """导出进度（页面轮询）"""
+    job = _get_export_job(request, job_id)
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'total': job.total,
+        'percent': job.percent,
+        'error': job.error,
+        'download_url': reverse('export_job_download', args=[job.pk]) if job.status == 'done' else None,
+    })
+
+
+@login_required
+def export_job_download(request, job_id):
+    job = _get_export_job(request, job_id)
+    if job.status != 'done' or not job.file:
+        raise Http404("导出文件尚未生成")
+    return FileResponse(job.file.open('rb'), as_attachment=True,
+                        filename=f"{export_filename(job)}.{job.export_format}",
+                        content_type=content_type_for(job.export_format))
+
+
 @login_required
 def set_academic_score(request, student_id):
     if not hasattr(request.user, 'counselor_profile'):
@@ -430,6 +608,51 @@ def set_academic_score(request, student_id):
     })
 
 
+# 学业综合成绩批量录入：表格编辑整个学院年级，或上传 CSV
+@login_required
+def academic_scores(request):
+    if not hasattr(request.user, 'counselor_profile'):
+        return redirect('login')
+
+    counselor = request.user.counselor_profile
+    errors = []
+    submitted = {}  # 校验失败时回填表格中已输入的值
+    if request.method == 'POST':
+        cohort = cohort_scores(counselor.college, counselor.grade)
+        if 'file' in request.FILES:
+            entries, error = read_score_csv(request.FILES['file'])
+            if error:
+                messages.error(request, error)
+                return redirect('academic_scores')
+        else:
+            # 表格中每个输入框名为 score_<学号>
+            entries = [
+                (None, key[len('score_'):], value)
+                for key, value in request.POST.items() if key.startswith('score_')
+            ]
+            submitted = {student_id: value for _, student_id, value in entries}
+
+        changes, errors = validate_scores(cohort, entries)
+        if not errors:
+            StudentProfile.objects.set_academic_scores(changes)
+            messages.success(request, f"已更新 {len(changes)} 名学生的学业综合成绩")
+            return redirect('academic_scores')
+        messages.error(request, f"有 {len(errors)} 行数据有误，未做任何修改")
+
+    students = list(STUDENT_SCORE_GRID(
+        StudentProfile.objects.filter(college=counselor.college, grade=counselor.grade).order_by('student_id')
+    ))
+    row_errors = {student_id: error for _, student_id, error in errors}
+    rows = [
+        (student, submitted.get(student.student_id), row_errors.get(student.student_id))
+        for student in students
+    ]
+    return render(request, 'counselors/academic_scores.html', {
+        'rows': rows,
+        'errors': errors,
+    })
+
+
 # 辅导员加分规则管理页面
 @login_required
 def counselor_rules(request):
@@ -5,7 +5,7 @@
 """
 
 from django.contrib import admin
-from .models import StudentProfile, Submission, SubmissionCategory
+from .models import ScoreLedgerEntry, StudentProfile, Submission, SubmissionCategory
 
 
 @admin.register(StudentProfile)
@@ -23,4 +23,20 @@ class SubmissionCategoryAdmin(admin.ModelAdmin):
 @admin.register(Submission)
 class SubmissionAdmin(admin.ModelAdmin):
     list_display = ('id', 'student', 'category', 'self_rating', 'approved', 'approved_score', 'timestamp')
-    list_filter = ('category__group', 'approved')
\ No newline at end of file
+    list_filter = ('category__group', 'approved')
+
+
+@admin.register(ScoreLedgerEntry)
+class ScoreLedgerEntryAdmin(admin.ModelAdmin):
+    """成绩流水只增不改，后台仅供查看。"""
+    list_display = ('id', 'student', 'field', 'delta', 'reason', 'submission', 'operator', 'created_at')
+    list_filter = ('field', 'reason')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
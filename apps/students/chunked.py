@@ -0,0 +1,203 @@
+# 证明材料的分块、可续传上传。
+#
+# 大文件一次性上传时，网络在快结束时中断就要从头再传。这里由浏览器把文件切块依次发送：
+#   1. 创建会话（文件名、大小），大小超过上限直接拒绝；
+#   2. 每块带上起始位置 offset 追加到临时文件，服务器边写边计算 SHA-256；第一块到达时按文件头
+#      识别类型，不是允许的格式立即拒绝，不必等整个文件传完（ZIP 文件头只说明是压缩包，
+#      收齐后再检查其中确有 Word 文档的内容，才作为 .docx 接收）；
+#   3. 中断后查询会话得到已收到的字节数，从该位置继续发送；
+#   4. 全部收到后，随提交表单带上会话 id，文件移入按内容寻址的存储（见 storage.py）并关联到提交记录。
+#
+# 哈希的中间状态保存在本进程内存中；续传时若由另一进程接收或进程已重启，先把已收到的部分
+# 重新读一遍恢复哈希状态，不影响结果。
+
+import hashlib
+import os
+import threading
+import zipfile
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadSession
+from .storage import upload_storage
+
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 单个文件大小上限（字节）
+CHUNK_SIZE = 1024 * 1024  # 建议浏览器每块发送的字节数
+MAX_CHUNK_SIZE = 4 * 1024 * 1024  # 单次请求接收的上限
+READ_SIZE = 64 * 1024
+SESSION_TTL = timedelta(days=1)  # 超过该时间没有新数据的会话及其临时文件被清理
+SNIFF_SIZE = 8  # 识别类型需要的文件头字节数
+
+# 允许的文件格式：文件头 -> 保存的扩展名
+SIGNATURES = [
+    (b'%PDF-', '.pdf'),
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', '.doc'),  # Word 97-2003（OLE2）
+    (b'PK\x03\x04', '.docx'),  # Word 2007 及以后（ZIP，另须通过 is_word_document 检查）
+]
+UNSUPPORTED_TYPE = "仅支持 PDF、JPG、PNG、DOC/DOCX 格式的文件"
+
+_hashers = {}  # 会话 id -> (已计入哈希的字节数, 哈希对象)
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """上传被拒绝；status 为 HTTP 状态码，offset 为服务器已收到的字节数（续传位置）"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def sniff(head):
+    """按文件头识别类型，返回扩展名；不是允许的格式返回 None"""
+    for signature, ext in SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+def is_word_document(file):
+    """ZIP 文件 file 是否为 Word 文档：包含 [Content_Types].xml 和 word/ 目录下的内容"""
+    try:
+        with zipfile.ZipFile(file) as archive:
+            names = archive.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return False
+    return '[Content_Types].xml' in names and any(name.startswith('word/') for name in names)
+
+
+def part_path(session):
+    return upload_storage.temp_path(f'{session.pk}.part')
+
+
+def _discard(session):
+    with _hashers_lock:
+        _hashers.pop(session.pk, None)
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def purge_stale_sessions():
+    """清理长时间没有新数据的会话"""
+    stale = UploadSession.objects.filter(updated_at__lt=timezone.now() - SESSION_TTL)
+    for session in stale:
+        _discard(session)
+    stale.delete()
+
+
+def create_session(student, filename, size):
+    """新建上传会话；文件大小不合要求时抛出 UploadError"""
+    if size <= 0:
+        raise UploadError("文件为空")
+    if size > MAX_UPLOAD_SIZE:
+        raise UploadError(f"文件不能超过 {MAX_UPLOAD_SIZE // 1024 // 1024}MB", status=413)
+    purge_stale_sessions()
+    return UploadSession.objects.create(student=student, filename=os.path.basename(filename)[:255], size=size)
+
+
+def _hasher(session):
+    """取出与已收到字节数一致的哈希状态，必要时重读临时文件恢复"""
+    with _hashers_lock:
+        received, digest = _hashers.pop(session.pk, (None, None))
+    if received == session.received:
+        return digest
+    digest = hashlib.sha256()
+    if session.received:
+        lost = UploadError("已接收的数据丢失，请重新上传", status=410, offset=0)
+        try:
+            f = open(part_path(session), 'rb')
+        except FileNotFoundError:
+            raise lost
+        with f:
+            remaining = session.received
+            while remaining:
+                data = f.read(min(READ_SIZE, remaining))
+                if not data:
+                    raise lost
+                digest.update(data)
+                remaining -= len(data)
+    return digest
+
+
+def append_chunk(session_id, student, offset, stream):
+    """把 stream 中的一块数据追加到会话，offset 须等于已收到的字节数；返回更新后的会话
+
+    数据边读边写入临时文件并计入哈希；超出声明的文件大小、单块上限或文件头不是允许的格式时
+    立即停止读取并抛出 UploadError，临时文件回退到本块之前。文件格式不允许（包括收齐后发现 ZIP
+    文件不是 Word 文档）时会话随之删除。
+    """
+    try:
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().filter(pk=session_id, student=student).first()
+            if session is None:
+                raise UploadError("上传会话不存在或已过期", status=404)
+            if session.complete:
+                return session
+            if offset != session.received:
+                raise UploadError("数据位置不一致，请从服务器已收到的位置继续", status=409, offset=session.received)
+            _receive(session, stream)
+            session.save(update_fields=['received', 'file_type', 'sha256', 'updated_at'])
+            return session
+    except UploadError as exc:
+        if exc.status == 415:
+            _discard(session)
+            session.delete()
+        elif exc.status == 410:
+            # 临时文件已丢失，会话回到起点，浏览器从头重传
+            _discard(session)
+            UploadSession.objects.filter(pk=session.pk).update(received=0, file_type='', updated_at=timezone.now())
+        raise
+
+
+def _receive(session, stream):
+    digest = _hasher(session)
+    path = part_path(session)
+    received, head = session.received, b''
+    try:
+        with open(path, 'r+b' if os.path.exists(path) else 'w+b') as output:
+            output.seek(received)
+            output.truncate()  # 丢弃上次中断时写入一半、未计入的数据
+            for data in iter(lambda: stream.read(READ_SIZE), b''):
+                if received + len(data) > session.size:
+                    raise UploadError("数据超出文件大小", status=413, offset=session.received)
+                if received + len(data) - session.received > MAX_CHUNK_SIZE:
+                    raise UploadError("单次发送的数据过大", status=413, offset=session.received)
+                if not session.file_type:
+                    # 第一块：凑够文件头即识别类型，格式不对不再继续接收
+                    head += data[:SNIFF_SIZE - len(head)]
+                    if len(head) >= min(SNIFF_SIZE, session.size):
+                        session.file_type = sniff(head) or ''
+                        if not session.file_type:
+                            raise UploadError(UNSUPPORTED_TYPE, status=415)
+                output.write(data)
+                digest.update(data)
+                received += len(data)
+            if not session.file_type:
+                raise UploadError("第一块数据过小，无法识别文件类型", offset=session.received)
+            if received == session.size and session.file_type == '.docx' and not is_word_document(output):
+                raise UploadError(UNSUPPORTED_TYPE, status=415)
+    except BaseException:
+        # 本块作废（包括连接中断），临时文件回退到本块之前，哈希状态下次从文件恢复
+        with open(path, 'r+b') as output:
+            output.truncate(session.received)
+        raise
+
+    session.received = received
+    if received == session.size:
+        session.sha256 = digest.hexdigest()
+    else:
+        with _hashers_lock:
+            _hashers[session.pk] = (received, digest)
+
+
+def attach(session, submission):
+    """把已完成的上传设为 submission 的文件并删除会话；保存 submission 时文件移入存储"""
+    submission.stage_file(part_path(session), session.sha256, session.file_type, session.size)
+    session.delete()
@@ -0,0 +1,55 @@
+# 按学院年级划分的缓存。
+#
+# 每个学院年级维护一个版本号，缓存键中带上版本号；学生成绩、学院或年级变化时
+# （StudentRank.objects.refresh_cohort 中）调用 invalidate_cohort 递增版本号，
+# 该学院年级下的所有缓存随之失效，其他学院年级不受影响。
+#
+# 不同类别的缓存用 namespace 区分、各自维护版本号，例如提交记录计数（见 counters 模块）
+# 使用 'submissions'，材料审核不会使成绩分布等缓存失效；学生资料保存时递增 'profiles'
+# （后台导出文件的数据版本，见 counselors/jobs.py）。
+
+import time
+from urllib.parse import quote
+
+from django.core.cache import cache
+
+VERSION_KEY = 'cohort:{cohort}:{namespace}:version'
+ENTRY_KEY = 'cohort:{cohort}:{namespace}:v{version}:{name}'
+
+
+def _cohort_id(college, grade):
+    # 年级为自由文本，转义后再拼入缓存键，避免空格等字符
+    return f"{quote(college)}:{quote(grade)}"
+
+
+def cohort_version(college, grade, namespace='scores'):
+    """获取学院年级当前的缓存版本号"""
+    key = VERSION_KEY.format(cohort=_cohort_id(college, grade), namespace=namespace)
+    version = cache.get(key)
+    if version is None:
+        # 版本号丢失（缓存重启或被淘汰）时以当前时间为起点，避免与残留的旧缓存重号
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_cohort(college, grade, namespace='scores'):
+    """学院年级内学生成绩发生变化后调用，使该学院年级的所有缓存失效"""
+    if not (college and grade):
+        return
+    key = VERSION_KEY.format(cohort=_cohort_id(college, grade), namespace=namespace)
+    try:
+        cache.incr(key)
+    except ValueError:  # 版本号尚未写入缓存，下次读取时重新生成
+        pass
+
+
+def get_cohort_cached(name, college, grade, loader, timeout=24 * 60 * 60, namespace='scores'):
+    """读取学院年级缓存，未命中时调用 loader() 计算并写入（旧版本的缓存到期自动清除）"""
+    key = ENTRY_KEY.format(cohort=_cohort_id(college, grade), namespace=namespace,
+                           version=cohort_version(college, grade, namespace), name=name)
+    value = cache.get(key)
+    if value is None:
+        value = loader()
+        cache.set(key, value, timeout=timeout)
+    return value
@@ -0,0 +1,21 @@
+# 提交记录计数缓存，用于分页页面显示总条数。
+#
+# 计数按学院年级缓存（cohorts 模块的 'submissions' 命名空间）；该学院年级有学生提交、
+# 删除材料或材料被审核、撤销审核时调用 touch_submissions，计数随之失效。
+# 翻页只读缓存，不再每页执行一次 COUNT(*)。
+
+from .cohorts import get_cohort_cached, invalidate_cohort
+
+NAMESPACE = 'submissions'
+
+
+def touch_submissions(college, grade):
+    """学院年级内提交记录或其审核状态变化后调用"""
+    invalidate_cohort(college, grade, namespace=NAMESPACE)
+
+
+def cached_count(name, college, grade, queryset):
+    """返回 queryset 的行数，按学院年级缓存；学院或年级未设置时直接计数"""
+    if not (college and grade):
+        return queryset.count()
+    return get_cohort_cached(name, college, grade, queryset.count, namespace=NAMESPACE)
@@ -0,0 +1,99 @@
+# 学院年级成绩分布：总成绩及三项分项成绩的直方图、分位数、均值和标准差。
+#
+# 一条查询取出整个学院年级的四列成绩，遍历一次同时累计均值/方差（Welford 算法）
+# 并收集数值用于分位数和直方图。结果按学院年级缓存，只有该学院年级内学生成绩变化时
+# 才失效（见 cohorts 模块），辅导员控制台和学生排名页读取时不再产生额外查询。
+
+import math
+from bisect import bisect_left
+
+from .cohorts import get_cohort_cached
+from .models import StudentProfile
+from .scoring import score_to_tenths
+
+SCORE_COLUMNS = [
+    ('total_score', '总成绩'),
+    ('academic_comprehensive_score', '学业综合成绩'),
+    ('academic_expertise_score', '学术专长成绩'),
+    ('comprehensive_performance_score', '综合表现成绩'),
+]
+QUANTILES = [('p10', 0.10), ('p25', 0.25), ('p50', 0.50), ('p75', 0.75), ('p90', 0.90)]
+HISTOGRAM_BINS = 10
+
+
+def cohort_distribution(college, grade):
+    """获取学院年级的成绩分布（带缓存），学院或年级未设置时返回 None"""
+    if not (college and grade):
+        return None
+    return get_cohort_cached('distribution', college, grade,
+                             lambda: compute_distribution(college, grade))
+
+
+def compute_distribution(college, grade):
+    """实时计算学院年级的成绩分布，返回按 SCORE_COLUMNS 顺序排列的列表"""
+    fields = [field for field, _ in SCORE_COLUMNS]
+    rows = StudentProfile.objects.filter(college=college, grade=grade).values_list(*fields)
+
+    # 每列一组累加器：[人数, 均值, 离差平方和, 数值列表（0.1 单位）]
+    accumulators = [[0, 0.0, 0.0, []] for _ in fields]
+    for row in rows.iterator(chunk_size=2000):
+        for value, acc in zip(row, accumulators):
+            if value is None:
+                continue
+            tenths = score_to_tenths(value)
+            acc[0] += 1
+            delta = tenths - acc[1]
+            acc[1] += delta / acc[0]
+            acc[2] += delta * (tenths - acc[1])
+            acc[3].append(tenths)
+
+    return [
+        _summarize(field, label, *acc)
+        for (field, label), acc in zip(SCORE_COLUMNS, accumulators)
+    ]
+
+
+def _summarize(field, label, count, mean, squares, values):
+    summary = {'field': field, 'label': label, 'count': count}
+    if not count:
+        summary.update(mean=None, std=None, min=None, max=None, quantiles={}, histogram=[])
+        return summary
+
+    values.sort()
+    summary.update(
+        mean=round(mean / 10, 2),
+        std=round(math.sqrt(squares / count) / 10, 2),  # 总体标准差
+        min=values[0] / 10,
+        max=values[-1] / 10,
+        quantiles={name: round(_quantile(values, q) / 10, 2) for name, q in QUANTILES},
+        histogram=_histogram(values),
+    )
+    return summary
+
+
+def _quantile(values, q):
+    """有序数列的分位数（线性插值）"""
+    position = (len(values) - 1) * q
+    lower = math.floor(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _histogram(values):
+    """等宽直方图：以整数分为边界覆盖最小值到最大值，最多 HISTOGRAM_BINS 组"""
+    low = values[0] // 10 * 10
+    high = -(-values[-1] // 10) * 10 + (10 if values[-1] % 10 == 0 else 0)
+    width = max(10, -(-(high - low) // HISTOGRAM_BINS // 10) * 10)
+
+    bins, largest = [], 0
+    start = low
+    while start < high:
+        end = start + width
+        count = bisect_left(values, end) - bisect_left(values, start)
+        bins.append({'start': start / 10, 'end': end / 10, 'count': count})
+        largest = max(largest, count)
+        start = end
+    for item in bins:
+        item['percent'] = round(item['count'] * 100 / len(values), 1)
+        item['height'] = round(item['count'] * 100 / largest) if largest else 0
+    return bins
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import re
+import shutil
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from students.bulk import bulk_update_rows
+from students.models import Submission, UploadBlob
+from students.previews import preview_names
+from students.storage import UPLOAD_DIR, blob_name, upload_storage
+
+BLOB_NAME = re.compile(r'^uploads/([0-9a-f]{2}/){2}[0-9a-f]{64}(\.[^/]*)?$')
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = '把旧的上传文件迁移为按内容寻址存储（相同内容只保留一份），并按提交记录重建文件引用计数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true', help='同时删除 uploads/ 下没有任何提交记录引用的文件')
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不移动文件、不写入数据库')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        names = set(Submission.objects.exclude(file='').exclude(file=None).values_list('file', flat=True).distinct())
+
+        # 旧文件 -> 按内容寻址的新路径；新路径先以硬链接（或复制）建立，数据库更新成功后再删除旧文件
+        renamed, targets, missing, saved = {}, set(), [], 0
+        for name in sorted(names):
+            if BLOB_NAME.match(name):
+                continue
+            path = upload_storage.path(name)
+            if not os.path.exists(path):
+                missing.append(name)
+                continue
+            target = blob_name(UPLOAD_DIR, file_digest(path), os.path.splitext(name)[1].lower())
+            if target in targets or upload_storage.exists(target):
+                saved += os.path.getsize(path)
+            elif not dry_run:
+                target_path = upload_storage.path(target)
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                try:
+                    os.link(path, target_path)
+                except OSError:
+                    shutil.copyfile(path, target_path)
+            renamed[name] = target
+            targets.add(target)
+
+        for name in missing:
+            self.stderr.write(f"文件不存在：{name}")
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f"试运行：{len(renamed)} 个旧文件待迁移，去重可节省 {saved / 1024 / 1024:.1f}MB，未做任何修改"
+            ))
+            return
+
+        with transaction.atomic():
+            rows = Submission.objects.filter(file__in=renamed).values_list('pk', 'file')
+            bulk_update_rows(Submission, ['file'], [(pk, renamed[name]) for pk, name in rows])
+
+            # 按提交记录重建引用计数
+            counts = Submission.objects.exclude(file='').exclude(file=None).values_list('file').annotate(
+                refs=Count('id')
+            ).order_by()
+            UploadBlob.objects.all().delete()
+            UploadBlob.objects.bulk_create([
+                UploadBlob(name=name, size=upload_storage.size(name), refcount=refs)
+                for name, refs in counts if upload_storage.exists(name)
+            ], batch_size=500)
+
+        for name in renamed:
+            upload_storage.delete(name)
+
+        pruned = 0
+        if options['prune']:
+            referenced = set()
+            for name in UploadBlob.objects.values_list('name', flat=True):
+                referenced.add(name)
+                referenced.update(preview_names(name))
+            root = upload_storage.path(UPLOAD_DIR)
+            for directory, _, files in os.walk(root):
+                for filename in files:
+                    path = os.path.join(directory, filename)
+                    name = os.path.relpath(path, upload_storage.location).replace(os.sep, '/')
+                    if name not in referenced:
+                        os.remove(path)
+                        pruned += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"已迁移 {len(renamed)} 个旧文件，去重节省 {saved / 1024 / 1024:.1f}MB，"
+            f"删除 {pruned} 个未引用文件，共 {UploadBlob.objects.count()} 个文件"
+        ))
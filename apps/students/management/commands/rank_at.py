@@ -0,0 +1,40 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from students.models import RankSnapshot, StudentProfile
+
+
+class Command(BaseCommand):
+    help = '查询学生在某一时刻的排名（依据排名快照），用于排名争议核查'
+
+    def add_arguments(self, parser):
+        parser.add_argument('student_id', help='学号')
+        parser.add_argument('--at', required=True, help='查询时刻，例如 2026-05-01 或 2026-05-01T18:00')
+        parser.add_argument('--college', help='按指定学院查询（学生转过学院时使用）')
+        parser.add_argument('--grade', help='按指定年级查询（学生转过年级时使用）')
+
+    def handle(self, *args, **options):
+        try:
+            student = StudentProfile.objects.get(student_id=options['student_id'])
+        except StudentProfile.DoesNotExist:
+            raise CommandError(f"学号 {options['student_id']} 不存在")
+
+        when = parse_datetime(options['at'])
+        if when is None:
+            day = parse_date(options['at'])
+            if day is None:
+                raise CommandError('时间格式无效')
+            # 只给日期时取当天结束时的排名
+            when = datetime.combine(day, time.max)
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+
+        result = RankSnapshot.objects.rank_at(student, when, college=options['college'], grade=options['grade'])
+        if result is None:
+            self.stdout.write(self.style.WARNING('该时刻之前没有包含该学生的排名快照'))
+            return
+        rank, cohort_size, taken_at = result
+        self.stdout.write(f"{student}：{rank}/{cohort_size}（快照时间 {timezone.localtime(taken_at):%Y-%m-%d %H:%M}）")
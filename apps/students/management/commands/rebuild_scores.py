@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from students.models import ScoreLedgerEntry, StudentProfile
+
+
+class Command(BaseCommand):
+    help = '按成绩流水重建学生的学术专长/综合表现成绩，并重算总成绩与排名'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每批读取和写回的学生数')
+        parser.add_argument('--dry-run', action='store_true', help='只列出不一致的学生，不写入数据库')
+
+    def handle(self, *args, **options):
+        differences = StudentProfile.objects.all().sync_score_aggregates(
+            ScoreLedgerEntry.objects.totals(),
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run']
+        )
+
+        for _, student_id, (old_expertise, old_performance), (expertise, performance) in differences:
+            self.stdout.write(
+                f"{student_id}: 学术专长 {old_expertise} -> {expertise}，综合表现 {old_performance} -> {performance}"
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"试运行：{len(differences)} 名学生的成绩与流水不一致，未写入数据库"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"已按流水重建 {len(differences)} 名学生的成绩"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from students.models import StudentProfile
+
+
+class Command(BaseCommand):
+    help = '批量重算学生总成绩（修改权重、学业综合成绩或加分后使用），结果与逐个保存完全一致'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--college', help='只重算指定学院，例如 info')
+        parser.add_argument('--grade', help='只重算指定年级，例如 2024')
+        parser.add_argument('--student-id', action='append', dest='student_ids', default=[],
+                            help='只重算指定学号，可重复使用')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每批读取和写回的学生数')
+        parser.add_argument('--dry-run', action='store_true', help='只列出将发生的变化，不写入数据库')
+
+    def handle(self, *args, **options):
+        students = StudentProfile.objects.all()
+        if options['college']:
+            students = students.filter(college=options['college'])
+        if options['grade']:
+            students = students.filter(grade=options['grade'])
+        if options['student_ids']:
+            students = students.filter(student_id__in=options['student_ids'])
+
+        changes = students.recompute_total_scores(
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run']
+        )
+
+        for student_id, old_total, new_total in changes:
+            self.stdout.write(f"{student_id}: {'-' if old_total is None else old_total} -> {new_total}")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"试运行：{len(changes)} 名学生的总成绩将发生变化，未写入数据库"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"已更新 {len(changes)} 名学生的总成绩"))
@@ -0,0 +1,57 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from students.models import SCORE_FIELDS, ScoreLedgerEntry, StudentProfile, Submission, SubmissionCategory
+
+
+def approved_totals():
+    """一条 GROUP BY 查询汇总已审核通过的加分，按大类映射到成绩字段，返回 {学生id: {成绩字段: 合计}}"""
+    totals = defaultdict(lambda: defaultdict(Decimal))
+    rows = Submission.objects.filter(approved=True).values_list(
+        'student_id', 'category__group'
+    ).annotate(total=Sum('approved_score')).order_by()
+    for student_id, group, total in rows:
+        totals[student_id][SubmissionCategory.score_field_for(group)] += Decimal(total or 0)
+    return totals
+
+
+class Command(BaseCommand):
+    help = '按已审核通过的提交记录重新汇总学生的学术专长/综合表现成绩，修正不一致并重算总成绩与排名'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='每批读取和写回的学生数')
+        parser.add_argument('--dry-run', action='store_true', help='只列出不一致的学生，不写入数据库')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            totals = approved_totals()
+            differences = StudentProfile.objects.all().sync_score_aggregates(
+                totals,
+                chunk_size=options['chunk_size'],
+                dry_run=options['dry_run']
+            )
+            if not options['dry_run']:
+                # 流水合计与应有值的差额记为校正，校正后流水合计、学生档案与审核记录三者一致
+                # （学生档案被直接改动而流水无误时不需要校正流水）
+                ledger = ScoreLedgerEntry.objects.totals()
+                ScoreLedgerEntry.objects.bulk_create([
+                    ScoreLedgerEntry(student_id=pk, field=field, delta=delta, reason='reconcile')
+                    for pk in set(totals) | set(ledger)
+                    for field in SCORE_FIELDS
+                    for delta in [totals.get(pk, {}).get(field, 0) - ledger.get(pk, {}).get(field, 0)]
+                    if delta
+                ], batch_size=500)
+
+        for _, student_id, (old_expertise, old_performance), (expertise, performance) in differences:
+            self.stdout.write(
+                f"{student_id}: 学术专长 {old_expertise} -> {expertise}，综合表现 {old_performance} -> {performance}"
+            )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"试运行：{len(differences)} 名学生的成绩与审核记录不一致，未写入数据库"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"已校正 {len(differences)} 名学生的成绩"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from students.models import RankSnapshot
+
+
+class Command(BaseCommand):
+    help = '记录各学院年级的排名快照（建议每天定时执行），排名未变化的学院年级自动跳过'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--college', help='只记录指定学院')
+        parser.add_argument('--grade', help='只记录指定年级')
+        parser.add_argument('--force', action='store_true', help='排名未变化时也记录快照')
+
+    def handle(self, *args, **options):
+        snapshots = RankSnapshot.objects.take(
+            college=options['college'],
+            grade=options['grade'],
+            force=options['force']
+        )
+        for snapshot in snapshots:
+            self.stdout.write(f"{snapshot.college} {snapshot.grade}: {snapshot.cohort_size} 名有成绩学生")
+        self.stdout.write(self.style.SUCCESS(f"已记录 {len(snapshots)} 份排名快照"))
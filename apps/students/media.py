@@ -0,0 +1,164 @@
+# 上传文件的下载：权限检查、条件请求、断点续传，以及交给前端代理发送。
+#
+# 证明材料只允许提交该材料的学生本人、同学院同年级的辅导员和超级管理员下载。权限检查在
+# Django 中完成；实际的文件传输在配置了 MEDIA_SENDFILE 时交给前端代理：
+#   'x-accel-redirect'：nginx，响应头 X-Accel-Redirect 指向 MEDIA_ACCEL_PREFIX 下的 internal location；
+#   'x-sendfile'：Apache mod_xsendfile / lighttpd，响应头 X-Sendfile 为文件的绝对路径。
+# 这时 Python 进程只返回响应头，Range 请求由代理处理。未配置时由 Django 直接发送，同样支持
+# Range（单个区间）和 If-Range。
+#
+# 只有 PDF 和常见图片格式在浏览器中直接打开；其余类型（包括 HTML、SVG 等可执行脚本的格式）一律以
+# application/octet-stream 作为附件下载，并带 X-Content-Type-Options: nosniff，上传的文件不会在本站
+# 域名下被当作页面执行。
+#
+# 文件按内容寻址（见 storage.py），路径中的 SHA-256 即强 ETag，内容不变则 ETag 不变；
+# 浏览器带 If-None-Match 再次请求时返回 304，不再传输文件。
+#
+# nginx 配置示例（MEDIA_ACCEL_PREFIX = '/protected-media/'）：
+#   location /protected-media/ { internal; alias /path/to/media/; }
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_etags, quote_etag
+
+from .models import Submission
+from .storage import upload_storage
+
+READ_SIZE = 64 * 1024
+CACHE_CONTROL = 'private, max-age=86400'
+# 按内容寻址的文件及其预览图：uploads/ab/cd/<sha256><扩展名>[.w<宽度>.<扩展名>]
+BLOB_PATH = re.compile(r'^uploads/[0-9a-f]{2}/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})[^/]*?'
+                       r'(?P<preview>\.w\d+\.(?:webp|jpg))?$')
+PREVIEW_SUFFIX = re.compile(r'\.w\d+\.(?:webp|jpg)$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# 允许在浏览器中直接打开的类型
+INLINE_TYPES = {'application/pdf', 'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
+
+
+def source_name(name):
+    """预览图对应的原文件路径；不是预览图时原样返回"""
+    return PREVIEW_SUFFIX.sub('', name)
+
+
+def can_view_upload(user, name):
+    """user 能否下载上传文件 name（预览图按其原文件判断）
+
+    相同内容的文件只存一份，可能被多条提交记录引用，能查看其中任意一条即可下载。
+    """
+    if not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    access = Q()
+    if hasattr(user, 'profile'):
+        access |= Q(student__user=user)
+    if hasattr(user, 'counselor_profile'):
+        counselor = user.counselor_profile
+        access |= Q(college=counselor.college, grade=counselor.grade)
+    if not access:
+        return False
+    return Submission.objects.filter(access, file=source_name(name)).exists()
+
+
+def _etag(name, stat):
+    match = BLOB_PATH.match(name)
+    if match:
+        tag = match['digest'] + (match['preview'] or '')
+    else:
+        tag = f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+    return quote_etag(tag)
+
+
+def _parse_range(header, size):
+    """解析单个字节区间，返回 (起点, 终点)（含终点）；无法满足返回 None；多区间或格式不符时忽略"""
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or not (match[1] or match[2]):
+        return False
+    start, end = match[1], match[2]
+    if not start:  # 末尾 N 字节
+        length = int(end)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length:
+            data = f.read(min(READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def media_response(request, name, content_type=None):
+    """发送存储中的文件 name（调用方已检查权限）"""
+    path = upload_storage.path(name)
+    stat = os.stat(path)
+    etag = _etag(name, stat)
+    content_type = content_type or mimetypes.guess_type(name)[0]
+    inline = content_type in INLINE_TYPES
+    if not inline:
+        content_type = 'application/octet-stream'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': CACHE_CONTROL,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Content-Disposition': content_disposition_header(not inline, os.path.basename(name)),
+        'X-Content-Type-Options': 'nosniff',
+    }
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in parse_etags(if_none_match)):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    sendfile = getattr(settings, 'MEDIA_SENDFILE', None)
+    if sendfile:
+        # 由前端代理发送文件（包括 Range），这里只返回响应头
+        response = HttpResponse(content_type=content_type)
+        if sendfile == 'x-accel-redirect':
+            prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name
+        else:
+            response['X-Sendfile'] = path
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    byte_range = False
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    # If-Range 与当前 ETag 不一致说明文件已变化，忽略 Range 返回完整文件
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, stat.st_size)
+    if byte_range is None:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206,
+                                         content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Accept-Ranges'] = 'bytes'
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -172,7 +172,6 @@ class Migration(migrations.Migration):
     ]
 
     operations = [
-        migrations.RunPython(add_initial_categories),
         migrations.CreateModel(
             name='SubmissionCategory',
             fields=[
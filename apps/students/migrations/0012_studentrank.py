@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def build_initial_ranks(apps, schema_editor):
+    """为已有学生生成排名表，规则与 StudentProfile.get_rank 一致"""
+    StudentProfile = apps.get_model('students', 'StudentProfile')
+    StudentRank = apps.get_model('students', 'StudentRank')
+
+    cohorts = StudentProfile.objects.exclude(college='').exclude(grade='').values_list(
+        'college', 'grade').distinct()
+    entries = []
+    for college, grade in cohorts:
+        rows = list(StudentProfile.objects.filter(college=college, grade=grade).order_by(
+            F('total_score').desc(nulls_last=True), 'id').values_list('id', 'total_score'))
+        cohort_size = sum(1 for _, score in rows if score is not None)
+        rank, previous = 0, None
+        for position, (student_id, score) in enumerate(rows, start=1):
+            if score is None:
+                student_rank = cohort_size + 1
+            else:
+                if score != previous:
+                    rank, previous = position, score
+                student_rank = rank
+            entries.append(StudentRank(student_id=student_id, college=college, grade=grade,
+                                       rank=student_rank, cohort_size=cohort_size))
+    StudentRank.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0011_add_submission_categories'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentRank',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rank_entry', serialize=False, to='students.studentprofile', verbose_name='学生')),
+                ('college', models.CharField(max_length=100, verbose_name='学院')),
+                ('grade', models.CharField(max_length=20, verbose_name='年级')),
+                ('rank', models.PositiveIntegerField(verbose_name='排名')),
+                ('cohort_size', models.PositiveIntegerField(verbose_name='有成绩人数')),
+            ],
+            options={
+                'verbose_name': '学生排名',
+                'verbose_name_plural': '学生排名',
+                'indexes': [models.Index(fields=['college', 'grade'], name='students_st_college_abf5b0_idx')],
+            },
+        ),
+        migrations.RunPython(build_initial_ranks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0012_studentrank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('college', models.CharField(max_length=100, verbose_name='学院')),
+                ('grade', models.CharField(max_length=20, verbose_name='年级')),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='快照时间')),
+                ('cohort_size', models.PositiveIntegerField(verbose_name='有成绩人数')),
+                ('student_ids', models.BinaryField(verbose_name='学生ID序列')),
+                ('scores', models.BinaryField(verbose_name='总成绩序列')),
+            ],
+            options={
+                'verbose_name': '排名快照',
+                'verbose_name_plural': '排名快照',
+                'indexes': [models.Index(fields=['college', 'grade', 'taken_at'], name='students_ra_college_44e084_idx')],
+            },
+        ),
+    ]
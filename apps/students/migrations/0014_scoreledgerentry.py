@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+ACADEMIC_GROUPS = ('award_paper', 'competition', 'volunteer')
+
+
+def record_approved_submissions(apps, schema_editor):
+    """为已审核通过的提交补记流水，之后可用 rebuild_scores 命令按流水校正成绩"""
+    Submission = apps.get_model('students', 'Submission')
+    ScoreLedgerEntry = apps.get_model('students', 'ScoreLedgerEntry')
+
+    approved = Submission.objects.filter(approved=True).exclude(approved_score=None).values_list(
+        'id', 'student_id', 'category__group', 'approved_score', 'reviewer_id', 'timestamp')
+    ScoreLedgerEntry.objects.bulk_create([
+        ScoreLedgerEntry(
+            student_id=student_id,
+            submission_id=submission_id,
+            field='academic_expertise_score' if group in ACADEMIC_GROUPS else 'comprehensive_performance_score',
+            delta=score,
+            reason='approve',
+            operator_id=reviewer_id,
+            created_at=timestamp,
+        )
+        for submission_id, student_id, group, score, reviewer_id, timestamp in approved.iterator()
+        if score
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counselors', '0007_alter_counselorprofile_college'),
+        ('students', '0013_ranksnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('academic_expertise_score', '学术专长成绩'), ('comprehensive_performance_score', '综合表现成绩')], max_length=40, verbose_name='成绩字段')),
+                ('delta', models.DecimalField(decimal_places=1, max_digits=6, verbose_name='变动分值')),
+                ('reason', models.CharField(choices=[('approve', '审核通过'), ('reset', '撤销审核')], max_length=20, verbose_name='原因')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='记录时间')),
+                ('operator', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='score_ledger_entries', to='counselors.counselorprofile', verbose_name='操作人')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_ledger', to='students.studentprofile', verbose_name='学生')),
+                ('submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='students.submission', verbose_name='提交记录')),
+            ],
+            options={
+                'verbose_name': '成绩流水',
+                'verbose_name_plural': '成绩流水',
+                'indexes': [models.Index(fields=['student', 'field'], name='students_sc_student_ad3b87_idx')],
+            },
+        ),
+        migrations.RunPython(record_approved_submissions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0014_scoreledgerentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scoreledgerentry',
+            name='reason',
+            field=models.CharField(choices=[('approve', '审核通过'), ('reset', '撤销审核'), ('reconcile', '对账校正')], max_length=20, verbose_name='原因'),
+        ),
+    ]
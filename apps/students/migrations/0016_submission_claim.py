@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counselors', '0007_alter_counselorprofile_college'),
+        ('students', '0015_scoreledgerentry_reconcile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='领取到期时间'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_submissions', to='counselors.counselorprofile', verbose_name='领取人'),
+        ),
+    ]
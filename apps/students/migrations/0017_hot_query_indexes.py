@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:26
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_student_cohort(apps, schema_editor):
+    """把学生的学院、年级写入其已有的提交记录"""
+    Submission = apps.get_model('students', 'Submission')
+    StudentProfile = apps.get_model('students', 'StudentProfile')
+    students = StudentProfile.objects.filter(pk=OuterRef('student_id'))
+    Submission.objects.update(
+        college=Subquery(students.values('college')[:1]),
+        grade=Subquery(students.values('grade')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counselors', '0007_alter_counselorprofile_college'),
+        ('students', '0016_submission_claim'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='studentrank',
+            name='students_st_college_abf5b0_idx',
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='college',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='学院'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='grade',
+            field=models.CharField(blank=True, default='', editable=False, max_length=20, verbose_name='年级'),
+        ),
+        migrations.RunPython(copy_student_cohort, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'created_at'], name='notification_recipient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', 'created_at'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(fields=['college', 'grade', 'total_score'], name='student_cohort_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentrank',
+            index=models.Index(fields=['college', 'grade', 'rank', 'student'], name='studentrank_cohort_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('approved', False), ('rejected', False)), fields=['college', 'grade', 'timestamp', 'id'], name='submission_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['reviewer', 'timestamp', 'id'], name='submission_reviewer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['student', 'timestamp', 'id'], name='submission_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('approved', True)), fields=['college', 'grade', 'timestamp'], name='submission_approved_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:46
+
+import students.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0017_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='存储路径')),
+                ('size', models.PositiveBigIntegerField(verbose_name='文件大小')),
+                ('refcount', models.PositiveIntegerField(default=0, verbose_name='引用次数')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='首次上传时间')),
+            ],
+            options={
+                'verbose_name': '上传文件',
+                'verbose_name_plural': '上传文件',
+            },
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=students.storage.ContentAddressedStorage(), upload_to='uploads/', verbose_name='提交文件'),
+        ),
+    ]
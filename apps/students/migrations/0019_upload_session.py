@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:49
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0018_upload_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='原文件名')),
+                ('size', models.PositiveBigIntegerField(verbose_name='文件大小')),
+                ('received', models.PositiveBigIntegerField(default=0, verbose_name='已接收字节数')),
+                ('file_type', models.CharField(blank=True, max_length=10, verbose_name='文件类型')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='内容哈希')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='最后接收时间')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='students.studentprofile')),
+            ],
+            options={
+                'verbose_name': '分块上传',
+                'verbose_name_plural': '分块上传',
+            },
+        ),
+    ]
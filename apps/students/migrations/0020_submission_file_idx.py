@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counselors', '0008_exportjob'),
+        ('students', '0019_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['file'], name='submission_file_idx'),
+        ),
+    ]
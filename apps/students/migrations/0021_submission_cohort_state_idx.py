@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('counselors', '0008_exportjob'),
+        ('students', '0020_submission_file_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='submission',
+            name='submission_approved_idx',
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['college', 'grade', 'approved', 'rejected', 'timestamp'], name='submission_cohort_state_idx'),
+        ),
+    ]
@@ -1,10 +1,202 @@
 # 学生应用的模型定义。
 
-from django.db import models
+import os
+import sys
+import uuid
+from array import array
+from bisect import bisect_left
+from decimal import Decimal
+from itertools import groupby
+from operator import neg
+
+from django.db import models, transaction
+from django.db.models import Case, Count, DecimalField, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.validators import RegexValidator
-from decimal import Decimal
 from django.utils import timezone
+from .bulk import bulk_update_rows
+from .cohorts import invalidate_cohort
+from .counters import touch_submissions
+from .scoring import (
+    compute_total_score, compute_total_tenths_batch, ratio_to_hundredths, score_to_tenths, tenths_to_score
+)
+from .previews import delete_previews, previewable, schedule_previews
+from .storage import UPLOAD_DIR, blob_name, upload_storage
+
+
+# 由审核加分累加而来的成绩字段
+SCORE_FIELDS = ('academic_expertise_score', 'comprehensive_performance_score')
+
+
+class StudentProfileQuerySet(models.QuerySet):
+    def ranked_in(self, college, grade):
+        """学院年级内的学生按名次排列
+
+        标注名次 cohort_rank、有成绩人数 cohort_size 和排名百分比 cohort_percentile（前 x%，无总成绩时为空），
+        规则与 get_rank 一致。名次读取排名表（StudentRank），左连接：排名表中没有本学院年级记录的学生
+        （尚未刷新或刷新失败）按 compute_rank 的规则用子查询现场统计，不会从列表中消失。
+        按 (学院, 年级, 总成绩) 索引顺序返回，并列时 id 大的在前，不需要窗口函数和排序。
+        """
+        scored = StudentProfile.objects.filter(college=college, grade=grade, total_score__isnull=False)
+        cohort_size = Coalesce(Subquery(scored.order_by().values('college').annotate(n=Count('pk')).values('n')), 0)
+        higher = Coalesce(Subquery(
+            scored.filter(total_score__gt=OuterRef('total_score')).order_by().values('college')
+            .annotate(n=Count('pk')).values('n')
+        ), 0)
+        ranked = Q(rank_entry__college=college, rank_entry__grade=grade)
+        return self.filter(college=college, grade=grade).annotate(
+            cohort_rank=Case(
+                When(ranked, then=F('rank_entry__rank')),
+                When(total_score__isnull=True, then=cohort_size + 1),
+                default=higher + 1,
+            ),
+            cohort_size=Case(
+                When(ranked, then=F('rank_entry__cohort_size')),
+                default=cohort_size,
+            ),
+        ).annotate(
+            cohort_percentile=Case(
+                When(total_score__isnull=True, then=None),
+                default=F('cohort_rank') * 100.0 / F('cohort_size'),
+                output_field=FloatField(),
+            ),
+        ).order_by(F('total_score').desc(nulls_last=True), '-id')
+
+    def recompute_total_scores(self, chunk_size=2000, dry_run=False):
+        """批量重算总成绩，结果与逐个调用 save() 完全一致
+
+        按主键分块读取成绩与权重列，整列计算后每块一次性写回变化的行，
+        最后刷新受影响学院年级的排名表。返回 [(学号, 原总成绩, 新总成绩)] 变化列表。
+        """
+        columns = (
+            'pk', 'student_id', 'college', 'grade', 'total_score',
+            'academic_comprehensive_score', 'academic_expertise_score', 'comprehensive_performance_score',
+            'academic_comprehensive_ratio', 'academic_expertise_ratio', 'comprehensive_performance_ratio',
+        )
+        # 与 save() 一致：没有学业综合成绩的学生不计算总成绩
+        queryset = self.exclude(academic_comprehensive_score__isnull=True).order_by('pk')
+
+        changes, cohorts = [], set()
+        with transaction.atomic():
+            last_pk = 0
+            while True:
+                rows = list(queryset.filter(pk__gt=last_pk).values_list(*columns)[:chunk_size])
+                if not rows:
+                    break
+                last_pk = rows[-1][0]
+
+                totals = compute_total_tenths_batch(
+                    [score_to_tenths(row[5]) for row in rows],
+                    [score_to_tenths(row[6]) for row in rows],
+                    [score_to_tenths(row[7]) for row in rows],
+                    [ratio_to_hundredths(row[8]) for row in rows],
+                    [ratio_to_hundredths(row[9]) for row in rows],
+                    [ratio_to_hundredths(row[10]) for row in rows],
+                )
+
+                changed = []
+                for row, tenths in zip(rows, totals):
+                    new_total = tenths_to_score(tenths)
+                    if new_total != row[4]:
+                        changes.append((row[1], row[4], new_total))
+                        cohorts.add((row[2], row[3]))
+                        changed.append((row[0], new_total))
+
+                if changed and not dry_run:
+                    bulk_update_rows(self.model, ['total_score'], changed)
+
+            if not dry_run:
+                for college, grade in cohorts:
+                    StudentRank.objects.refresh_cohort(college, grade)
+        return changes
+
+    def increment_scores(self, increments):
+        """在数据库内原子累加学术专长/综合表现成绩，再重算总成绩并刷新排名
+
+        increments 为 {学生id: {成绩字段: 增量}}。每个成绩字段只发一条
+        UPDATE ... SET 字段 = 字段 + CASE id WHEN ... END，不读取、不回写整行，
+        并发审核同一学生时不会互相覆盖。
+        """
+        increments = {pk: changes for pk, changes in increments.items() if any(changes.values())}
+        if not increments:
+            return
+
+        with transaction.atomic():
+            for field in SCORE_FIELDS:
+                deltas = {pk: changes[field] for pk, changes in increments.items() if changes.get(field)}
+                if not deltas:
+                    continue
+                delta = Case(
+                    *(When(pk=pk, then=Value(value)) for pk, value in deltas.items()),
+                    default=Value(Decimal(0)),
+                    output_field=DecimalField(max_digits=6, decimal_places=1),
+                )
+                self.model.objects.filter(pk__in=deltas).update(**{field: F(field) + delta})
+
+            students = self.model.objects.filter(pk__in=increments)
+            students.recompute_total_scores()
+            # 没有学业综合成绩的学生总成绩不变，但分项成绩分布已变化
+            for college, grade in set(students.values_list('college', 'grade')):
+                invalidate_cohort(college, grade)
+
+    def set_academic_scores(self, scores):
+        """批量设置学业综合成绩，scores 为 {学生id: 成绩}
+
+        一个事务内用一条参数化 UPDATE（executemany）写入，再批量重算这些学生的总成绩、
+        刷新排名，与逐个 save() 的结果一致。
+        """
+        if not scores:
+            return
+
+        with transaction.atomic():
+            bulk_update_rows(self.model, ['academic_comprehensive_score'], list(scores.items()))
+            students = self.model.objects.filter(pk__in=scores)
+            students.recompute_total_scores()
+            for college, grade in set(students.values_list('college', 'grade')):
+                invalidate_cohort(college, grade)
+                invalidate_cohort(college, grade, namespace='profiles')
+
+    def sync_score_aggregates(self, aggregates, chunk_size=2000, dry_run=False):
+        """把学术专长/综合表现成绩改为给定的汇总值并重算总成绩
+
+        aggregates 为 {学生id: {成绩字段: 汇总值}}，未出现的学生或字段视为 0。
+        按主键分块比较，每块一次性写回不一致的行。
+        返回 [(学生id, 学号, (原学术专长, 原综合表现), (新学术专长, 新综合表现))] 差异列表。
+        """
+        queryset = self.order_by('pk')
+        zero = Decimal('0.0')
+
+        differences, cohorts = [], set()
+        with transaction.atomic():
+            last_pk = 0
+            while True:
+                rows = list(queryset.filter(pk__gt=last_pk).values_list(
+                    'pk', 'student_id', 'college', 'grade', *SCORE_FIELDS
+                )[:chunk_size])
+                if not rows:
+                    break
+                last_pk = rows[-1][0]
+
+                changed = []
+                for pk, student_id, college, grade, *current in rows:
+                    target = aggregates.get(pk, {})
+                    expected = [Decimal(target.get(field) or 0).quantize(Decimal('0.1')) for field in SCORE_FIELDS]
+                    current = [value if value is not None else zero for value in current]
+                    if expected != current:
+                        differences.append((pk, student_id, tuple(current), tuple(expected)))
+                        cohorts.add((college, grade))
+                        changed.append((pk, *expected))
+
+                if changed and not dry_run:
+                    bulk_update_rows(self.model, SCORE_FIELDS, changed)
+
+            if differences and not dry_run:
+                self.recompute_total_scores(chunk_size=chunk_size)
+                for college, grade in cohorts:
+                    invalidate_cohort(college, grade)
+        return differences
 
 
 # 学生档案
@@ -100,15 +292,60 @@ class StudentProfile(models.Model):
         default=0.2  # 20%
     )
 
+    objects = StudentProfileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # 学院年级内的筛选、计数和按总成绩排序（排名表刷新、成绩分布、学生列表、分页计数）
+            models.Index(fields=['college', 'grade', 'total_score'], name='student_cohort_score_idx'),
+        ]
+
+    # 从数据库读出时影响排名和成绩分布的字段，保存时据此判断是否需要刷新排名表和缓存
+    _original_ranking_key = (None, None, None)
+    _original_score_key = (None, None, None)
+
     def __str__(self):
         return self.full_name or self.student_id or str(self.user)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._original_ranking_key = instance._ranking_key()
+        instance._original_score_key = instance._score_key()
+        return instance
+
+    def _ranking_key(self):
+        # 使用 __dict__ 读取，避免对延迟加载字段触发额外查询
+        return (
+            self.__dict__.get('college'),
+            self.__dict__.get('grade'),
+            self.__dict__.get('total_score'),
+        )
+
+    def _score_key(self):
+        return (
+            self.__dict__.get('academic_comprehensive_score'),
+            self.__dict__.get('academic_expertise_score'),
+            self.__dict__.get('comprehensive_performance_score'),
+        )
+
     def get_rank(self):
-        """计算学生在本学院本年级的排名（按总分降序）"""
+        """获取学生在本学院本年级的排名（按总分降序），优先读取排名表"""
         # 新增：检查必要字段是否存在，若不存在返回默认排名
         if not all([self.college, self.grade]):
             return (0, 0)  # 学院或年级未设置时，返回(0,0)避免查询错误
 
+        # 排名表中的记录与当前学院年级一致时直接返回，无需统计整个年级
+        entry = getattr(self, 'rank_entry', None)
+        if entry is not None and entry.college == self.college and entry.grade == self.grade:
+            return (entry.rank, entry.cohort_size)
+        return self.compute_rank()
+
+    def compute_rank(self):
+        """实时统计学生在本学院本年级的排名（排名表缺失时的兜底方案）"""
+        if not all([self.college, self.grade]):
+            return (0, 0)
+
         # 只比较同学院同年级且有总成绩的学生
         same_group = StudentProfile.objects.filter(
             college=self.college,
@@ -126,17 +363,257 @@ class StudentProfile(models.Model):
         return (higher_count + 1, total_count)
 
     def save(self, *args, **kwargs):
-        # 自动计算总成绩：各项成绩 × 对应权重之和
-        if (self.academic_comprehensive_score is not None and
-                self.academic_expertise_ratio is not None and
-                self.comprehensive_performance_ratio is not None):
-            self.total_score = (
-                    Decimal(self.academic_comprehensive_score) * self.academic_comprehensive_ratio +
-                    Decimal(self.academic_expertise_score) * self.academic_expertise_ratio +
-                    Decimal(self.comprehensive_performance_score) * self.comprehensive_performance_ratio
-            )
+        # 自动计算总成绩：各项成绩 × 对应权重之和，保留一位小数（规则见 scoring 模块，与批量重算一致）
+        total_score = compute_total_score(
+            self.academic_comprehensive_score,
+            self.academic_expertise_score,
+            self.comprehensive_performance_score,
+            self.academic_comprehensive_ratio,
+            self.academic_expertise_ratio,
+            self.comprehensive_performance_ratio,
+        )
+        if total_score is not None:
+            self.total_score = total_score
+        adding = self._state.adding
         super().save(*args, **kwargs)
 
+        # 新建学生或总成绩、学院、年级发生变化时，刷新受影响学院年级的排名表
+        old_college, old_grade, _ = self._original_ranking_key
+        new_key = self._ranking_key()
+        if adding:
+            # 学院年级学生数变化（控制台统计）
+            touch_submissions(self.college, self.grade)
+        if adding or new_key != self._original_ranking_key:
+            if not adding and (old_college, old_grade) != (self.college, self.grade):
+                StudentRank.objects.refresh_cohort(old_college, old_grade)
+                # 该学生的提交记录随之转到新的学院年级
+                Submission.objects.filter(student=self).update(college=self.college, grade=self.grade)
+                touch_submissions(old_college, old_grade)
+                touch_submissions(self.college, self.grade)
+            StudentRank.objects.refresh_cohort(self.college, self.grade)
+            # 清除已缓存的排名记录，下次 get_rank 读取最新值
+            self._state.fields_cache.pop('rank_entry', None)
+        elif self._score_key() != self._original_score_key:
+            # 排名未变但分项成绩变了，成绩分布等缓存仍需失效
+            invalidate_cohort(self.college, self.grade)
+        self._original_ranking_key = new_key
+        self._original_score_key = self._score_key()
+        # 学生资料（姓名、专业等）可能变化，使后台导出的缓存文件失效
+        invalidate_cohort(self.college, self.grade, namespace='profiles')
+
+    def delete(self, *args, **kwargs):
+        college, grade = self.college, self.grade
+        with transaction.atomic():
+            files = list(Submission.objects.filter(student=self).values_list('file', flat=True))
+            result = super().delete(*args, **kwargs)
+            UploadBlob.objects.release(files)
+        # 学生删除后同年级其他学生的排名随之变化，其提交记录也已一并删除
+        StudentRank.objects.refresh_cohort(college, grade)
+        touch_submissions(college, grade)
+        return result
+
+
+class StudentRankManager(models.Manager):
+    def refresh_cohort(self, college, grade):
+        """重新计算某学院某年级的排名，只写入发生变化的记录"""
+        if not (college and grade):
+            return
+        # 读取和写入在同一事务中完成，同一年级的两次刷新不会交错写入
+        with transaction.atomic():
+            self._refresh_cohort(college, grade)
+        # 排名变化意味着该学院年级的成绩分布已变，清除相关缓存
+        invalidate_cohort(college, grade)
+
+    def _refresh_cohort(self, college, grade):
+        # 一次查询取出整个年级的总成绩，按总分降序排列，无总成绩的学生排在最后
+        rows = StudentProfile.objects.filter(
+            college=college,
+            grade=grade
+        ).order_by(F('total_score').desc(nulls_last=True), 'id').values_list('id', 'total_score')
+        rows = list(rows)
+        cohort_size = sum(1 for _, score in rows if score is not None)
+
+        # 并列分数共享名次（1, 2, 2, 4），与 get_rank 的“高于我的人数 + 1”规则一致
+        ranks = {}
+        rank, previous = 0, None
+        for position, (student_id, score) in enumerate(rows, start=1):
+            if score is None:
+                ranks[student_id] = cohort_size + 1
+                continue
+            if score != previous:
+                rank, previous = position, score
+            ranks[student_id] = rank
+
+        # 现有记录：本年级的旧记录 + 刚转入本年级的学生的记录
+        existing = {
+            student_id: entry
+            for student_id, *entry in self.filter(
+                Q(college=college, grade=grade) |
+                Q(student__college=college, student__grade=grade)
+            ).values_list('student_id', 'rank', 'cohort_size', 'college', 'grade')
+        }
+
+        to_create, to_update, stale_ids = [], [], []
+        for student_id, entry in existing.items():
+            if student_id not in ranks:
+                stale_ids.append(student_id)  # 已转出本年级或已删除
+        for student_id, rank in ranks.items():
+            entry = existing.get(student_id)
+            if entry is None:
+                to_create.append(self.model(
+                    student_id=student_id, college=college, grade=grade,
+                    rank=rank, cohort_size=cohort_size
+                ))
+            elif entry != [rank, cohort_size, college, grade]:
+                to_update.append((student_id, rank, cohort_size, college, grade))
+
+        if stale_ids:
+            self.filter(student_id__in=stale_ids, college=college, grade=grade).delete()
+        if to_update:
+            bulk_update_rows(self.model, ['rank', 'cohort_size', 'college', 'grade'], to_update)
+        if to_create:
+            # 另一次刷新可能已为同一学生建好记录，冲突时改为更新
+            self.bulk_create(
+                to_create, batch_size=500, update_conflicts=True, unique_fields=['student'],
+                update_fields=['college', 'grade', 'rank', 'cohort_size']
+            )
+
+
+# 学院年级排名表（物化视图，随学生成绩变化自动维护）
+class StudentRank(models.Model):
+    student = models.OneToOneField(
+        StudentProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rank_entry',
+        verbose_name="学生"
+    )
+    college = models.CharField("学院", max_length=100)
+    grade = models.CharField("年级", max_length=20)
+    rank = models.PositiveIntegerField("排名")
+    cohort_size = models.PositiveIntegerField("有成绩人数")
+
+    objects = StudentRankManager()
+
+    class Meta:
+        verbose_name = "学生排名"
+        verbose_name_plural = "学生排名"
+        indexes = [
+            models.Index(fields=['college', 'grade', 'rank', 'student'], name='studentrank_cohort_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.rank}/{self.cohort_size}"
+
+
+def _pack(typecode, values):
+    # 统一按小端序存储，保证快照在不同机器间可读
+    data = array(typecode, values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _unpack(typecode, raw):
+    data = array(typecode)
+    data.frombytes(bytes(raw))
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+class RankSnapshotManager(models.Manager):
+    def take(self, college=None, grade=None, force=False):
+        """为各学院年级记录一份排名快照，排名与上一份快照相同时跳过（force=True 时强制记录）
+
+        返回新建的快照列表。
+        """
+        students = StudentProfile.objects.exclude(college='').exclude(grade='')
+        if college:
+            students = students.filter(college=college)
+        if grade:
+            students = students.filter(grade=grade)
+        rows = students.order_by(
+            'college', 'grade', F('total_score').desc(nulls_last=True), 'id'
+        ).values_list('college', 'grade', 'id', 'total_score')
+
+        created = []
+        for (cohort_college, cohort_grade), cohort_rows in groupby(rows.iterator(), key=lambda row: row[:2]):
+            cohort_rows = list(cohort_rows)
+            scored = [score_to_tenths(row[3]) for row in cohort_rows if row[3] is not None]
+            snapshot = self.model(
+                college=cohort_college,
+                grade=cohort_grade,
+                cohort_size=len(scored),
+                student_ids=_pack('q', (row[2] for row in cohort_rows)),
+                scores=_pack('i', scored),
+            )
+            if not force:
+                latest = self.filter(college=cohort_college, grade=cohort_grade).order_by('-taken_at').first()
+                if latest and bytes(latest.student_ids) == snapshot.student_ids and bytes(latest.scores) == snapshot.scores:
+                    continue
+            created.append(snapshot)
+        return self.bulk_create(created)
+
+    def rank_at(self, student, when, college=None, grade=None):
+        """查询学生在某一时刻的排名 (名次, 有成绩人数, 快照时间)，没有快照时返回 None
+
+        默认按学生当前的学院年级查找，学生转过学院或年级时可显式指定。
+        """
+        snapshot = self.filter(
+            college=college or student.college,
+            grade=grade or student.grade,
+            taken_at__lte=when
+        ).order_by('-taken_at').first()
+        if snapshot is None:
+            return None
+        rank = snapshot.rank_of(student.pk)
+        if rank is None:
+            return None
+        return (rank, snapshot.cohort_size, snapshot.taken_at)
+
+
+# 排名历史快照：每份快照以紧凑的二进制数组保存一个学院年级的完整排名
+class RankSnapshot(models.Model):
+    college = models.CharField("学院", max_length=100)
+    grade = models.CharField("年级", max_length=20)
+    taken_at = models.DateTimeField("快照时间", default=timezone.now)
+    cohort_size = models.PositiveIntegerField("有成绩人数")
+    # 按排名顺序排列的学生 id（int64），前 cohort_size 个为有总成绩的学生
+    student_ids = models.BinaryField("学生ID序列")
+    # 对应学生的总成绩，0.1 为单位的定点整数（int32），降序
+    scores = models.BinaryField("总成绩序列")
+
+    objects = RankSnapshotManager()
+
+    class Meta:
+        verbose_name = "排名快照"
+        verbose_name_plural = "排名快照"
+        indexes = [
+            models.Index(fields=['college', 'grade', 'taken_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.college} {self.grade} @ {self.taken_at:%Y-%m-%d %H:%M}"
+
+    def get_student_ids(self):
+        return _unpack('q', self.student_ids)
+
+    def get_scores(self):
+        return _unpack('i', self.scores)
+
+    def rank_of(self, student_pk):
+        """学生在本快照中的名次，规则与 get_rank 一致；不在快照中时返回 None"""
+        try:
+            position = self.get_student_ids().index(student_pk)
+        except ValueError:
+            return None
+        if position >= self.cohort_size:
+            return self.cohort_size + 1  # 无总成绩，排在所有有成绩的学生之后
+        scores = self.get_scores()
+        # 成绩降序排列：二分查找该分数第一次出现的位置（并列分数名次相同）
+        return bisect_left(scores, -scores[position], hi=position, key=neg) + 1
+
 
 class SubmissionCategory(models.Model):
     """加分项细分分类模型"""
@@ -149,6 +626,9 @@ class SubmissionCategory(models.Model):
         ('other', '其他'),
     ]
 
+    # 各大类审核通过后累加到的成绩字段：科研成果、学业竞赛、创新创业训练计入学术专长成绩，其余计入综合表现成绩
+    ACADEMIC_GROUPS = ('award_paper', 'competition', 'volunteer')
+
     group = models.CharField("大类", max_length=20, choices=CATEGORY_GROUP)  # 关联到大类
     name = models.CharField("小类名称", max_length=100)  # 例如："A类论文发表"
     description = models.TextField("说明", blank=True)  # 小类的详细说明
@@ -158,11 +638,112 @@ class SubmissionCategory(models.Model):
     def __str__(self):
         return f"{self.get_group_display()}-{self.name}"
 
+    @property
+    def score_field(self):
+        """审核通过的加分累加到 StudentProfile 的哪个成绩字段"""
+        return self.score_field_for(self.group)
+
+    @classmethod
+    def score_field_for(cls, group):
+        if group in cls.ACADEMIC_GROUPS:
+            return 'academic_expertise_score'
+        return 'comprehensive_performance_score'
+
     class Meta:
         verbose_name = "加分项细分分类"
         verbose_name_plural = "加分项细分分类"
 
 
+# 引用登记与文件删除的互斥：两边都先锁定 UploadBlob 行再操作文件，锁持有到事务结束。
+#   新增引用：锁定（或新建）行并计数加一，然后才把临时文件移入存储（已有相同文件则直接引用）；
+#   删除文件：引用数降为 0 的行保留到事务提交后，由 _delete_unused_blobs 在新事务中按“引用数仍为 0”
+#   的条件删除该行，删除成功才删文件。
+# 删除先发生时，新增引用要等删除事务结束，随后发现文件已不存在，由本次的临时文件重新写入；
+# 新增引用先发生时，删除条件不再成立，文件保留。
+class UploadBlobManager(models.Manager):
+    def acquire(self, name, size):
+        """新增一处对存储文件 name 的引用（须在事务中调用，行锁持有到事务结束）"""
+        with transaction.atomic():
+            blob, created = self.select_for_update().get_or_create(name=name, defaults={'size': size, 'refcount': 1})
+            if not created:
+                self.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+            else:
+                # 新文件：提交后在后台生成缩略图和预览图
+                transaction.on_commit(lambda: schedule_previews(name))
+
+    def adopt(self, path, directory, digest, ext, size):
+        """把已写好、已算出哈希的临时文件 path 作为一处新的引用移入存储，返回存储路径"""
+        name = blob_name(directory, digest, ext)
+        with transaction.atomic():
+            self.acquire(name, size)
+            upload_storage.adopt(path, directory, digest, ext)
+        return name
+
+    def release(self, names):
+        """names 中每个文件各减少一处引用（同名出现几次减几次），不再被引用的文件在事务提交后删除"""
+        counts = {}
+        for name in names:
+            if name:
+                counts[name] = counts.get(name, 0) + 1
+        if not counts:
+            return
+        with transaction.atomic():
+            for name, count in counts.items():
+                self.filter(name=name).update(refcount=F('refcount') - count)
+            unused = list(self.filter(name__in=counts, refcount__lte=0).values_list('name', flat=True))
+            transaction.on_commit(lambda: _delete_unused_blobs(unused))
+
+
+def _delete_unused_blobs(names):
+    for name in names:
+        with transaction.atomic():
+            # 其间被重新引用（引用数大于 0）时不删除；删除行即锁定，文件删完才释放
+            if UploadBlob.objects.filter(name=name, refcount__lte=0).delete()[0]:
+                upload_storage.delete(name)
+                delete_previews(name)
+
+
+# 上传文件（按内容寻址存储，见 storage.py）及其被提交记录引用的次数
+class UploadBlob(models.Model):
+    name = models.CharField("存储路径", max_length=255, unique=True)
+    size = models.PositiveBigIntegerField("文件大小")
+    refcount = models.PositiveIntegerField("引用次数", default=0)
+    created_at = models.DateTimeField("首次上传时间", auto_now_add=True)
+
+    objects = UploadBlobManager()
+
+    class Meta:
+        verbose_name = "上传文件"
+        verbose_name_plural = "上传文件"
+
+    def __str__(self):
+        return f"{self.name}（{self.refcount} 处引用）"
+
+
+# 分块上传会话：学生分块上传证明材料，中断后从已收到的位置续传（见 chunked.py）
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField("原文件名", max_length=255)
+    size = models.PositiveBigIntegerField("文件大小")
+    received = models.PositiveBigIntegerField("已接收字节数", default=0)
+    file_type = models.CharField("文件类型", max_length=10, blank=True)  # 由文件头识别出的扩展名，如 .pdf
+    sha256 = models.CharField("内容哈希", max_length=64, blank=True)  # 全部接收后填写
+    created_at = models.DateTimeField("创建时间", auto_now_add=True)
+    updated_at = models.DateTimeField("最后接收时间", auto_now=True)
+
+    class Meta:
+        verbose_name = "分块上传"
+        verbose_name_plural = "分块上传"
+
+    def __str__(self):
+        return f"{self.filename}（{self.received}/{self.size}）"
+
+    @property
+    def complete(self):
+        return bool(self.sha256)
+
+
 # 学生提交信息
 class Submission(models.Model):
 
@@ -181,17 +762,162 @@ class Submission(models.Model):
         verbose_name="加分项细分分类"
     )
     remarks = models.TextField("备注", blank=True, default="")
-    file = models.FileField("提交文件", upload_to='uploads/', null=True, blank=True)
+    # 相同内容的文件只存一份，由 UploadBlob 记录引用次数
+    file = models.FileField("提交文件", upload_to='uploads/', storage=upload_storage, null=True, blank=True)
     self_rating = models.DecimalField("自评加分", max_digits=5, decimal_places=1, default=0)
     approved = models.BooleanField("已审核通过", default=False)
     rejected = models.BooleanField(default=False, verbose_name='已驳回')
     reject_reason = models.TextField(blank=True, null=True, verbose_name='驳回理由')
     approved_score = models.DecimalField("审核加分", max_digits=5, decimal_places=1, null=True, blank=True)
     timestamp = models.DateTimeField("提交时间", auto_now_add=True)
+    # 审核领取：辅导员领取后在租约期内由其独占审核，租约过期自动回到待领取状态（见 counselors/claims.py）
+    claimed_by = models.ForeignKey(
+        'counselors.CounselorProfile',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='claimed_submissions',
+        verbose_name="领取人"
+    )
+    claim_expires_at = models.DateTimeField("领取到期时间", null=True, blank=True)
+    # 提交学生的学院、年级（冗余保存，随学生档案同步），审核队列按学院年级筛选排序时不必连接学生表
+    college = models.CharField("学院", max_length=100, blank=True, default='', editable=False)
+    grade = models.CharField("年级", max_length=20, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [
+            # 待审核队列（审核列表、控制台、领取）：只索引待审核行，学院年级内按 (提交时间, id) 有序
+            models.Index(fields=['college', 'grade', 'timestamp', 'id'], condition=Q(approved=False, rejected=False),
+                         name='submission_pending_idx'),
+            # 已审核列表：按审核人筛选、按提交时间排序
+            models.Index(fields=['reviewer', 'timestamp', 'id'], name='submission_reviewer_idx'),
+            # 学生本人的提交记录
+            models.Index(fields=['student', 'timestamp', 'id'], name='submission_student_idx'),
+            # 控制台待审核数、本周通过数：学院年级内按状态计数，只读索引
+            models.Index(fields=['college', 'grade', 'approved', 'rejected', 'timestamp'],
+                         name='submission_cohort_state_idx'),
+            # 下载文件时按路径查找引用它的提交记录（权限检查）
+            models.Index(fields=['file'], name='submission_file_idx'),
+        ]
+
+    _original_file = ''  # 从数据库读出时引用的文件，新建的记录为空
+    _staged = None  # 待移入存储的分块上传文件，见 stage_file
 
     def __str__(self):
         student_name = self.student.full_name or self.student.user.username
-        return f"提交#{self.id} - {student_name} - {self.get_category_display()}"
+        return f"提交#{self.id} - {student_name} - {self.category}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时引用的文件，保存时据此调整引用计数（未加载 file 列时不触发查询）
+        instance._original_file = instance._file_name()
+        return instance
+
+    def _file_name(self):
+        value = self.__dict__.get('file')
+        return getattr(value, 'name', value) or ''
+
+    @property
+    def has_preview(self):
+        """附件是图片或 PDF，可显示缩略图和预览图"""
+        return previewable(self.file.name)
+
+    def stage_file(self, path, digest, ext, size):
+        """以已写好的临时文件 path（分块上传）作为附件，保存时登记引用并移入存储"""
+        self._staged = (path, digest, ext, size)
+
+    def _adopt_upload(self):
+        """新上传的文件：先登记引用再移入存储（见 UploadBlobManager），附件改为存储路径"""
+        file = self.file if 'file' in self.__dict__ else None
+        if self._staged:
+            path, digest, ext, size = self._staged
+            self.file = UploadBlob.objects.adopt(path, UPLOAD_DIR, digest, ext, size)
+            self._staged = None
+            return True
+        if file and not file._committed:
+            # 直接上传：写入临时文件并算出哈希，再与分块上传一样移入
+            path, digest = upload_storage.stage(file)
+            try:
+                self.file = UploadBlob.objects.adopt(
+                    path, UPLOAD_DIR, digest, os.path.splitext(file.name)[1].lower(), file.size
+                )
+            finally:
+                if os.path.exists(path):
+                    os.remove(path)
+            return True
+        return False
+
+    def save(self, *args, **kwargs):
+        self.college, self.grade = self.student.college, self.student.grade
+        with transaction.atomic():
+            adopted = self._adopt_upload()
+            changed = 'file' in self.__dict__ and self._file_name() != self._original_file
+            if changed and not adopted and self.file:
+                # 直接指定了已在存储中的文件
+                UploadBlob.objects.acquire(self.file.name, self.file.size)
+            super().save(*args, **kwargs)
+            if changed:
+                UploadBlob.objects.release([self._original_file])
+                self._original_file = self._file_name()
+        # 提交或审核状态变化，使该学院年级的提交计数缓存失效
+        touch_submissions(self.college, self.grade)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            UploadBlob.objects.release([self.file.name])
+        touch_submissions(self.college, self.grade)
+        return result
+
+
+class ScoreLedgerManager(models.Manager):
+    def totals(self):
+        """按学生、成绩字段汇总流水，返回 {学生id: {成绩字段: 合计}}"""
+        totals = {}
+        rows = self.values('student_id', 'field').annotate(total=Sum('delta')).order_by()
+        for row in rows:
+            totals.setdefault(row['student_id'], {})[row['field']] = row['total']
+        return totals
+
+
+# 成绩流水：每次审核通过或撤销都追加一条，只增不改；
+# 学生档案上的学术专长/综合表现成绩是流水的汇总，可随时据此重建
+class ScoreLedgerEntry(models.Model):
+    FIELD_CHOICES = [
+        ('academic_expertise_score', '学术专长成绩'),
+        ('comprehensive_performance_score', '综合表现成绩'),
+    ]
+    REASON_CHOICES = [
+        ('approve', '审核通过'),
+        ('reset', '撤销审核'),
+        ('reconcile', '对账校正'),
+    ]
+
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='score_ledger',
+                                verbose_name="学生")
+    submission = models.ForeignKey(Submission, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='ledger_entries', verbose_name="提交记录")
+    field = models.CharField("成绩字段", max_length=40, choices=FIELD_CHOICES)
+    delta = models.DecimalField("变动分值", max_digits=6, decimal_places=1)
+    reason = models.CharField("原因", max_length=20, choices=REASON_CHOICES)
+    operator = models.ForeignKey('counselors.CounselorProfile', on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='score_ledger_entries', verbose_name="操作人")
+    created_at = models.DateTimeField("记录时间", default=timezone.now)
+
+    objects = ScoreLedgerManager()
+
+    class Meta:
+        verbose_name = "成绩流水"
+        verbose_name_plural = "成绩流水"
+        indexes = [models.Index(fields=['student', 'field'])]
+
+    def __str__(self):
+        return f"{self.student} {self.get_field_display()} {self.delta:+}"
+
+
+# 加分规则总数的缓存键（辅导员控制台使用），规则新增、删除时清除
+RULES_COUNT_KEY = 'rules_count'
 
 
 # 加分规则
@@ -218,6 +944,17 @@ class Rule(models.Model):
     def __str__(self):
         return f"{self.get_rule_type_display()}: {self.item_name}"
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            cache.delete(RULES_COUNT_KEY)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        cache.delete(RULES_COUNT_KEY)
+        return result
+
 
 # 通知模型
 class Notification(models.Model):
@@ -240,3 +977,10 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # 学生的通知列表（按时间倒序）
+            models.Index(fields=['recipient', 'created_at'], name='notification_recipient_idx'),
+            # 未读通知：标记已读、未读计数
+            models.Index(fields=['recipient', 'created_at'], condition=Q(is_read=False),
+                         name='notification_unread_idx'),
+        ]
@@ -0,0 +1,111 @@
+# 按 (提交时间, id) 倒序的游标分页。
+#
+# 与 OFFSET 分页不同，每一页都用 WHERE (timestamp, id) < (游标) 定位，
+# 查询代价与翻到第几页、总共有多少条无关；翻页期间有新提交也不会出现重复或遗漏。
+# 翻页链接保留页面的其他查询参数（如 mine=1 等筛选条件），只替换游标。
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from django.http import QueryDict
+
+PER_PAGE = 50
+CURSOR_PARAMS = ('after', 'before')
+
+
+def encode_cursor(item):
+    raw = f"{item.timestamp.isoformat()}|{item.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def strip_cursor(params):
+    """去掉游标参数后的查询参数（QueryDict）"""
+    query = QueryDict(mutable=True)
+    items = params.lists() if hasattr(params, 'lists') else ((key, [value]) for key, value in params.items())
+    for key, values in items:
+        if key not in CURSOR_PARAMS:
+            query.setlist(key, values)
+    return query
+
+
+def decode_cursor(token):
+    """解析游标，格式不正确时返回 None（当作第一页）"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """一页数据：items 为本页记录，next_cursor / prev_cursor 为翻页参数（没有下一页/上一页时为 None），
+    first_url / prev_url / next_url 为带上其他查询参数的翻页链接"""
+
+    def __init__(self, items, next_cursor, prev_cursor, total=None, query=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.query = query if query is not None else QueryDict()
+
+    @property
+    def has_other_pages(self):
+        return bool(self.next_cursor or self.prev_cursor)
+
+    def _url(self, **cursor):
+        query = self.query.copy()
+        for key, value in cursor.items():
+            query[key] = value
+        return '?' + query.urlencode()
+
+    @property
+    def first_url(self):
+        return self._url()
+
+    @property
+    def prev_url(self):
+        return self._url(before=self.prev_cursor) if self.prev_cursor else None
+
+    @property
+    def next_url(self):
+        return self._url(after=self.next_cursor) if self.next_cursor else None
+
+
+def keyset_paginate(queryset, params, per_page=PER_PAGE, total=None):
+    """按 (timestamp, id) 倒序分页
+
+    params 为 request.GET：after=游标 取该记录之后（更早）的一页，before=游标 取之前（更新）的一页。
+    """
+    query = strip_cursor(params)
+    after = decode_cursor(params.get('after', ''))
+    before = decode_cursor(params.get('before', '')) if after is None else None
+
+    if before is not None:
+        timestamp, pk = before
+        rows = list(queryset.filter(
+            Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk)
+        ).order_by('timestamp', 'pk')[:per_page + 1])
+        if not rows:  # 游标之前已没有记录（例如被删除），回到第一页
+            return keyset_paginate(queryset, query, per_page, total)
+        has_prev = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if after is not None:
+            timestamp, pk = after
+            queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk))
+        rows = list(queryset.order_by('-timestamp', '-pk')[:per_page + 1])
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = after is not None
+
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1]) if has_next and items else None,
+        prev_cursor=encode_cursor(items[0]) if has_prev and items else None,
+        total=total,
+        query=query,
+    )
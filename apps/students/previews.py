@@ -0,0 +1,133 @@
+# 证明材料的缩略图和预览图。
+#
+# 学生上传的多是手机拍摄的照片（数 MB）和 PDF，辅导员审核时只需要看清内容。上传后在本进程的
+# 线程池中为图片和 PDF 首页生成两种尺寸的预览图：审核列表用的缩略图和审核详情页用的预览图，
+# 保存在原文件旁边（uploads/ab/cd/<哈希>.pdf.w240.webp）。文件按内容寻址，相同内容只生成一次；
+# 原文件删除时预览图一并删除。
+#
+# 图片用 Pillow 处理（JPEG 按目标尺寸降采样解码，并按 EXIF 方向旋正）；PDF 首页由 poppler 的
+# pdftoppm 渲染。缺少 Pillow 或 pdftoppm 时不生成对应预览，页面退回为原文件链接。
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .storage import upload_storage
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # 未安装 Pillow 时不生成预览
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL = 240  # 审核列表缩略图宽度（像素）
+PREVIEW = 1280  # 审核详情预览图宽度
+SIZES = (PREVIEW, THUMBNAIL)  # 从大到小生成，小图由大图缩小
+MAX_HEIGHT_RATIO = 3  # 预览图高度最多为宽度的倍数（长截图等只保留上部）
+QUALITY = 80
+IMAGE_TYPES = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+PDF_TIMEOUT = 30  # 渲染 PDF 首页的超时（秒）
+MAX_PIXELS = 50_000_000  # 解码的像素数上限，超过不生成预览（防止解压炸弹耗尽内存）
+MAX_WORKERS = 2
+PDFTOPPM = shutil.which('pdftoppm')  # 启动时查找一次，未安装时 PDF 不生成预览
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='preview')
+
+
+def _format():
+    if Image is not None and features.check('webp'):
+        return 'WEBP', '.webp', 'image/webp'
+    return 'JPEG', '.jpg', 'image/jpeg'
+
+
+def previewable(name):
+    """name 对应的文件能否生成预览图"""
+    if not name or Image is None:
+        return False
+    ext = os.path.splitext(name)[1].lower()
+    return ext in IMAGE_TYPES or (ext == '.pdf' and PDFTOPPM is not None)
+
+
+def preview_name(name, width):
+    return f'{name}.w{width}{_format()[1]}'
+
+
+def preview_names(name):
+    """name 的全部预览图路径（删除原文件时一并删除）"""
+    return [f'{name}.w{width}{ext}' for width in SIZES for ext in ('.webp', '.jpg')]
+
+
+def content_type():
+    return _format()[2]
+
+
+def _open_source(name):
+    """打开原文件（PDF 为首页渲染图），返回 Pillow 图像"""
+    path = upload_storage.path(name)
+    if os.path.splitext(name)[1].lower() != '.pdf':
+        image = Image.open(path)
+        # JPEG 直接按接近目标的尺寸解码，大照片解码量减少到几十分之一
+        image.draft('RGB', (PREVIEW, PREVIEW * MAX_HEIGHT_RATIO))
+        # 此时只读了文件头、尚未解码：解码后过大的图片在分配内存之前拒绝
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError(f"图片尺寸过大：{image.width}x{image.height}")
+        return ImageOps.exif_transpose(image)
+
+    with tempfile.TemporaryDirectory() as directory:
+        prefix = os.path.join(directory, 'page')
+        subprocess.run(
+            [PDFTOPPM, '-f', '1', '-l', '1', '-singlefile', '-png', '-scale-to-x', str(PREVIEW),
+             '-scale-to-y', '-1', path, prefix],
+            check=True, timeout=PDF_TIMEOUT, capture_output=True
+        )
+        image = Image.open(prefix + '.png')
+        image.load()
+        return image
+
+
+def generate_previews(name):
+    """为 name 生成各尺寸预览图（已存在的跳过），返回是否生成成功"""
+    if not previewable(name):
+        return False
+    targets = [(width, upload_storage.path(preview_name(name, width))) for width in SIZES]
+    if all(os.path.exists(path) for _, path in targets):
+        return True
+    image_format = _format()[0]
+    try:
+        image = _open_source(name)
+        if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image_format == 'WEBP' and 'A' in image.getbands() else 'RGB')
+        for width, path in targets:
+            height = min(round(image.height * width / image.width), width * MAX_HEIGHT_RATIO)
+            if image.width > width:
+                image = image.crop((0, 0, image.width, round(height * image.width / width))).resize(
+                    (width, height), Image.LANCZOS
+                )
+            # 先写临时文件再改名，读取方不会看到写了一半的图片
+            fd, partial = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as output:
+                    image.save(output, image_format, quality=QUALITY)
+                os.replace(partial, path)
+            except BaseException:
+                os.remove(partial)
+                raise
+    except Exception:
+        logger.exception("生成预览图失败：%s", name)
+        return False
+    return True
+
+
+def schedule_previews(name):
+    """在后台线程池中为新上传的文件生成预览图"""
+    if previewable(name):
+        _executor.submit(generate_previews, name)
+
+
+def delete_previews(name):
+    for preview in preview_names(name):
+        upload_storage.delete(preview)
@@ -0,0 +1,77 @@
+# 宽表的字段投影。
+#
+# StudentProfile 约 25 列（含身份证号、电话、邮箱和三个权重），学生列表、管理员面板和
+# 导出只用到其中几列。Projection 只查询指定列（values_list），每行生成一个紧凑的行对象：
+# 基于 namedtuple、没有实例字典，也不经过模型实例化和 from_db，内存和 CPU 开销都小得多。
+# 有 choices 的字段在行对象上同样提供 get_<字段>_display()，模板不需要修改。
+
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F
+
+from .models import StudentProfile
+
+
+def _display(name, choices):
+    def get_display(self):
+        value = getattr(self, name)
+        return choices.get(value, value)
+    get_display.__name__ = f'get_{name}_display'
+    return get_display
+
+
+class Projection:
+    """模型的字段投影
+
+    fields 为模型字段或查询集注解名；related 为 别名=关联字段路径，例如 username='user__username'。
+    """
+
+    def __init__(self, model, fields, **related):
+        self.model = model
+        self.related = {alias: F(path) for alias, path in related.items()}
+        self.columns = tuple(fields) + tuple(related)
+
+        # 行类：namedtuple 子类，__slots__ 为空，按字段 choices 添加显示方法
+        namespace = {'__slots__': ()}
+        for name in fields:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:  # 注解列
+                continue
+            if field.choices:
+                namespace[f'get_{name}_display'] = _display(name, dict(field.flatchoices))
+        self.row = type(f'{model.__name__}Row', (namedtuple(f'{model.__name__}Columns', self.columns),), namespace)
+
+    def __call__(self, queryset, chunk_size=None):
+        """按投影读取 queryset，返回行对象的迭代器；指定 chunk_size 时分块流式读取"""
+        rows = queryset.annotate(**self.related).values_list(*self.columns) if self.related \
+            else queryset.values_list(*self.columns)
+        if chunk_size:
+            rows = rows.iterator(chunk_size=chunk_size)
+        return map(self.row._make, rows)
+
+
+# 辅导员学生列表（需 ranked_in 的名次注解）
+STUDENT_LIST = Projection(StudentProfile, (
+    'id', 'student_id', 'full_name', 'college',
+    'academic_comprehensive_score', 'academic_expertise_score', 'comprehensive_performance_score', 'total_score',
+    'cohort_rank', 'cohort_percentile',
+))
+
+# 辅导员学业综合成绩录入表格
+STUDENT_SCORE_GRID = Projection(StudentProfile, (
+    'id', 'student_id', 'full_name', 'academic_comprehensive_score',
+))
+
+# 管理员面板学生列表
+STUDENT_ADMIN = Projection(StudentProfile, (
+    'user_id', 'student_id', 'full_name', 'college', 'grade',
+), username='user__username')
+
+# 学生信息导出（需名次注解）
+STUDENT_EXPORT = Projection(StudentProfile, (
+    'student_id', 'full_name', 'college', 'grade', 'major', 'enrollment_year',
+    'academic_comprehensive_score', 'academic_expertise_score', 'comprehensive_performance_score', 'total_score',
+    'cohort_rank', 'cohort_percentile',
+))
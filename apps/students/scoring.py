@@ -0,0 +1,85 @@
+# 总成绩计算规则。
+#
+# 总成绩 = 学业综合成绩 × 权重 + 学术专长成绩 × 权重 + 综合表现成绩 × 权重，保留一位小数（银行家舍入）。
+# 成绩字段精度为 0.1、权重字段精度为 0.01，因此全部换算为整数定点数计算：
+# 成绩 ×10、权重 ×100，乘积之和以 0.001 为单位，再舍入到 0.1。
+# StudentProfile.save() 与批量重算共用这里的规则，保证两条路径得到完全相同的结果。
+
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，未安装时退回纯Python实现
+    np = None
+
+SCORE_QUANTUM = Decimal('0.1')
+RATIO_QUANTUM = Decimal('0.01')
+
+
+def score_to_tenths(value):
+    """成绩（Decimal/数字）按字段精度换算为以 0.1 为单位的整数"""
+    return int(Decimal(str(value)).quantize(SCORE_QUANTUM) * 10)
+
+
+def ratio_to_hundredths(value):
+    """权重按字段精度换算为以 0.01 为单位的整数"""
+    return int(Decimal(str(value)).quantize(RATIO_QUANTUM) * 100)
+
+
+def tenths_to_score(value):
+    """以 0.1 为单位的整数还原为一位小数的 Decimal"""
+    return Decimal(int(value)).scaleb(-1)
+
+
+def _round_thousandths(raw):
+    """0.001 单位的整数舍入到 0.1 单位（银行家舍入），与 Decimal.quantize 默认规则一致"""
+    quotient, remainder = divmod(raw, 100)
+    if remainder > 50 or (remainder == 50 and quotient % 2 == 1):
+        quotient += 1
+    return quotient
+
+
+def compute_total_tenths(comprehensive, expertise, performance,
+                         comprehensive_ratio, expertise_ratio, performance_ratio):
+    """单个学生的总成绩（0.1 单位的整数），各参数均为定点整数"""
+    raw = (comprehensive * comprehensive_ratio +
+           expertise * expertise_ratio +
+           performance * performance_ratio)
+    return _round_thousandths(raw)
+
+
+def compute_total_score(comprehensive, expertise, performance,
+                        comprehensive_ratio, expertise_ratio, performance_ratio):
+    """计算单个学生的总成绩，学业综合成绩或任一权重缺失时返回 None"""
+    if comprehensive is None or None in (comprehensive_ratio, expertise_ratio, performance_ratio):
+        return None
+    tenths = compute_total_tenths(
+        score_to_tenths(comprehensive),
+        score_to_tenths(expertise or 0),
+        score_to_tenths(performance or 0),
+        ratio_to_hundredths(comprehensive_ratio),
+        ratio_to_hundredths(expertise_ratio),
+        ratio_to_hundredths(performance_ratio),
+    )
+    return tenths_to_score(tenths)
+
+
+def compute_total_tenths_batch(comprehensive, expertise, performance,
+                               comprehensive_ratio, expertise_ratio, performance_ratio):
+    """批量计算总成绩（0.1 单位的整数列表），参数为等长的定点整数序列
+
+    安装了 numpy 时整列向量化计算，否则逐行计算，两者结果完全一致。
+    """
+    if np is None:
+        return [
+            compute_total_tenths(*row)
+            for row in zip(comprehensive, expertise, performance,
+                           comprehensive_ratio, expertise_ratio, performance_ratio)
+        ]
+
+    raw = (np.asarray(comprehensive, dtype=np.int64) * np.asarray(comprehensive_ratio, dtype=np.int64) +
+           np.asarray(expertise, dtype=np.int64) * np.asarray(expertise_ratio, dtype=np.int64) +
+           np.asarray(performance, dtype=np.int64) * np.asarray(performance_ratio, dtype=np.int64))
+    quotient, remainder = np.divmod(raw, 100)
+    round_up = (remainder > 50) | ((remainder == 50) & (quotient % 2 == 1))
+    return (quotient + round_up).tolist()
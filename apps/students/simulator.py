@@ -0,0 +1,83 @@
+# 加分模拟：估算一项加分通过后学生的总成绩和排名。
+#
+# 每个学院年级的总成绩（0.1 单位的整数）升序存放在缓存中，模拟时只做二分查找，
+# 不访问数据库；学院年级内任何学生成绩变化都会使缓存失效（见 cohorts 模块）。
+
+from array import array
+from bisect import bisect_right
+
+from django.core.cache import cache
+
+from .cohorts import get_cohort_cached
+from .models import StudentProfile, SubmissionCategory
+from .scoring import compute_total_score, score_to_tenths
+
+CATEGORY_FIELDS_KEY = 'submission_category_fields'
+
+
+def cohort_score_array(college, grade):
+    """学院年级内所有有总成绩学生的成绩数组（0.1 单位，升序）"""
+    def load():
+        scores = StudentProfile.objects.filter(
+            college=college,
+            grade=grade,
+            total_score__isnull=False
+        ).order_by('total_score').values_list('total_score', flat=True)
+        return array('l', (score_to_tenths(score) for score in scores))
+
+    return get_cohort_cached('scores', college, grade, load)
+
+
+def category_score_fields():
+    """加分项细分分类 id -> (累加的成绩字段, 最大分值)，分类极少变动，缓存五分钟"""
+    def load():
+        return {
+            category.id: (category.score_field, category.max_score)
+            for category in SubmissionCategory.objects.all()
+        }
+
+    return cache.get_or_set(CATEGORY_FIELDS_KEY, load, timeout=5 * 60)
+
+
+def rank_in(scores, total, own=None):
+    """在升序成绩数组中计算 total 的名次；own 为学生本人已在数组中的成绩，计算时排除"""
+    higher = len(scores) - bisect_right(scores, total)
+    if own is not None and own > total:
+        higher -= 1
+    return higher + 1
+
+
+def simulate(profile, score_field, score):
+    """模拟在 score_field 上增加 score 分后的总成绩与排名
+
+    返回 dict：projected_total、projected_rank、current_rank、cohort_size；
+    学业综合成绩未设置时无法计算总成绩，projected_total 为 None。
+    """
+    scores = cohort_score_array(profile.college, profile.grade)
+    own = score_to_tenths(profile.total_score) if profile.total_score is not None else None
+    cohort_size = len(scores) if own is not None else len(scores) + 1
+
+    components = {
+        'academic_expertise_score': profile.academic_expertise_score,
+        'comprehensive_performance_score': profile.comprehensive_performance_score,
+    }
+    components[score_field] += score
+    projected = compute_total_score(
+        profile.academic_comprehensive_score,
+        components['academic_expertise_score'],
+        components['comprehensive_performance_score'],
+        profile.academic_comprehensive_ratio,
+        profile.academic_expertise_ratio,
+        profile.comprehensive_performance_ratio,
+    )
+
+    result = {
+        'current_total': profile.total_score,
+        'current_rank': rank_in(scores, own, own) if own is not None else None,
+        'projected_total': projected,
+        'projected_rank': None,
+        'cohort_size': cohort_size,
+    }
+    if projected is not None:
+        result['projected_rank'] = rank_in(scores, score_to_tenths(projected), own)
+    return result
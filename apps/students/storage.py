@@ -0,0 +1,90 @@
+# 按内容寻址的上传文件存储。
+#
+# 学生重复提交同一份扫描件时，默认存储每次都另存一份（文件名加随机后缀），全部堆在
+# media/uploads/ 一个目录下。这里写入时边写边计算 SHA-256，文件按内容哈希命名并按哈希前缀
+# 分两级目录存放：uploads/ab/cd/abcd….jpg。内容相同的文件只保存一份，后来者直接引用已有文件；
+# 单个目录的文件数也不再随提交数增长。
+#
+# 同一文件可能被多条提交记录引用，何时可以删除由 UploadBlob 的引用计数决定（见 models.py），
+# 存储本身不删除仍被引用的文件。写入分两步：stage 写临时文件并算出哈希，adopt 移入正式路径；
+# 提交记录在两步之间先登记引用（锁定 UploadBlob 行），与删除不再引用的文件互斥。
+
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+SHARD_DEPTH = 2  # 目录层数
+SHARD_WIDTH = 2  # 每层取哈希的字符数
+TEMP_DIR = '.incoming'  # 写入中的临时文件，与正式文件在同一文件系统，写完后原子改名
+UPLOAD_DIR = 'uploads'  # 提交记录附件所在目录
+
+
+def blob_name(directory, digest, ext):
+    """内容哈希对应的存储路径，例如 uploads/ab/cd/abcd….jpg"""
+    shards = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_DEPTH)]
+    return posixpath.join(directory, *shards, digest + ext)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """文件按内容 SHA-256 命名的本地存储
+
+    保存时 name 只用来确定目录（upload_to）和扩展名；返回的实际路径由内容决定，相同内容
+    （且扩展名相同）的文件返回同一路径，不重复写入。
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # 实际路径在 _save 中按内容确定，不需要为避免重名探测文件是否存在
+        return name
+
+    def _save(self, name, content):
+        temp_path, digest = self.stage(content)
+        try:
+            return self.adopt(temp_path, posixpath.dirname(name), digest, os.path.splitext(name)[1].lower())
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def stage(self, content):
+        """把 content 写入临时文件，边写边计算 SHA-256，返回 (临时文件路径, 哈希)"""
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.temp_path('')))
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, digest.hexdigest()
+
+    def adopt(self, path, directory, digest, ext):
+        """把已算出哈希的本地文件 path（须位于存储所在文件系统）移入存储，返回存储路径"""
+        name = blob_name(directory, digest, ext)
+        target = self.path(name)
+        if os.path.exists(target):
+            # 已有相同内容的文件，丢弃本次写入
+            os.remove(path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+            os.replace(path, target)
+        return name
+
+    def temp_path(self, filename):
+        """写入中的临时文件路径"""
+        temp_dir = os.path.join(self.location, TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+        return os.path.join(temp_dir, filename)
+
+
+upload_storage = ContentAddressedStorage()
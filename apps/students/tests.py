@@ -1,3 +1,1377 @@
-from django.test import TestCase
+import io
+import os
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.template.loader import get_template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from counselors.models import CounselorProfile
+from . import chunked, previews, scoring, xlsx, zipstream
+from .distribution import cohort_distribution, compute_distribution
+from .media import _parse_range
+from .models import (
+    Notification, RankSnapshot, Rule, ScoreLedgerEntry, StudentProfile, StudentRank, Submission, SubmissionCategory,
+    UploadBlob, UploadSession, _pack
+)
+from .projections import STUDENT_ADMIN, STUDENT_EXPORT, STUDENT_LIST, STUDENT_SCORE_GRID
+from .simulator import cohort_score_array, simulate
+from .storage import upload_storage
+
+# 需要检查执行计划的大表
+HOT_TABLES = ('students_submission', 'students_notification', 'students_studentprofile', 'students_studentrank')
+# 不带索引的全表扫描，例如 "SCAN students_submission"
+FULL_SCAN = re.compile(r'^SCAN \w+$')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN 仅适用于 SQLite')
+class QueryPlanTests(TestCase):
+    """主要页面查询的执行计划回归测试：不允许出现全表扫描或临时 B 树排序"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = list(SubmissionCategory.objects.all())
+        now = timezone.now()
+
+        # 四个学院年级，每个 30 名学生；被测学院年级的待审核申请超过一页
+        users = User.objects.bulk_create([User(username=f'plan{i}') for i in range(120)])
+        students = StudentProfile.objects.bulk_create([
+            StudentProfile(
+                user=user,
+                student_id=f'2099{i:04d}',
+                college=['info', 'other'][i % 2],
+                grade=['2023', '2024'][i // 2 % 2],
+                academic_comprehensive_score=Decimal(60 + i % 40),
+                total_score=Decimal(50 + i % 40),
+            )
+            for i, user in enumerate(users)
+        ])
+        for college in ('info', 'other'):
+            for grade in ('2023', '2024'):
+                StudentRank.objects.refresh_cohort(college, grade)
+
+        counselor_user = User.objects.create_user('plan_counselor', password='x')
+        cls.counselor = CounselorProfile.objects.create(
+            user=counselor_user, full_name='辅导员', employee_id='PLAN01', college='info', grade='2023'
+        )
+        cls.student = students[0]  # info 2023
+
+        submissions = []
+        for i in range(600):
+            student = cls.student if i < 80 else students[i % len(students)]
+            state = i % 3  # 0 待审核，1 已通过，2 已驳回
+            submissions.append(Submission(
+                student=student,
+                college=student.college,
+                grade=student.grade,
+                category=categories[i % len(categories)],
+                self_rating=Decimal(i % 10),
+                approved=state == 1,
+                rejected=state == 2,
+                approved_score=Decimal(i % 10) if state == 1 else None,
+                reviewer=cls.counselor if state else None,
+            ))
+        Submission.objects.bulk_create(submissions)
+        # bulk_create 不会使用 auto_now_add 以外的时间，这里把提交时间错开，并制造相同时间的记录
+        for offset, submission in enumerate(Submission.objects.order_by('id')):
+            Submission.objects.filter(pk=submission.pk).update(timestamp=now - timedelta(minutes=offset // 2))
+
+        Notification.objects.bulk_create([
+            Notification(recipient=student.user, title='通知', content='内容', type='system', is_read=i % 2 == 0)
+            for i, student in enumerate(students * 5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.counselor_client = self.client_class()
+        self.counselor_client.force_login(self.counselor.user)
+        self.student_client = self.client_class()
+        self.student_client.force_login(self.student.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[3] for row in cursor.fetchall()]
+
+    def assertQueriesUseIndexes(self, client, url, method='get', data=None):
+        """请求页面，检查其中每条涉及大表的查询的执行计划"""
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, data)
+        self.assertLess(response.status_code, 400)
+
+        checked = 0
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            if not any(f'"{table}"' in sql for table in HOT_TABLES):
+                continue
+            checked += 1
+            for detail in self.explain(sql):
+                with self.subTest(url=url, sql=sql[:120], plan=detail):
+                    self.assertNotRegex(detail, FULL_SCAN)
+                    self.assertNotIn('TEMP B-TREE', detail)
+        self.assertGreater(checked, 0, f'{url} 没有执行任何需要检查的查询')
+        return response
+
+    def test_review_queue(self):
+        response = self.assertQueriesUseIndexes(self.counselor_client, reverse('review_submissions'))
+        page = response.context['page']
+        self.assertIsNotNone(page.next_cursor)
+        self.assertQueriesUseIndexes(self.counselor_client, reverse('review_submissions'), data={'after': page.next_cursor})
+        self.assertQueriesUseIndexes(self.counselor_client, reverse('review_submissions'), data={'before': page.next_cursor})
+
+    def test_claim_queue(self):
+        self.assertQueriesUseIndexes(self.counselor_client, reverse('claim_submissions'), 'post', {'count': 10})
+        self.assertQueriesUseIndexes(self.counselor_client, reverse('review_submissions'), data={'mine': '1'})
+
+    def test_page_links_keep_filters(self):
+        # 本人领取的申请超过一页，翻页链接保留 mine=1
+        self.counselor_client.post(reverse('claim_submissions'), {'count': 50})
+        self.counselor_client.post(reverse('claim_submissions'), {'count': 50})
+        response = self.counselor_client.get(reverse('review_submissions'), {'mine': '1'})
+        page = response.context['page']
+        self.assertEqual(page.next_url, f'?mine=1&after={page.next_cursor}')
+        self.assertContains(response, f'href="?mine=1&amp;after={page.next_cursor}"')
+
+        response = self.counselor_client.get(reverse('review_submissions'), {'mine': '1', 'after': page.next_cursor})
+        page = response.context['page']
+        self.assertTrue(all(submission.claimed_by_id == self.counselor.pk for submission in page.items))
+        self.assertEqual(page.prev_url, f'?mine=1&before={page.prev_cursor}')
+        self.assertEqual(page.first_url, '?mine=1')
+
+    def test_reviewed_submissions(self):
+        response = self.assertQueriesUseIndexes(self.counselor_client, reverse('reviewed_submissions'))
+        page = response.context['page']
+        self.assertQueriesUseIndexes(self.counselor_client, reverse('reviewed_submissions'), data={'after': page.next_cursor})
+
+    def test_counselor_dashboard(self):
+        self.assertQueriesUseIndexes(self.counselor_client, reverse('counselor_dashboard'))
+
+    def test_student_list(self):
+        self.assertQueriesUseIndexes(self.counselor_client, reverse('view_all_students'))
+
+    def test_student_submissions(self):
+        response = self.assertQueriesUseIndexes(self.student_client, reverse('submissions'))
+        page = response.context['page']
+        self.assertQueriesUseIndexes(self.student_client, reverse('submissions'), data={'after': page.next_cursor})
+
+    def test_notifications(self):
+        self.assertQueriesUseIndexes(self.student_client, reverse('index'))
+        self.assertQueriesUseIndexes(self.student_client, reverse('notifications'))
+
+
+class QueryCountTests(TestCase):
+    """列表页查询次数回归测试：数据量从 SMALL 增加到 LARGE 时每个页面的查询次数不变（无 N+1 查询）"""
+
+    SMALL = 3
+    LARGE = 60  # 超过一页（PER_PAGE），分页页面也能显示更多行
+
+    STUDENT_VIEWS = [
+        ('index', (), None),
+        ('submissions', (), None),
+        ('notifications', (), None),
+        ('ranking', (), None),
+        ('rank_history', (), None),
+        ('student_rule_detail', ('student-competition',), None),
+    ]
+    COUNSELOR_VIEWS = [
+        ('counselor_dashboard', (), None),
+        ('review_submissions', (), None),
+        ('review_submissions', (), {'mine': '1'}),
+        ('reviewed_submissions', (), None),
+        ('view_all_students', (), None),
+        ('counselor_rules', (), None),
+        ('rule_detail', ('student-competition',), None),
+    ]
+    ADMIN_VIEWS = [
+        ('admin_dashboard', (), None),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = list(SubmissionCategory.objects.all())
+        cls.student = StudentProfile.objects.create(
+            user=User.objects.create_user('count_student', password='x'),
+            student_id='20980000', college='info', grade='2023', academic_comprehensive_score=Decimal(80)
+        )
+        # 两名辅导员交替审核，提交记录的审核人各不相同
+        cls.counselors = [
+            CounselorProfile.objects.create(
+                user=User.objects.create_user(f'count_counselor{i}', password='x'),
+                full_name=f'辅导员{i}', employee_id=f'COUNT0{i}', college='info', grade='2023'
+            )
+            for i in range(2)
+        ]
+        cls.admin = User.objects.create_superuser('count_admin', password='x')
+
+    def setUp(self):
+        self.seeded = 0
+
+    def seed(self, count):
+        """向被测学院年级追加 count 名学生，以及被测学生的提交记录、通知、加分规则各若干条"""
+        start, self.seeded = self.seeded, self.seeded + count
+        users = User.objects.bulk_create([User(username=f'count{i}') for i in range(start, self.seeded)])
+        students = StudentProfile.objects.bulk_create([
+            StudentProfile(
+                user=user, student_id=f'2098{i + 1:04d}', full_name=f'学生{i}', college='info', grade='2023',
+                academic_comprehensive_score=Decimal(60 + i % 40)
+            )
+            for i, user in zip(range(start, self.seeded), users)
+        ])
+        StudentRank.objects.refresh_cohort('info', '2023')
+
+        now = timezone.now()
+        submissions = []
+        for i in range(count * 3):
+            student = self.student if i % 2 else students[i % count]
+            state = i % 3  # 0 待审核，1 已通过，2 已驳回
+            submissions.append(Submission(
+                student=student,
+                category=self.categories[i % len(self.categories)],
+                self_rating=Decimal(i % 10),
+                approved=state == 1,
+                rejected=state == 2,
+                approved_score=Decimal(i % 10) if state == 1 else None,
+                reviewer=self.counselors[i % 2] if state else None,
+                # 一部分待审核申请由第一名辅导员领取
+                claimed_by=self.counselors[0] if state == 0 and i % 2 else None,
+                claim_expires_at=now + timedelta(minutes=30) if state == 0 and i % 2 else None,
+            ))
+        for submission in submissions:
+            submission.college, submission.grade = submission.student.college, submission.student.grade
+        Submission.objects.bulk_create(submissions)
+
+        Notification.objects.bulk_create([
+            Notification(recipient=self.student.user, title='通知', content='内容', type='submission')
+            for _ in range(count)
+        ])
+        Rule.objects.bulk_create([
+            Rule(rule_type=rule_type, item_name=f'规则{i}', description='说明', score=Decimal(1))
+            for rule_type, _ in Rule.RULE_TYPE_CHOICES
+            for i in range(count)
+        ])
+        RankSnapshot.objects.take('info', '2023', force=True)
+
+    def measure(self):
+        """冷缓存下请求每个页面，返回 {页面: 查询次数}"""
+        counts = {}
+        for user, views in (
+            (self.student.user, self.STUDENT_VIEWS),
+            (self.counselors[0].user, self.COUNSELOR_VIEWS),
+            (self.admin, self.ADMIN_VIEWS),
+        ):
+            self.client.force_login(user)
+            for name, args, data in views:
+                cache.clear()
+                url = reverse(name, args=args)
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, data)
+                self.assertEqual(response.status_code, 200, url)
+                counts[url, str(data)] = len(queries.captured_queries)
+        return counts
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.seed(self.SMALL)
+        small = self.measure()
+        self.seed(self.LARGE - self.SMALL)
+        large = self.measure()
+
+        for view, count in small.items():
+            with self.subTest(view=view):
+                self.assertEqual(large[view], count)
+
+
+class MediaStorageTestCase(TestCase):
+    """上传文件写入临时目录的测试基类"""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+    @classmethod
+    def create_student(cls, username, student_id, college='info', grade='2023'):
+        return StudentProfile.objects.create(
+            user=User.objects.create_user(username, password='x'), student_id=student_id, college=college, grade=grade
+        )
+
+    @classmethod
+    def create_counselor(cls, username, employee_id, college='info', grade='2023'):
+        return CounselorProfile.objects.create(
+            user=User.objects.create_user(username, password='x'), full_name=username, employee_id=employee_id,
+            college=college, grade=grade
+        )
+
+
+class MediaTests(MediaStorageTestCase):
+    """上传文件下载：权限检查、条件请求、断点续传和内容类型"""
+
+    CONTENT = b'%PDF-1.4\n' + bytes(range(256)) * 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = SubmissionCategory.objects.first()
+        cls.student = cls.create_student('media_student', '20960001')
+        cls.classmate = cls.create_student('media_classmate', '20960002')
+        cls.counselor = cls.create_counselor('media_counselor', 'MEDIA01')
+        cls.other_counselor = cls.create_counselor('media_other', 'MEDIA02', college='other')
+        cls.admin = User.objects.create_superuser('media_admin', password='x')
+        cls.submission = Submission.objects.create(
+            student=cls.student, category=cls.category, file=SimpleUploadedFile('proof.pdf', cls.CONTENT)
+        )
+        cls.url = '/media/' + cls.submission.file.name
+
+    def get(self, user=None, url=None, **headers):
+        if user:
+            self.client.force_login(user)
+        response = self.client.get(url or self.url, headers=headers)
+        if response.streaming:
+            response.content_bytes = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_permissions(self):
+        self.assertEqual(self.get().status_code, 302)  # 未登录跳转到登录页
+        for user, status in (
+            (self.student.user, 200),
+            (self.counselor.user, 200),
+            (self.admin, 200),
+            (self.classmate.user, 404),
+            (self.other_counselor.user, 404),
+        ):
+            with self.subTest(user=user.username):
+                self.client.logout()
+                self.assertEqual(self.get(user).status_code, status)
+
+        self.assertEqual(self.get(self.admin, '/media/uploads/missing.pdf').status_code, 404)
+        self.assertEqual(self.get(self.admin, '/media/../db.sqlite3').status_code, 404)
+
+    def test_full_and_not_modified(self):
+        response = self.get(self.student.user)
+        self.assertEqual(response.content_bytes, self.CONTENT)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response['Content-Disposition'].startswith('inline'))
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+        response = self.get(If_None_Match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.get(If_None_Match='"other"').status_code, 200)
+
+    def test_range(self):
+        self.client.force_login(self.student.user)
+        size = len(self.CONTENT)
+        etag = self.get()['ETag']
+
+        response = self.get(Range='bytes=0-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content_bytes, b'%PDF')
+        self.assertEqual(response['Content-Range'], f'bytes 0-3/{size}')
+
+        response = self.get(Range='bytes=-4')
+        self.assertEqual(response.content_bytes, self.CONTENT[-4:])
+
+        response = self.get(Range=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+        # 多区间不支持，返回完整文件
+        self.assertEqual(self.get(Range='bytes=0-1,4-5').status_code, 200)
+
+        # If-Range 与当前 ETag 一致时按区间返回，否则返回完整文件
+        self.assertEqual(self.get(Range='bytes=0-3', If_Range=etag).status_code, 206)
+        response = self.get(Range='bytes=0-3', If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_bytes, self.CONTENT)
+
+    def test_parse_range(self):
+        for header, expected in (
+            ('bytes=0-9', (0, 9)),
+            ('bytes=5-', (5, 99)),
+            ('bytes=90-200', (90, 99)),
+            ('bytes=-10', (90, 99)),
+            ('bytes=-200', (0, 99)),
+            ('bytes=100-', None),
+            ('bytes=9-5', None),
+            ('bytes=-0', None),
+            ('bytes=-', False),
+            ('bytes=0-1,5-6', False),
+            ('items=0-9', False),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(_parse_range(header, 100), expected)
+
+    def test_unsafe_types_download_as_attachment(self):
+        submission = Submission.objects.create(
+            student=self.student, category=self.category,
+            file=SimpleUploadedFile('page.html', b'<script>alert(1)</script>')
+        )
+        response = self.get(self.counselor.user, '/media/' + submission.file.name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+
+def zip_bytes(*names):
+    """内含 names 各文件的 ZIP 文件内容"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name in names:
+            archive.writestr(name, 'x')
+    return buffer.getvalue()
+
+
+class ChunkedUploadTests(MediaStorageTestCase):
+    """分块续传上传：位置校验、大小和格式限制，以及普通上传按文件头确定扩展名"""
+
+    PDF = b'%PDF-1.4\n' + bytes(range(256)) * 40
+    DOCX = zip_bytes('[Content_Types].xml', 'word/document.xml')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = SubmissionCategory.objects.first()
+        cls.student = cls.create_student('chunk_student', '20950001')
+
+    def setUp(self):
+        self.client.force_login(self.student.user)
+
+    def create(self, size, filename='proof.pdf'):
+        response = self.client.post(reverse('upload_session_create'), {'filename': filename, 'size': size})
+        return response.status_code, response.json()
+
+    def send(self, upload_id, offset, data):
+        url = reverse('upload_session', args=[upload_id]) + f'?offset={offset}'
+        response = self.client.post(url, data, content_type='application/octet-stream')
+        return response.status_code, response.json()
+
+    def upload_chunks(self, content, filename='proof.pdf', step=1000):
+        status, session = self.create(len(content), filename)
+        self.assertEqual(status, 200)
+        for offset in range(0, len(content), step):
+            status, state = self.send(session['id'], offset, content[offset:offset + step])
+            if status != 200:
+                return status, state
+        return status, state
+
+    def submit(self, **data):
+        return self.client.post(reverse('upload'), {'category': self.category.pk, 'remarks': '', 'self_rating': 1, **data})
+
+    def test_resume_and_attach(self):
+        status, session = self.create(len(self.PDF))
+        upload_id = session['id']
+        self.assertEqual(self.send(upload_id, 0, self.PDF[:4000]), (200, {**session, 'offset': 4000}))
+
+        # 重发已收到的块、跳过数据都返回 409 和服务器已收到的位置
+        status, state = self.send(upload_id, 0, self.PDF[:4000])
+        self.assertEqual((status, state['offset']), (409, 4000))
+        status, state = self.send(upload_id, 6000, self.PDF[6000:])
+        self.assertEqual((status, state['offset']), (409, 4000))
+
+        # 另一进程接收续传（内存中没有哈希状态）
+        chunked._hashers.clear()
+        status, state = self.send(upload_id, 4000, self.PDF[4000:])
+        self.assertEqual(status, 200)
+        self.assertTrue(state['complete'])
+
+        self.assertEqual(self.submit(upload_id=upload_id).status_code, 302)
+        submission = Submission.objects.get(student=self.student)
+        self.assertTrue(submission.file.name.endswith('.pdf'))
+        with submission.file.open('rb') as f:
+            self.assertEqual(f.read(), self.PDF)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_size_limits(self):
+        status, _ = self.create(chunked.MAX_UPLOAD_SIZE + 1)
+        self.assertEqual(status, 413)
+
+        status, session = self.create(100)
+        status, state = self.send(session['id'], 0, self.PDF[:101])
+        self.assertEqual((status, state['offset']), (413, 0))
+
+        status, session = self.create(chunked.MAX_UPLOAD_SIZE)
+        status, state = self.send(session['id'], 0, b'%PDF-' + bytes(chunked.MAX_CHUNK_SIZE))
+        self.assertEqual((status, state['offset']), (413, 0))
+        # 被拒绝的块不计入，可以从原位置重新发送
+        self.assertEqual(self.send(session['id'], 0, self.PDF)[0], 200)
+
+    def test_unsupported_type(self):
+        status, session = self.create(100, 'page.pdf')
+        status, _ = self.send(session['id'], 0, b'<html><script></script>')
+        self.assertEqual(status, 415)
+        self.assertFalse(UploadSession.objects.filter(pk=session['id']).exists())
+
+    def test_zip_must_be_word_document(self):
+        status, _ = self.upload_chunks(zip_bytes('a.txt'), 'report.docx', step=50)
+        self.assertEqual(status, 415)
+        self.assertFalse(UploadSession.objects.exists())
+
+        status, state = self.upload_chunks(self.DOCX, 'report.docx', step=50)
+        self.assertEqual(status, 200)
+        self.assertEqual(UploadSession.objects.get(pk=state['id']).file_type, '.docx')
+
+    def test_plain_upload_uses_detected_extension(self):
+        response = self.submit(file=SimpleUploadedFile('scan.html', self.PDF))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Submission.objects.get(student=self.student).file.name.endswith('.pdf'))
+
+        for name, content in (('evil.pdf', b'<html><script></script>'), ('report.docx', zip_bytes('a.txt'))):
+            with self.subTest(name=name):
+                response = self.submit(file=SimpleUploadedFile(name, content))
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('file', response.context['form'].errors)
+
+        self.assertEqual(self.submit(file=SimpleUploadedFile('report.docx', self.DOCX)).status_code, 302)
+        self.assertEqual(Submission.objects.filter(student=self.student).count(), 2)
+
+
+class UploadBlobTests(MediaStorageTestCase):
+    """按内容寻址存储的引用计数：相同内容只存一份，最后一处引用释放后删除文件"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = SubmissionCategory.objects.first()
+        cls.student = cls.create_student('blob_student', '20940001')
+        cls.classmate = cls.create_student('blob_classmate', '20940002')
+
+    def upload(self, content, student=None, name='proof.pdf'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Submission.objects.create(
+                student=student or self.student, category=self.category, file=SimpleUploadedFile(name, content)
+            )
+
+    def refcount(self, name):
+        blob = UploadBlob.objects.filter(name=name).first()
+        return blob.refcount if blob else 0
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.upload(b'%PDF-same')
+        second = self.upload(b'%PDF-same', self.classmate, 'copy.pdf')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(self.refcount(first.file.name), 2)
+        self.assertEqual(UploadBlob.objects.get(name=first.file.name).size, len(b'%PDF-same'))
+        self.assertNotEqual(self.upload(b'%PDF-other').file.name, first.file.name)
+
+        # 直接指定已在存储中的文件同样计入引用
+        Submission.objects.create(student=self.student, category=self.category, file=first.file.name)
+        self.assertEqual(self.refcount(first.file.name), 3)
+
+    def test_release_on_replace_and_delete(self):
+        first = self.upload(b'%PDF-shared')
+        second = self.upload(b'%PDF-shared')
+        name = first.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.file = SimpleUploadedFile('new.pdf', b'%PDF-new')
+            first.save()
+        self.assertEqual(self.refcount(name), 1)
+        self.assertEqual(self.refcount(first.file.name), 1)
+
+        # 重新读出后只改其他字段，不影响引用计数
+        with self.captureOnCommitCallbacks(execute=True):
+            reloaded = Submission.objects.get(pk=second.pk)
+            reloaded.remarks = '补充说明'
+            reloaded.save()
+        self.assertEqual(self.refcount(name), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.refcount(name), 0)
+        self.assertFalse(upload_storage.exists(name))
+        self.assertTrue(upload_storage.exists(first.file.name))
+
+    def test_student_delete_releases_files(self):
+        student = self.create_student('blob_leaving', '20940003')
+        kept = self.upload(b'%PDF-kept')
+        shared = self.upload(b'%PDF-kept', student).file.name
+        own = self.upload(b'%PDF-own', student).file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            student.delete()
+        self.assertEqual(self.refcount(shared), 1)
+        self.assertTrue(upload_storage.exists(kept.file.name))
+        self.assertFalse(upload_storage.exists(own))
+        self.assertFalse(UploadBlob.objects.filter(name=own).exists())
+
+    def test_admin_batch_delete_releases_files(self):
+        student = self.create_student('blob_batch', '20940004')
+        own = self.upload(b'%PDF-batch', student).file.name
+        self.client.force_login(User.objects.create_superuser('blob_admin', password='x'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('batch_delete_users'), {'user_type': 'student', 'user_ids': str(student.user_id)})
+        self.assertFalse(StudentProfile.objects.filter(pk=student.pk).exists())
+        self.assertFalse(upload_storage.exists(own))
+
+    def test_reupload_while_file_is_being_released(self):
+        # 释放后又上传了相同内容，删除文件恰好发生在新上传确认文件已存在之后：重新被引用的文件不删除
+        submission = self.upload(b'%PDF-again')
+        name = submission.file.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            submission.delete()
+        self.assertEqual(self.refcount(name), 0)
+
+        adopt = upload_storage.adopt
+
+        def adopt_then_delete(*args):
+            result = adopt(*args)
+            for callback in callbacks:
+                callback()
+            return result
+
+        with mock.patch.object(upload_storage, 'adopt', side_effect=adopt_then_delete):
+            self.upload(b'%PDF-again')
+        self.assertEqual(self.refcount(name), 1)
+        self.assertTrue(upload_storage.exists(name))
+
+    def test_reupload_after_file_deleted(self):
+        submission = self.upload(b'%PDF-gone')
+        name = submission.file.name
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.delete()
+        self.assertFalse(upload_storage.exists(name))
+
+        self.assertEqual(self.upload(b'%PDF-gone').file.name, name)
+        self.assertTrue(upload_storage.exists(name))
+        self.assertEqual(self.refcount(name), 1)
+
+    def test_dedupe_uploads_prune(self):
+        kept = self.upload(b'%PDF-kept')
+        # 迁移前的旧文件：原文件名保存，内容与 kept 相同
+        legacy = Submission.objects.create(student=self.classmate, category=self.category)
+        Submission.objects.filter(pk=legacy.pk).update(file='uploads/legacy_scan.pdf')
+        for name, content in (('uploads/legacy_scan.pdf', b'%PDF-kept'), ('uploads/orphan.pdf', b'%PDF-orphan')):
+            with open(upload_storage.path(name), 'wb') as f:
+                f.write(content)
+
+        call_command('dedupe_uploads', '--prune', stdout=io.StringIO(), stderr=io.StringIO())
+
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.file.name, kept.file.name)
+        self.assertEqual(self.refcount(kept.file.name), 2)
+        self.assertTrue(upload_storage.exists(kept.file.name))
+        self.assertFalse(upload_storage.exists('uploads/legacy_scan.pdf'))
+        self.assertFalse(upload_storage.exists('uploads/orphan.pdf'))
+
+
+@unittest.skipIf(previews.Image is None, '未安装 Pillow')
+class PreviewTests(MediaStorageTestCase):
+    """缩略图和预览图的生成"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = SubmissionCategory.objects.first()
+        cls.student = cls.create_student('preview_student', '20930001')
+        cls.counselor = cls.create_counselor('preview_counselor', 'PV01')
+        cls.other_counselor = cls.create_counselor('preview_other', 'PV02', grade='2024')
+
+    def upload_image(self, size):
+        buffer = io.BytesIO()
+        previews.Image.new('RGB', size, 'white').save(buffer, 'PNG')
+        submission = Submission.objects.create(
+            student=self.student, category=self.category, file=SimpleUploadedFile('photo.png', buffer.getvalue())
+        )
+        return submission.file.name
+
+    def stored_files(self, name):
+        return sorted(os.listdir(os.path.dirname(upload_storage.path(name))))
+
+    def test_generate(self):
+        name = self.upload_image((2000, 1000))
+        self.assertTrue(previews.generate_previews(name))
+        for width in previews.SIZES:
+            with previews.Image.open(upload_storage.path(previews.preview_name(name, width))) as image:
+                self.assertEqual(image.size, (width, width // 2))
+
+    def test_oversized_image_is_skipped(self):
+        name = self.upload_image((400, 300))
+        with mock.patch.object(previews, 'MAX_PIXELS', 400 * 300 - 1), self.assertLogs(previews.logger):
+            self.assertFalse(previews.generate_previews(name))
+        self.assertEqual(self.stored_files(name), [os.path.basename(name)])
+
+    def test_preview_view(self):
+        self.upload_image((400, 300))
+        submission = Submission.objects.get(student=self.student)
+        url = reverse('submission_preview', args=[submission.pk, 'thumb'])
+
+        self.client.force_login(self.counselor.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertEqual(self.client.get(reverse('submission_preview', args=[submission.pk, 'huge'])).status_code, 404)
+
+        # 其他年级的辅导员看不到，非辅导员转到登录页
+        self.client.force_login(self.other_counselor.user)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.student.user)
+        self.assertRedirects(self.client.get(url), reverse('login'), fetch_redirect_response=False)
+
+    def test_failed_save_leaves_no_partial_file(self):
+        name = self.upload_image((400, 300))
+        with mock.patch.object(previews.Image.Image, 'save', side_effect=OSError('磁盘已满')), \
+                self.assertLogs(previews.logger):
+            self.assertFalse(previews.generate_previews(name))
+        self.assertEqual(self.stored_files(name), [os.path.basename(name)])
+
+
+class ScoringTests(TestCase):
+    """批量重算总成绩与 save() 完全一致：numpy 与纯 Python 两条路径，随机输入和 .x5 舍入边界"""
+
+    @staticmethod
+    def rows():
+        """(学业综合, 学术专长, 综合表现, 三项权重) 的定点整数：成绩以 0.1、权重以 0.01 为单位"""
+        rng = random.Random(20240901)
+        rows = [
+            (rng.randint(0, 10000), rng.randint(-200, 3000), rng.randint(-200, 3000),
+             rng.randint(0, 100), rng.randint(0, 100), rng.randint(0, 100))
+            for _ in range(500)
+        ]
+        # 乘积之和恰为 0.x5 的各种情况（银行家舍入：舍入到偶数），以及全零、最大值、负数
+        for tenths in range(-9, 10):
+            rows.append((0, tenths, 0, 0, 50, 0))
+            rows.append((abs(tenths), 0, tenths, 50, 0, 50))
+        rows += [(0, 0, 0, 0, 0, 0), (10000, 3000, 3000, 100, 100, 100), (1, 1, 1, 25, 25, 25), (3, 0, 0, 50, 0, 0)]
+        return rows
+
+    @staticmethod
+    def reference(row):
+        """直接用 Decimal 计算并按字段精度舍入"""
+        scores = [Decimal(value).scaleb(-1) for value in row[:3]]
+        ratios = [Decimal(value).scaleb(-2) for value in row[3:]]
+        return sum(score * ratio for score, ratio in zip(scores, ratios)).quantize(Decimal('0.1'))
+
+    def batch(self, rows):
+        return [scoring.tenths_to_score(tenths) for tenths in scoring.compute_total_tenths_batch(*zip(*rows))]
+
+    def test_batch_matches_decimal(self):
+        rows = self.rows()
+        expected = [self.reference(row) for row in rows]
+        if scoring.np is not None:
+            self.assertEqual(self.batch(rows), expected)
+        with mock.patch.object(scoring, 'np', None):
+            self.assertEqual(self.batch(rows), expected)
+
+    def test_recompute_matches_save(self):
+        rows = self.rows()[::5]
+        users = User.objects.bulk_create([User(username=f'scoring{i}') for i in range(len(rows))])
+        StudentProfile.objects.bulk_create([
+            StudentProfile(
+                user=user, student_id=f'2091{i:04d}', college='info', grade='2023', total_score=0,
+                academic_comprehensive_score=Decimal(row[0]).scaleb(-1),
+                academic_expertise_score=Decimal(row[1]).scaleb(-1),
+                comprehensive_performance_score=Decimal(row[2]).scaleb(-1),
+                academic_comprehensive_ratio=Decimal(row[3]).scaleb(-2),
+                academic_expertise_ratio=Decimal(row[4]).scaleb(-2),
+                comprehensive_performance_ratio=Decimal(row[5]).scaleb(-2),
+            )
+            for i, (user, row) in enumerate(zip(users, rows))
+        ])
+
+        paths = [False] + ([True] if scoring.np is not None else [])
+        for use_numpy in paths:
+            with self.subTest(numpy=use_numpy), mock.patch.object(scoring, 'np', scoring.np if use_numpy else None):
+                StudentProfile.objects.update(total_score=0)
+                StudentProfile.objects.filter(student_id__startswith='2091').recompute_total_scores(chunk_size=17)
+                batch = dict(StudentProfile.objects.values_list('pk', 'total_score'))
+                for profile in StudentProfile.objects.filter(student_id__startswith='2091'):
+                    profile.save()
+                saved = dict(StudentProfile.objects.values_list('pk', 'total_score'))
+                self.assertEqual(batch, saved)
+
+
+class RankTableTests(TestCase):
+    """排名表随学生成绩、学院年级的变化自动维护：保存、审核、重置、录入成绩、转学院年级和删除"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = SubmissionCategory.objects.get(group='competition', name='A+类国家级竞赛')  # 最高 20 分
+        cls.counselor = CounselorProfile.objects.create(
+            user=User.objects.create_user('rank_counselor', password='x'),
+            full_name='辅导员', employee_id='RANK01', college='info', grade='2023'
+        )
+
+    def setUp(self):
+        # 总成绩 = 学业综合 × 0.6：54.0、54.0、51.0 和无成绩
+        self.a = self.create_student('20950001', 90)
+        self.b = self.create_student('20950002', 90)
+        self.c = self.create_student('20950003', 85)
+        self.d = self.create_student('20950004', None)
+
+    @staticmethod
+    def create_student(student_id, score, college='info', grade='2023'):
+        return StudentProfile.objects.create(
+            user=User.objects.create_user(f'rank{student_id}', password='x'), student_id=student_id,
+            college=college, grade=grade, academic_comprehensive_score=score
+        )
+
+    @staticmethod
+    def ranks(college='info', grade='2023'):
+        return {
+            entry.student_id: (entry.rank, entry.cohort_size)
+            for entry in StudentRank.objects.filter(college=college, grade=grade)
+        }
+
+    def assertRanks(self, expected, college='info', grade='2023'):
+        self.assertEqual(self.ranks(college, grade), {student.pk: rank for student, rank in expected.items()})
+        # 与实时统计的结果一致
+        for student in expected:
+            self.assertEqual(StudentProfile.objects.get(pk=student.pk).compute_rank(), expected[student])
+
+    def test_new_students_are_ranked(self):
+        self.assertRanks({self.a: (1, 3), self.b: (1, 3), self.c: (3, 3), self.d: (4, 3)})
+        student = StudentProfile.objects.select_related('rank_entry').get(pk=self.c.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(student.get_rank(), (3, 3))
+
+    def test_unrelated_change_does_not_refresh(self):
+        student = StudentProfile.objects.get(pk=self.a.pk)
+        student.phone = '13800000000'
+        with CaptureQueriesContext(connection) as queries:
+            student.save()
+        self.assertFalse([query for query in queries if 'students_studentrank' in query['sql']])
+
+    def test_score_change(self):
+        self.c.academic_comprehensive_score = 100
+        self.c.save()
+        self.assertRanks({self.c: (1, 3), self.a: (2, 3), self.b: (2, 3), self.d: (4, 3)})
+
+        self.d.academic_comprehensive_score = 90
+        self.d.save()
+        self.assertRanks({self.c: (1, 4), self.a: (2, 4), self.b: (2, 4), self.d: (2, 4)})
+
+    def test_approve_and_reset(self):
+        from counselors.review import approve_submissions, reset_submissions
+
+        submission = Submission.objects.create(student=self.c, category=self.category, self_rating=20)
+        submission = Submission.objects.select_related('category', 'student__user').get(pk=submission.pk)
+        approve_submissions(self.counselor, [(submission, Decimal(20))])  # 51.0 + 20 × 0.2 = 55.0
+        self.assertRanks({self.c: (1, 3), self.a: (2, 3), self.b: (2, 3), self.d: (4, 3)})
+
+        reset_submissions(self.counselor, [submission])
+        self.assertRanks({self.a: (1, 3), self.b: (1, 3), self.c: (3, 3), self.d: (4, 3)})
+
+    def test_set_academic_score_view(self):
+        self.client.force_login(self.counselor.user)
+        self.client.post(reverse('set_academic_score', args=[self.d.pk]), {'academic_comprehensive_score': '95'})
+        self.assertRanks({self.d: (1, 4), self.a: (2, 4), self.b: (2, 4), self.c: (4, 4)})
+
+    def test_cohort_move(self):
+        Submission.objects.create(student=self.a, category=self.category, self_rating=1)
+        student = StudentProfile.objects.get(pk=self.a.pk)
+        student.grade = '2024'
+        student.save()
+        self.assertRanks({self.b: (1, 2), self.c: (2, 2), self.d: (3, 2)})
+        self.assertRanks({self.a: (1, 1)}, grade='2024')
+        # 提交记录随学生转到新的学院年级
+        self.assertEqual(list(Submission.objects.filter(student=self.a).values_list('grade', flat=True)), ['2024'])
+
+    def test_delete(self):
+        self.a.delete()
+        self.assertRanks({self.b: (1, 2), self.c: (2, 2), self.d: (3, 2)})
+
+    def test_ranked_list(self):
+        # 并列分数名次相同，按索引顺序 id 大的在前；无总成绩的学生排在最后，没有排名百分比
+        students = list(StudentProfile.objects.ranked_in('info', '2023'))
+        self.assertEqual(
+            [(student.pk, student.cohort_rank, student.cohort_size, student.cohort_percentile) for student in students],
+            [(self.b.pk, 1, 3, 100 / 3), (self.a.pk, 1, 3, 100 / 3), (self.c.pk, 3, 3, 100.0), (self.d.pk, 4, 3, None)]
+        )
+        self.assertEqual([student.pk for student in StudentProfile.objects.ranked_in('info', '2024')], [])
+
+    def test_ranked_list_without_rank_rows(self):
+        # 排名表缺少记录或记录仍是转出前的学院年级时，名次现场统计，学生仍在列表中
+        expected = [(student.pk, student.cohort_rank, student.cohort_size)
+                    for student in StudentProfile.objects.ranked_in('info', '2023')]
+        StudentRank.objects.filter(student__in=[self.a, self.d]).delete()
+        StudentRank.objects.filter(student=self.c).update(college='other', rank=9, cohort_size=9)
+        students = StudentProfile.objects.ranked_in('info', '2023')
+        self.assertEqual([(student.pk, student.cohort_rank, student.cohort_size) for student in students], expected)
+
+        # 整个学院年级都没有排名记录时，导出也不缺行
+        StudentRank.objects.all().delete()
+        from counselors.exports import student_export_rows
+        self.assertEqual([row[0] for row in student_export_rows('info', '')],
+                         ['20950002', '20950001', '20950003', '20950004'])
+
+    def test_student_without_cohort(self):
+        student = self.create_student('20950005', 99, college='', grade='')
+        self.assertEqual(student.get_rank(), (0, 0))
+        self.assertFalse(StudentRank.objects.filter(student=student).exists())
+        self.assertNotIn(student.pk, [row.pk for row in StudentProfile.objects.ranked_in('info', '2023')])
+        self.assertRanks({self.a: (1, 3), self.b: (1, 3), self.c: (3, 3), self.d: (4, 3)})
+
+    def test_refresh_restores_missing_rows(self):
+        StudentRank.objects.filter(student=self.c).delete()
+        StudentRank.objects.filter(student=self.a).update(rank=9, cohort_size=9)
+        StudentRank.objects.refresh_cohort('info', '2023')
+        self.assertRanks({self.a: (1, 3), self.b: (1, 3), self.c: (3, 3), self.d: (4, 3)})
+
+
+class SimulatorTests(TestCase):
+    """加分模拟的名次与加分实际通过后数据库中的名次一致，成绩变化后缓存的成绩数组随之更新"""
+
+    def setUp(self):
+        cache.clear()
+        # 总成绩 = 学业综合 × 0.6 + 学术专长 × 0.2：60.0、54.0、54.0、51.0、无成绩
+        self.students = [
+            StudentProfile.objects.create(
+                user=User.objects.create_user(f'simulate{i}', password='x'), student_id=f'2094000{i}',
+                college='info', grade='2023', academic_comprehensive_score=score
+            )
+            for i, score in enumerate([100, 90, 90, 85, None])
+        ]
+
+    def db_rank(self, student):
+        return next(row.cohort_rank for row in StudentProfile.objects.ranked_in('info', '2023') if row.pk == student.pk)
+
+    def test_projected_rank_matches_database(self):
+        for student in self.students[:4]:
+            for score in (Decimal('0'), Decimal('15'), Decimal('30'), Decimal('50')):
+                with self.subTest(student=student.student_id, score=score):
+                    profile = StudentProfile.objects.get(pk=student.pk)
+                    result = simulate(profile, 'academic_expertise_score', score)
+                    self.assertEqual(result['current_rank'], self.db_rank(student))
+                    self.assertEqual(result['cohort_size'], 4)
+
+                    profile.academic_expertise_score += score
+                    profile.save()
+                    self.assertEqual(result['projected_total'], profile.total_score)
+                    self.assertEqual(result['projected_rank'], self.db_rank(student))
+                    profile.academic_expertise_score -= score
+                    profile.save()
+
+    def test_student_without_total(self):
+        result = simulate(self.students[4], 'academic_expertise_score', Decimal(10))
+        self.assertEqual(result, {
+            'current_total': None, 'current_rank': None, 'projected_total': None, 'projected_rank': None,
+            'cohort_size': 5,
+        })
+
+    def test_cache_invalidated_on_score_change(self):
+        self.assertEqual(list(cohort_score_array('info', '2023')), [510, 540, 540, 600])
+        with self.assertNumQueries(0):
+            cohort_score_array('info', '2023')
+
+        student = self.students[4]
+        student.academic_comprehensive_score = 50
+        student.save()
+        self.assertEqual(list(cohort_score_array('info', '2023')), [300, 510, 540, 540, 600])
+        # 分项成绩通过审核流水累加（不经过 save）时同样失效
+        StudentProfile.objects.increment_scores({self.students[3].pk: {'academic_expertise_score': Decimal(50)}})
+        self.assertEqual(list(cohort_score_array('info', '2023')), [300, 540, 540, 600, 610])
+
+
+class DistributionTests(TestCase):
+    """成绩分布的均值、标准差、分位数和直方图与已知结果一致"""
+
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def create_students(scores, prefix='2093'):
+        for i, score in enumerate(scores):
+            StudentProfile.objects.create(
+                user=User.objects.create(username=f'dist{prefix}{i}'), student_id=f'{prefix}{i:04d}',
+                college='info', grade='2023', academic_comprehensive_score=score
+            )
+
+    def test_known_values(self):
+        self.create_students([100, 90, 80, 70, None])  # 总成绩 60.0、54.0、48.0、42.0 和无成绩
+        total, comprehensive, expertise, _ = compute_distribution('info', '2023')
+
+        self.assertEqual(total['count'], 4)
+        self.assertEqual((total['mean'], total['std'], total['min'], total['max']), (51.0, 6.71, 42.0, 60.0))
+        self.assertEqual(total['quantiles'], {'p10': 43.8, 'p25': 46.5, 'p50': 51.0, 'p75': 55.5, 'p90': 58.2})
+        # 组距 2 分，从 42 分到 62 分共 10 组
+        self.assertEqual([(item['start'], item['end'], item['count']) for item in total['histogram']], [
+            (42.0, 44.0, 1), (44.0, 46.0, 0), (46.0, 48.0, 0), (48.0, 50.0, 1), (50.0, 52.0, 0),
+            (52.0, 54.0, 0), (54.0, 56.0, 1), (56.0, 58.0, 0), (58.0, 60.0, 0), (60.0, 62.0, 1),
+        ])
+        self.assertEqual({item['percent'] for item in total['histogram'] if item['count']}, {25.0})
+
+        self.assertEqual((comprehensive['count'], comprehensive['mean']), (4, 85.0))
+        # 分项成绩默认 0，所有学生都计入
+        self.assertEqual((expertise['count'], expertise['std'], expertise['histogram'][0]['count']), (5, 0.0, 5))
+
+    def test_matches_statistics_module(self):
+        rng = random.Random(20240915)
+        scores = [Decimal(rng.randint(0, 1000)).scaleb(-1) for _ in range(101)]
+        self.create_students(scores)
+        comprehensive = compute_distribution('info', '2023')[1]  # 学业综合成绩即 scores 本身
+        values = [float(score) for score in scores]
+
+        self.assertAlmostEqual(comprehensive['mean'], statistics.fmean(values), places=2)
+        self.assertAlmostEqual(comprehensive['std'], statistics.pstdev(values), places=2)
+        points = statistics.quantiles(values, n=20, method='inclusive')  # 每 5% 一个分位点
+        self.assertEqual(comprehensive['quantiles'], {
+            'p10': round(points[1], 2), 'p25': round(points[4], 2), 'p50': round(points[9], 2),
+            'p75': round(points[14], 2), 'p90': round(points[17], 2),
+        })
+        self.assertEqual(sum(item['count'] for item in comprehensive['histogram']), len(values))
+        self.assertLessEqual(len(comprehensive['histogram']), 10)
+
+    def test_empty_cohort_and_cache(self):
+        self.assertIsNone(cohort_distribution('', '2023'))
+        self.assertEqual(cohort_distribution('info', '2023')[0]['histogram'], [])
+
+        self.create_students([100])
+        self.assertEqual(cohort_distribution('info', '2023')[0]['count'], 1)
+        with self.assertNumQueries(0):
+            cohort_distribution('info', '2023')
+        self.create_students([80], prefix='2092')
+        self.assertEqual(cohort_distribution('info', '2023')[0]['count'], 2)
+
+
+class RankSnapshotTests(TestCase):
+    """排名快照：记录、按时刻查询名次（命令和学生端排名曲线）"""
+
+    def setUp(self):
+        cache.clear()
+        # 总成绩 54.0、54.0、48.0 和无成绩
+        self.students = [
+            StudentProfile.objects.create(
+                user=User.objects.create(username=f'snapshot{i}'), student_id=f'2096000{i}',
+                college='info', grade='2023', academic_comprehensive_score=score
+            )
+            for i, score in enumerate([90, 90, 80, None])
+        ]
+        StudentProfile.objects.create(
+            user=User.objects.create(username='snapshot_other'), student_id='20960009',
+            college='other', grade='2023', academic_comprehensive_score=70
+        )
+
+    def take(self, days_ago, **kwargs):
+        """记录快照，并把快照时间改为 days_ago 天前"""
+        snapshots = RankSnapshot.objects.take(**kwargs)
+        RankSnapshot.objects.filter(pk__in=[snapshot.pk for snapshot in snapshots]).update(
+            taken_at=timezone.now() - timedelta(days=days_ago)
+        )
+        return snapshots
+
+    def test_take_skips_unchanged_cohorts(self):
+        self.assertEqual(len(self.take(3)), 2)
+        self.assertEqual(self.take(2), [])
+        self.assertEqual(len(RankSnapshot.objects.take(college='info', force=True)), 1)
+
+        self.students[2].academic_comprehensive_score = 100
+        self.students[2].save()
+        self.assertEqual([(s.college, s.grade, s.cohort_size) for s in self.take(1)], [('info', '2023', 3)])
+
+    def test_rank_of_matches_live_rank(self):
+        snapshot = self.take(1, college='info')[0]
+        for student in self.students:
+            self.assertEqual(snapshot.rank_of(student.pk), student.compute_rank()[0])
+        self.assertIsNone(snapshot.rank_of(0))
+
+    def test_rank_of_ties(self):
+        # 学生 7 无总成绩，学生 8 不在快照中
+        snapshot = RankSnapshot(
+            college='info', grade='2023', cohort_size=6,
+            student_ids=_pack('q', range(1, 8)), scores=_pack('i', [900, 800, 800, 800, 700, 700]),
+        )
+        self.assertEqual([snapshot.rank_of(pk) for pk in range(1, 9)], [1, 2, 2, 2, 5, 5, 7, None])
+
+    def test_rank_at(self):
+        self.take(10)
+        self.students[2].academic_comprehensive_score = 100  # 48.0 -> 60.0
+        self.students[2].save()
+        self.take(5)
+        student = self.students[2]
+        now = timezone.now()
+
+        self.assertIsNone(RankSnapshot.objects.rank_at(student, now - timedelta(days=20)))
+        self.assertEqual(RankSnapshot.objects.rank_at(student, now - timedelta(days=7))[:2], (3, 3))
+        self.assertEqual(RankSnapshot.objects.rank_at(student, now)[:2], (1, 3))
+        self.assertIsNone(RankSnapshot.objects.rank_at(student, now, college='other'))
+
+        out = io.StringIO()
+        day = timezone.localdate(now - timedelta(days=7)).isoformat()
+        call_command('rank_at', student.student_id, at=day, stdout=out)
+        self.assertIn('3/3', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('rank_at', '20969999', at=day, stdout=out)
+        with self.assertRaises(CommandError):
+            call_command('rank_at', student.student_id, at='昨天', stdout=out)
+
+    def test_snapshot_ranks_command(self):
+        out = io.StringIO()
+        call_command('snapshot_ranks', stdout=out)
+        self.assertIn('已记录 2 份排名快照', out.getvalue())
+        call_command('snapshot_ranks', stdout=out)
+        self.assertIn('已记录 0 份排名快照', out.getvalue())
+        call_command('snapshot_ranks', college='info', force=True, stdout=out)
+        self.assertEqual(RankSnapshot.objects.filter(college='info').count(), 2)
+
+    def test_rank_history_view(self):
+        self.take(400)
+        self.take(10, force=True)
+        self.students[1].academic_comprehensive_score = 100
+        self.students[1].save()
+        self.take(1)
+
+        self.client.force_login(self.students[1].user)
+        response = self.client.get(reverse('rank_history'))
+        self.assertEqual([(point['rank'], point['cohort_size']) for point in response.json()['points']],
+                         [(1, 3), (1, 3)])
+        response = self.client.get(reverse('rank_history'), {'days': '730'})
+        self.assertEqual(len(response.json()['points']), 3)
+
+        # 新快照使缓存的曲线失效
+        self.take(0, force=True)
+        self.assertEqual(len(self.client.get(reverse('rank_history')).json()['points']), 3)
+
+
+class ProjectionTests(TestCase):
+    """字段投影的行对象与模型实例取值一致，并提供模板和导出用到的全部字段"""
+
+    # (模板, 循环变量, 投影)
+    TEMPLATES = [
+        ('counselors/all_students.html', 'student', STUDENT_LIST),
+        ('counselors/academic_scores.html', 'student', STUDENT_SCORE_GRID),
+        ('admins/dashboard.html', 'student', STUDENT_ADMIN),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, score in enumerate([90, None]):
+            StudentProfile.objects.create(
+                user=User.objects.create(username=f'projection{i}'), student_id=f'2097000{i}', full_name=f'学生{i}',
+                college='info', grade='2023', major='计算机', academic_comprehensive_score=score
+            )
+
+    def test_templates_use_projected_fields(self):
+        for name, variable, projection in self.TEMPLATES:
+            with open(get_template(name).origin.name, encoding='utf-8') as f:
+                used = set(re.findall(rf'\b{variable}\.(\w+)', f.read()))
+            with self.subTest(template=name):
+                self.assertTrue(used)
+                self.assertEqual({attribute for attribute in used if not hasattr(projection.row, attribute)}, set())
+
+    def test_rows_match_model(self):
+        queryset = StudentProfile.objects.ranked_in('info', '2023')
+        for projection in (STUDENT_LIST, STUDENT_EXPORT, STUDENT_SCORE_GRID):
+            rows = list(projection(queryset))
+            with self.subTest(projection=projection.row.__name__):
+                for row, student in zip(rows, queryset, strict=True):
+                    self.assertEqual(row._asdict(), {column: getattr(student, column) for column in projection.columns})
+                    self.assertFalse(hasattr(row, '__dict__'))
+                    if hasattr(row, 'get_college_display'):
+                        self.assertEqual(row.get_college_display(), '信息学院')
+
+        # 关联字段别名：分块读取与一次读取结果相同
+        rows = list(STUDENT_ADMIN(StudentProfile.objects.order_by('pk'), chunk_size=1))
+        self.assertEqual([(row.username, row.grade) for row in rows], [('projection0', '2023'), ('projection1', '2023')])
+
+    def test_export_rows(self):
+        from counselors.exports import student_export_rows
+        self.assertEqual(list(student_export_rows('info', '2023')), [
+            ['20970000', '学生0', 'info', '2023', '计算机', '', Decimal('90.0'), Decimal('0.0'), Decimal('0.0'),
+             Decimal('54.0'), 1, '100.0%'],
+            ['20970001', '学生1', 'info', '2023', '计算机', '', '', Decimal('0.0'), Decimal('0.0'), '', 2, ''],
+        ])
+
+
+class XlsxTests(TestCase):
+    """流式 xlsx 写入与读取、不可 seek 的 zip 写入：文件合法，XML 转义和单元格类型正确"""
+
+    MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+    def write(self, header, rows, **kwargs):
+        data = b''.join(xlsx.stream_xlsx(header, rows, **kwargs))
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        self.assertIsNone(archive.testzip())
+        return data, archive
+
+    def test_round_trip(self):
+        when = timezone.make_aware(datetime(2024, 9, 1, 8, 30))
+        rows = [
+            [20240001, Decimal('88.5'), 1.25, None, '', True],
+            ['<b>&"\'', 'a\x00b\x1fc', '  前后空格  ', date(2024, 9, 1), when, '多\n行'],
+        ]
+        data, archive = self.write(['学号', '成绩', '比例', '空', '空串', '布尔'], rows * 3, chunk_size=2)
+        self.assertEqual(archive.namelist(), [
+            '[Content_Types].xml', '_rels/.rels', 'xl/workbook.xml', 'xl/_rels/workbook.xml.rels', 'xl/styles.xml',
+            'xl/worksheets/sheet1.xml',
+        ])
+        for name in archive.namelist():
+            ElementTree.fromstring(archive.read(name))  # 每个成员都是合法的 XML
+
+        cells = [
+            [(cell.get('t'), ''.join(cell.itertext())) for cell in row.iter(f'{self.MAIN}c')]
+            for row in ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml')).iter(f'{self.MAIN}row')
+        ]
+        self.assertEqual(cells[1], [(None, '20240001'), (None, '88.5'), (None, '1.25'), (None, ''), (None, ''),
+                                    ('b', '1')])
+        self.assertEqual(cells[2], [
+            ('inlineStr', '<b>&"\''), ('inlineStr', 'abc'), ('inlineStr', '  前后空格  '),
+            ('inlineStr', '2024-09-01'), ('inlineStr', '2024-09-01 08:30:00'), ('inlineStr', '多\n行'),
+        ])
+
+        read = list(xlsx.read_xlsx_rows(io.BytesIO(data)))
+        self.assertEqual(read[0], ['学号', '成绩', '比例', '空', '空串', '布尔'])
+        self.assertEqual(read[1:3], [
+            ['20240001', '88.5', '1.25', '', '', '1'],
+            ['<b>&"\'', 'abc', '  前后空格  ', '2024-09-01', '2024-09-01 08:30:00', '多\n行'],
+        ])
+        self.assertEqual(len(read), 7)
+
+    def test_sheet_name(self):
+        _, archive = self.write(['a'], [], sheet_name='成绩"<&>/表:[2024]*?这是一个超过三十一个字符的很长很长很长的工作表名')
+        sheet = ElementTree.fromstring(archive.read('xl/workbook.xml')).find(f'{self.MAIN}sheets/{self.MAIN}sheet')
+        self.assertEqual(sheet.get('name'), '成绩"<&>表2024这是一个超过三十一个字符的很长很长很长的')
+
+    def test_read_shared_strings_and_gaps(self):
+        # Excel 保存的文件：共享字符串、带引用的单元格（中间有空列）、数值形式的学号
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('xl/workbook.xml', (
+                f'<workbook xmlns="{self.MAIN[1:-1]}" xmlns:r="http://schemas.openxmlformats.org/officeDocument/'
+                '2006/relationships"><sheets><sheet name="S" sheetId="1" r:id="rId7"/></sheets></workbook>'
+            ))
+            archive.writestr('xl/_rels/workbook.xml.rels', (
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                '<Relationship Id="rId7" Type="worksheet" Target="/xl/worksheets/data.xml"/></Relationships>'
+            ))
+            archive.writestr('xl/sharedStrings.xml', (
+                f'<sst xmlns="{self.MAIN[1:-1]}"><si><t>学号</t></si><si><r><t>姓</t></r><r><t>名</t></r></si>'
+                '<si><t>张&amp;三</t></si></sst>'
+            ))
+            archive.writestr('xl/worksheets/data.xml', (
+                f'<worksheet xmlns="{self.MAIN[1:-1]}"><sheetData>'
+                '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="C1" t="s"><v>1</v></c></row>'
+                '<row r="2"><c r="A2"><v>20240001.0</v></c><c r="C2" t="s"><v>2</v></c><c r="D2"><v>88.5</v></c></row>'
+                '</sheetData></worksheet>'
+            ))
+        self.assertEqual(list(xlsx.read_xlsx_rows(buffer)), [['学号', '', '姓名'], ['20240001', '', '张&三', '88.5']])
+
+    def test_stream_zip(self):
+        payload = os.urandom(200 * 1024)
+        for compression in (zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED):
+            members = [
+                ('a.txt', [b'hello ', b'world']),
+                (zipfile.ZipInfo('目录/b.bin', (2024, 9, 1, 8, 30, 0)), iter([payload[:1000], payload[1000:]])),
+                ('empty', []),
+            ]
+            with self.subTest(compression=compression):
+                chunks = list(zipstream.stream_zip(members, compression=compression))
+                self.assertGreater(len(chunks), 2)  # 边写边输出，而不是最后一次性产出
+                archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+                self.assertIsNone(archive.testzip())
+                self.assertEqual(archive.read('a.txt'), b'hello world')
+                self.assertEqual(archive.read('目录/b.bin'), payload)
+                self.assertEqual(archive.read('empty'), b'')
+                self.assertEqual(archive.getinfo('目录/b.bin').date_time, (2024, 9, 1, 8, 30, 0))
+                self.assertEqual({info.compress_type for info in archive.infolist()}, {compression})
+
+    def test_export_view_xlsx(self):
+        counselor = CounselorProfile.objects.create(
+            user=User.objects.create_user('xlsx_counselor', password='x'),
+            full_name='辅导员', employee_id='XLSX01', college='info', grade='2023'
+        )
+        StudentProfile.objects.create(user=User.objects.create(username='xlsx_student'), student_id='20240001',
+                                      full_name='<张&三>', college='info', grade='2023', academic_comprehensive_score=90)
+        self.client.force_login(counselor.user)
+        response = self.client.get(reverse('export_students'), {'format': 'xlsx'})
+        self.assertEqual(response['Content-Type'], xlsx.CONTENT_TYPE)
+        rows = list(xlsx.read_xlsx_rows(io.BytesIO(b''.join(response.streaming_content))))
+        self.assertEqual(rows[1][:2], ['20240001', '<张&三>'])
+        self.assertEqual(rows[1][9:], ['54', '1', '100.0%'])  # 读取时整数形式的数值去掉 ".0"
+
+
+class ReconcileScoresTests(TestCase):
+    """reconcile_scores 按已通过的提交记录校正成绩，并把校正量记入成绩流水"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.students = [
+            StudentProfile.objects.create(
+                user=User.objects.create_user(f'reconcile{i}', password='x'), student_id=f'2090000{i}',
+                college='info', grade='2023', academic_comprehensive_score=Decimal(80)
+            )
+            for i in range(3)
+        ]
+        academic = SubmissionCategory.objects.filter(group='competition').first()
+        performance = SubmissionCategory.objects.filter(group='other').first()
+        for student in cls.students:
+            Submission.objects.bulk_create([
+                Submission(student=student, category=academic, approved=True, approved_score=Decimal('2.5')),
+                Submission(student=student, category=performance, approved=True, approved_score=Decimal(1)),
+                Submission(student=student, category=academic, rejected=True),
+            ])
+        call_command('reconcile_scores', stdout=io.StringIO())
+
+    def profile(self, student):
+        return StudentProfile.objects.get(pk=student.pk)
+
+    def assertLedgerMatchesProfiles(self):
+        totals = ScoreLedgerEntry.objects.totals()
+        for student in self.students:
+            profile = self.profile(student)
+            with self.subTest(student=student.student_id):
+                self.assertEqual(totals[student.pk]['academic_expertise_score'], profile.academic_expertise_score)
+                self.assertEqual(totals[student.pk]['comprehensive_performance_score'],
+                                 profile.comprehensive_performance_score)
+
+    def test_profile_drift_is_corrected(self):
+        drifted, intact = self.students[0], self.students[1]
+        StudentProfile.objects.filter(pk=drifted.pk).update(academic_expertise_score=Decimal(9), total_score=0)
+        ledger = ScoreLedgerEntry.objects.count()
+
+        output = io.StringIO()
+        call_command('reconcile_scores', '--chunk-size', '2', stdout=output)
+        self.assertIn(drifted.student_id, output.getvalue())
+        self.assertNotIn(intact.student_id, output.getvalue())
+
+        profile = self.profile(drifted)
+        self.assertEqual(profile.academic_expertise_score, Decimal('2.5'))
+        self.assertEqual(profile.comprehensive_performance_score, Decimal(1))
+        self.assertEqual(profile.total_score, self.profile(intact).total_score)
+        # 流水本身无误，不需要校正
+        self.assertEqual(ScoreLedgerEntry.objects.count(), ledger)
+        self.assertLedgerMatchesProfiles()
+
+    def test_unrecorded_change_is_logged(self):
+        # 核定加分被直接改动，成绩和流水都没有随之变化
+        student = self.students[1]
+        submission = Submission.objects.filter(student=student, approved=True, category__group='competition').get()
+        Submission.objects.filter(pk=submission.pk).update(approved_score=Decimal(4))
+        ledger = ScoreLedgerEntry.objects.count()
+
+        call_command('reconcile_scores', stdout=io.StringIO())
+        self.assertEqual(self.profile(student).academic_expertise_score, Decimal(4))
+        entry = ScoreLedgerEntry.objects.get(pk__gt=ledger)  # 只新增一条
+        self.assertEqual(
+            (entry.student_id, entry.field, entry.delta, entry.reason),
+            (student.pk, 'academic_expertise_score', Decimal('1.5'), 'reconcile')
+        )
+        self.assertLedgerMatchesProfiles()
+
+        # 再次运行没有差异
+        call_command('reconcile_scores', stdout=io.StringIO())
+        self.assertEqual(ScoreLedgerEntry.objects.count(), ledger + 1)
+
+    def test_dry_run_changes_nothing(self):
+        StudentProfile.objects.filter(pk=self.students[0].pk).update(academic_expertise_score=Decimal(9))
+        ledger = ScoreLedgerEntry.objects.count()
+        call_command('reconcile_scores', '--dry-run', stdout=io.StringIO())
+        self.assertEqual(self.profile(self.students[0]).academic_expertise_score, Decimal(9))
+        self.assertEqual(ScoreLedgerEntry.objects.count(), ledger)
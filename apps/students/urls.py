@@ -19,8 +19,12 @@ urlpatterns = [
     path('profile/', views.profile, name='profile'),
     # 排名页
     path('ranking/', views.ranking, name='ranking'),
+    path('ranking/simulate/', views.simulate_rank, name='simulate_rank'),
+    path('ranking/history/', views.rank_history, name='rank_history'),
     # 上传资料页
     path('upload/', views.upload, name='upload'),
+    path('upload/sessions/', views.upload_session_create, name='upload_session_create'),
+    path('upload/sessions/<uuid:upload_id>/', views.upload_session, name='upload_session'),
     # 状态查看页
     path('submissions/', views.submissions, name='submissions'),
     path('submissions/delete/<int:submission_id>/', views.delete_submission, name='delete_submission'),
@@ -1,15 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login as auth_login, logout
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from .models import StudentProfile, Submission, Rule, Notification, SubmissionCategory
+from .models import StudentProfile, Submission, Rule, Notification, SubmissionCategory, RankSnapshot, UploadSession
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, HttpResponseNotAllowed, Http404, JsonResponse
+from django.views.decorators.http import require_POST
 from django.forms import ModelForm
 from django.contrib.auth import authenticate
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib import messages
 from .forms import StudentLoginForm
+from .simulator import category_score_fields, simulate
+from .distribution import cohort_distribution
+from .counters import cached_count
+from .pagination import keyset_paginate
+from .media import can_view_upload, media_response
+from .storage import upload_storage
+from .chunked import (
+    CHUNK_SIZE, MAX_UPLOAD_SIZE, SNIFF_SIZE, UNSUPPORTED_TYPE, UploadError, append_chunk, attach, create_session,
+    is_word_document, sniff
+)
+from decimal import Decimal, InvalidOperation
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from django.db import transaction
+import os
+import uuid
 
 
 # 学生注册表单
@@ -73,6 +91,22 @@ class SubmissionForm(ModelForm):
         self.fields['category'].queryset = SubmissionCategory.objects.all().order_by('group', 'name')
         self.fields['category'].label_from_instance = lambda obj: f"{obj.get_group_display()} - {obj.name}"
 
+    def clean_file(self):
+        # 直接上传（浏览器不支持分块上传时）同样限制大小和格式，扩展名按文件头识别出的类型保存
+        file = self.cleaned_data.get('file')
+        if file and not getattr(file, '_committed', False):
+            if file.size > MAX_UPLOAD_SIZE:
+                raise forms.ValidationError(f'文件不能超过 {MAX_UPLOAD_SIZE // 1024 // 1024}MB')
+            file.seek(0)
+            ext = sniff(file.read(SNIFF_SIZE))
+            if ext == '.docx' and not is_word_document(file):
+                ext = None
+            file.seek(0)
+            if not ext:
+                raise forms.ValidationError(UNSUPPORTED_TYPE)
+            file.name = os.path.splitext(file.name)[0] + ext
+        return file
+
 
 # 用户注册
 def register(request):
@@ -200,7 +234,12 @@ def ranking(request):
             'academic_score': profile.academic_comprehensive_score or "-",
             'research_score': profile.academic_expertise_score,
             'performance_score': profile.comprehensive_performance_score,
-            'total_score': profile.total_score or "-"
+            'total_score': profile.total_score or "-",
+            # 加分模拟滑块的分类选项
+            'can_simulate': bool(rank_data[0]),
+            'categories': SubmissionCategory.objects.order_by('group', 'name'),
+            # 本学院本年级成绩分布（缓存）
+            'score_distribution': cohort_distribution(profile.college, profile.grade),
         }
 
     except StudentProfile.DoesNotExist:
@@ -216,6 +255,73 @@ def ranking(request):
     return render(request, 'students/ranking.html', context)
 
 
+# 加分模拟：估算某项加分审核通过后的总成绩和排名，供排名页滑块实时调用
+@login_required
+def simulate_rank(request):
+    try:
+        profile = request.user.profile
+    except StudentProfile.DoesNotExist:
+        return JsonResponse({'error': '未找到用户个人资料'}, status=404)
+    if not all([profile.college, profile.grade]):
+        return JsonResponse({'error': '请先在个人资料中填写学院和年级'}, status=400)
+
+    try:
+        category_id = int(request.GET.get('category', ''))
+        score = Decimal(request.GET.get('score', ''))
+    except (ValueError, InvalidOperation):
+        return JsonResponse({'error': '请选择加分项类型并填写有效的分数'}, status=400)
+
+    fields = category_score_fields()
+    if category_id not in fields:
+        return JsonResponse({'error': '加分项类型不存在'}, status=400)
+    score_field, max_score = fields[category_id]
+    if not score.is_finite() or score < 0 or score > (max_score if max_score is not None else Decimal('9999.9')):
+        return JsonResponse({'error': '分数超出该加分项的范围'}, status=400)
+
+    result = simulate(profile, score_field, score)
+    return JsonResponse({
+        'current_total_score': str(result['current_total']) if result['current_total'] is not None else None,
+        'current_rank': result['current_rank'],
+        'total_score': str(result['projected_total']) if result['projected_total'] is not None else None,
+        'rank': result['projected_rank'],
+        'cohort_size': result['cohort_size'],
+    })
+
+
+# 排名变化曲线：按排名快照返回最近一段时间的名次，供排名页绘制迷你折线图
+@login_required
+def rank_history(request):
+    try:
+        profile = request.user.profile
+    except StudentProfile.DoesNotExist:
+        return JsonResponse({'error': '未找到用户个人资料'}, status=404)
+
+    try:
+        days = min(max(int(request.GET.get('days', 180)), 1), 730)
+    except ValueError:
+        days = 180
+
+    snapshots = RankSnapshot.objects.filter(college=profile.college, grade=profile.grade)
+    # 快照只追加不修改，以最新快照 id 作为缓存版本
+    latest_id = snapshots.order_by('-taken_at').values_list('id', flat=True).first()
+    cache_key = f"rank_history:{profile.pk}:{latest_id}:{days}"
+    points = cache.get(cache_key)
+    if points is None:
+        points = []
+        since = timezone.now() - timedelta(days=days)
+        for snapshot in snapshots.filter(taken_at__gte=since).order_by('taken_at'):
+            rank = snapshot.rank_of(profile.pk)
+            if rank is not None:
+                points.append({
+                    'date': timezone.localdate(snapshot.taken_at).isoformat(),
+                    'rank': rank,
+                    'cohort_size': snapshot.cohort_size,
+                })
+        cache.set(cache_key, points, timeout=60 * 60)
+
+    return JsonResponse({'points': points})
+
+
 # 上传加分材料
 @login_required
 def upload(request):
@@ -226,28 +332,119 @@ def upload(request):
     if request.method == 'POST':
         # POST请求时，使用POST数据和上传的文件来创建表单
         form = SubmissionForm(request.POST, request.FILES)
+        # 分块上传完成的文件随表单带上会话 id
+        session = None
+        upload_id = request.POST.get('upload_id')
+        if upload_id:
+            session = UploadSession.objects.filter(pk=upload_id, student=profile).first() \
+                if _is_uuid(upload_id) else None
+            if session is None or not session.complete:
+                form.add_error('file', '文件尚未上传完成，请重新选择文件上传')
         if form.is_valid():
             # 暂不提交到数据库，以便修改student字段
             new_sub = form.save(commit=False)
             # 将提交记录与当前学生关联
             new_sub.student = profile
-            # 保存到数据库
-            new_sub.save()
+            with transaction.atomic():
+                if session is not None:
+                    attach(session, new_sub)
+                # 保存到数据库
+                new_sub.save()
             # 成功后重定向到提交记录列表页面
             return redirect('submissions')
     else:
         # GET请求时，创建一个空的表单实例
         form = SubmissionForm()
-    return render(request, 'students/upload.html', {'form': form})
+    return render(request, 'students/upload.html', {
+        'form': form, 'chunk_size': CHUNK_SIZE, 'max_upload_size': MAX_UPLOAD_SIZE
+    })
+
+
+# 下载上传文件（MEDIA_URL 下的路径）：仅提交者本人、同学院同年级的辅导员和超级管理员可下载
+@login_required
+def serve_media(request, name):
+    if not name.startswith('uploads/') or not can_view_upload(request.user, name) or not upload_storage.exists(name):
+        raise Http404
+    return media_response(request, name)
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
+
+
+def _upload_error(exc):
+    data = {'error': str(exc)}
+    if exc.offset is not None:
+        data['offset'] = exc.offset
+    return JsonResponse(data, status=exc.status)
+
+
+def _upload_state(session):
+    return JsonResponse({
+        'id': str(session.pk), 'offset': session.received, 'size': session.size,
+        'complete': session.complete, 'chunk_size': CHUNK_SIZE,
+    })
+
+
+# 分块上传：新建上传会话
+@login_required
+@require_POST
+def upload_session_create(request):
+    try:
+        profile = request.user.profile
+    except StudentProfile.DoesNotExist:
+        return JsonResponse({'error': '未找到用户个人资料'}, status=404)
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': '缺少文件大小'}, status=400)
+    try:
+        session = create_session(profile, request.POST.get('filename', ''), size)
+    except UploadError as exc:
+        return _upload_error(exc)
+    return _upload_state(session)
+
+
+# 分块上传：查询已接收的位置（续传）或追加一块数据（请求体为原始字节，offset 为起始位置）
+@login_required
+def upload_session(request, upload_id):
+    try:
+        profile = request.user.profile
+    except StudentProfile.DoesNotExist:
+        return JsonResponse({'error': '未找到用户个人资料'}, status=404)
+
+    if request.method == 'GET':
+        session = get_object_or_404(UploadSession, pk=upload_id, student=profile)
+        return _upload_state(session)
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['GET', 'POST'])
+
+    try:
+        offset = int(request.GET.get('offset', ''))
+    except ValueError:
+        return JsonResponse({'error': '缺少数据位置'}, status=400)
+    try:
+        session = append_chunk(upload_id, profile, offset, request)
+    except UploadError as exc:
+        return _upload_error(exc)
+    return _upload_state(session)
 
 
 # 查看所有提交
 @login_required
 def submissions(request):
     profile = request.user.profile
-    # 获取当前用户所有提交，按时间倒序排列
-    subs = Submission.objects.filter(student=profile).order_by('-timestamp')
-    return render(request, 'students/submissions.html', {'submissions': subs})
+    # 获取当前用户的提交，按时间倒序游标分页
+    subs = Submission.objects.filter(student=profile)
+    page = keyset_paginate(
+        subs.select_related('category', 'reviewer'), request.GET,
+        total=cached_count(f'student:{profile.pk}', profile.college, profile.grade, subs)
+    )
+    return render(request, 'students/submissions.html', {'submissions': page.items, 'page': page})
 
 
 # 撤销加分材料
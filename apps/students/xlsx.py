@@ -0,0 +1,193 @@
+# 流式读写 Excel（.xlsx）文件。
+#
+# xlsx 是 zip 包内的若干 XML 文件，数据全部在工作表 XML 中。写入时按行拼出工作表 XML，
+# 通过 stream_zip 边压缩边输出；字符串直接写在单元格内（inlineStr），不需要先收集
+# 共享字符串表，因此内存占用与行数无关。只支持单个工作表、无样式。
+# 读取时逐行解析第一个工作表（iterparse），所有单元格按文本返回，用于批量导入。
+
+import posixpath
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape, quoteattr
+
+from django.utils import timezone
+
+from .zipstream import stream_zip
+
+CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CHUNK_SIZE = 2000  # 每块工作表 XML 包含的行数
+
+# XML 1.0 不允许的控制字符
+_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name={name} sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+
+def _cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(value, date):
+        value = value.isoformat()
+    text = escape(_ILLEGAL.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _sheet(header, rows, chunk_size):
+    yield _SHEET_START.encode()
+    parts = [f'<row>{"".join(map(_cell, header))}</row>']
+    for row in rows:
+        parts.append(f'<row>{"".join(map(_cell, row))}</row>')
+        if len(parts) >= chunk_size:
+            yield ''.join(parts).encode()
+            parts = []
+    parts.append(_SHEET_END)
+    yield ''.join(parts).encode()
+
+
+def stream_xlsx(header, rows, sheet_name='Sheet1', chunk_size=CHUNK_SIZE):
+    """把表头和行写成单工作表的 xlsx，逐块产出文件内容"""
+    # 工作表名不能包含 []:*?/\ 且最长 31 个字符
+    sheet_name = re.sub(r'[\[\]:*?/\\]', '', sheet_name)[:31] or 'Sheet1'
+    return stream_zip([
+        ('[Content_Types].xml', [_CONTENT_TYPES.encode()]),
+        ('_rels/.rels', [_ROOT_RELS.encode()]),
+        ('xl/workbook.xml', [_WORKBOOK.format(name=quoteattr(sheet_name)).encode()]),
+        ('xl/_rels/workbook.xml.rels', [_WORKBOOK_RELS.encode()]),
+        ('xl/styles.xml', [_STYLES.encode()]),
+        ('xl/worksheets/sheet1.xml', _sheet(header, rows, chunk_size)),
+    ])
+
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def _text(element):
+    """单元格或共享字符串中的全部文本（富文本分成多段 <t>）"""
+    return ''.join(node.text or '' for node in element.iter(f'{_MAIN_NS}t'))
+
+
+def _column_index(reference):
+    """单元格引用（如 "C12"）的列序号，从 0 开始"""
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord('A') + 1
+    return index - 1
+
+
+def _first_sheet_path(archive):
+    with archive.open('xl/workbook.xml') as workbook:
+        sheet = next(element for _, element in iterparse(workbook) if element.tag == f'{_MAIN_NS}sheet')
+        relation_id = sheet.get(f'{_REL_NS}id')
+    with archive.open('xl/_rels/workbook.xml.rels') as rels:
+        for _, element in iterparse(rels):
+            if element.tag == f'{_PACKAGE_REL_NS}Relationship' and element.get('Id') == relation_id:
+                target = element.get('Target')
+                return target.lstrip('/') if target.startswith('/') else posixpath.normpath(f'xl/{target}')
+    raise KeyError(relation_id)
+
+
+def read_xlsx_rows(fileobj):
+    """逐行读取第一个工作表，产出每行单元格文本的列表（空单元格为 ''）"""
+    with zipfile.ZipFile(fileobj) as archive:
+        shared = []
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            with archive.open('xl/sharedStrings.xml') as strings:
+                for _, element in iterparse(strings):
+                    if element.tag == f'{_MAIN_NS}si':
+                        shared.append(_text(element))
+                        element.clear()
+
+        with archive.open(_first_sheet_path(archive)) as sheet:
+            for _, element in iterparse(sheet):
+                if element.tag != f'{_MAIN_NS}row':
+                    continue
+                row = []
+                for cell in element.iter(f'{_MAIN_NS}c'):
+                    reference = cell.get('r')
+                    if reference:
+                        row.extend([''] * (_column_index(reference) - len(row)))
+                    cell_type = cell.get('t')
+                    value = cell.find(f'{_MAIN_NS}v')
+                    if cell_type == 'inlineStr':
+                        text = _text(cell)
+                    elif value is None or value.text is None:
+                        text = ''
+                    elif cell_type == 's':
+                        text = shared[int(value.text)]
+                    else:
+                        text = value.text
+                        # 整数形式的数值（如学号）去掉 Excel 可能保存的 ".0"
+                        if cell_type in (None, 'n') and text.endswith('.0'):
+                            text = text[:-2]
+                    row.append(text)
+                element.clear()
+                yield row
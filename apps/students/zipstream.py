@@ -0,0 +1,51 @@
+# 边生成边输出的 zip 文件。
+#
+# zipfile 写入不支持 seek 的目标时，每个成员的大小和校验值写在成员数据之后（数据描述符），
+# 不需要回头改写文件头。这里让 zipfile 写入一个只在内存中暂存的目标，每写入一块就把已压缩的
+# 字节取走交给调用方，用于 StreamingHttpResponse：内存中只保留正在压缩的一小块数据。
+
+import time
+import zipfile
+
+
+class _Sink:
+    """zipfile 的写入目标：不支持 tell/seek，写入的字节由 drain() 取走"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def stream_zip(members, compression=zipfile.ZIP_DEFLATED):
+    """members 为 (成员名或 ZipInfo, 字节块可迭代对象)，逐块产出 zip 文件内容"""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression) as archive:
+        for name, chunks in members:
+            if isinstance(name, zipfile.ZipInfo):
+                info = name
+            else:
+                info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = compression
+            with archive.open(info, 'w') as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # 中央目录
+    data = sink.drain()
+    if data:
+        yield data